@@ -0,0 +1,120 @@
+"""
+Диагностика запросов.
+
+SqlInstrumentationMiddleware — учёт SQL: сколько запросов, сколько времени в базе и какие выражения
+повторяются (признак N+1). Работает через connection.execute_wrapper, поэтому не нужен DEBUG = True.
+Включается настройкой SQL_INSTRUMENTATION. Когда она выключена, __init__ бросает MiddlewareNotUsed,
+и Django вообще не ставит middleware в цепочку — накладных расходов нет.
+
+RequestProfilingMiddleware — профиль cProfile одного запроса по параметру ?_profile=1
+или заголовку X-Profile-Request: 1, только для персонала.
+"""
+import contextlib
+import cProfile
+import logging
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .profiling import save_profile
+
+logger = logging.getLogger('sql_instrumentation')
+
+HEADER_SQL_PREFIX = 120  # сколько символов повторяющегося выражения показать в заголовке
+
+
+class QueryStats:
+    """Обёртка execute_wrapper: считает выражения и время их выполнения"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.count += 1
+            # параметры не учитываются: одно выражение с разными id — это и есть N+1
+            self.statements[sql] += 1
+
+    def duplicates(self, threshold: int) -> list[tuple[str, int]]:
+        """Выражения, выполненные не меньше threshold раз, самые частые первыми"""
+        return [(sql, count) for sql, count in self.statements.most_common() if count >= threshold]
+
+
+def _header_value(sql: str) -> str:
+    # заголовки — только latin-1 в одну строку
+    value = ' '.join(sql.split())[:HEADER_SQL_PREFIX]
+    return value.encode('ascii', 'replace').decode('ascii')
+
+
+class SqlInstrumentationMiddleware:
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SQL_INSTRUMENTATION', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = getattr(settings, 'SQL_INSTRUMENTATION_DUPLICATES', 2)
+
+    def __call__(self, request):
+        stats = QueryStats()
+        with contextlib.ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            # у потоковых ответов запросы во время отдачи тела сюда уже не попадут
+            response = self.get_response(request)
+
+        duplicates = stats.duplicates(self.threshold)
+        response.headers['X-SQL-Queries'] = str(stats.count)
+        response.headers['X-SQL-Time-Ms'] = f'{stats.seconds * 1000:.1f}'
+        response.headers['X-SQL-Duplicates'] = str(len(duplicates))
+        if duplicates:
+            sql, count = duplicates[0]
+            response.headers['X-SQL-Top-Duplicate'] = f'{count}x {_header_value(sql)}'
+
+        logger.info('%s %s %s: %d запросов, %.1f мс SQL, повторов %d',
+                    request.method, request.path, response.status_code, stats.count, stats.seconds * 1000,
+                    len(duplicates))
+        for sql, count in duplicates:
+            logger.warning('%s %s: %d раз: %s', request.method, request.path, count, sql)
+        return response
+
+
+class RequestProfilingMiddleware:
+    """Ставится после AuthenticationMiddleware: пользователь проверяется, только если профиль запрошен"""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_PROFILING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.param = getattr(settings, 'REQUEST_PROFILE_PARAM', '_profile')
+
+    def wants_profile(self, request) -> bool:
+        requested = request.GET.get(self.param) == '1' or request.headers.get('X-Profile-Request') == '1'
+        return requested and request.user.is_staff
+
+    def __call__(self, request):
+        if not self.wants_profile(request):
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # уже работает другой профилировщик — отдаём ответ без профиля
+            return self.get_response(request)
+        request.is_profiled = True  # view может пропустить кэш, см. profiling.fragment_cache_options
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+
+        response.headers['X-Profile'] = save_profile(profiler, request)
+        return response
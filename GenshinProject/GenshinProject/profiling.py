@@ -0,0 +1,114 @@
+"""
+Хранилище профилей запросов (cProfile) для персонала.
+
+Профили лежат файлами .prof в REQUEST_PROFILE_DIR, хранится не больше REQUEST_PROFILE_KEEP
+последних — старые удаляются при записи нового. Файл открывается в pstats/snakeviz как есть.
+"""
+import dataclasses
+import datetime
+import pstats
+import re
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.utils.text import slugify
+
+PROFILE_SUFFIX = '.prof'
+PROFILE_NAME_RE = re.compile(r'^[\w-]+\.prof$')
+
+
+@dataclasses.dataclass(frozen=True)
+class StoredProfile:
+    name: str
+    size: int
+    created: datetime.datetime
+
+
+@dataclasses.dataclass(frozen=True)
+class FunctionStats:
+    function: str
+    calls: int
+    primitive_calls: int
+    total_ms: float  # время в самой функции
+    cumulative_ms: float  # вместе с вызванными
+
+
+def profile_dir() -> Path:
+    return Path(settings.REQUEST_PROFILE_DIR)
+
+
+def fragment_cache_options(request, version: str, timeout: int) -> tuple[str, int]:
+    """
+    Версия и время жизни кэшируемых фрагментов шаблона ({% cache %}).
+    В профилируемом запросе — свой ключ и timeout 0: в профиль попадает сам расчёт, а не чтение готового.
+    """
+    if getattr(request, 'is_profiled', False):
+        return f'{version}-profile-{time.time_ns()}', 0
+    return version, timeout
+
+
+def save_profile(profiler, request) -> str:
+    """Записать профиль запроса и удалить лишние старые; возвращает имя файла"""
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    path_slug = slugify(request.path.replace('/', '-'))[:60] or 'root'
+    name = f'{time.strftime("%Y%m%d-%H%M%S")}-{uuid.uuid4().hex[:6]}-u{request.user.pk}-{path_slug}{PROFILE_SUFFIX}'
+    profiler.dump_stats(directory / name)
+    prune_profiles(settings.REQUEST_PROFILE_KEEP)
+    return name
+
+
+def prune_profiles(keep: int) -> None:
+    profiles = sorted(profile_dir().glob(f'*{PROFILE_SUFFIX}'), key=lambda path: path.stat().st_mtime, reverse=True)
+    for path in profiles[keep:]:
+        path.unlink(missing_ok=True)
+
+
+def list_profiles() -> list[StoredProfile]:
+    """Сохранённые профили, новые первыми"""
+    directory = profile_dir()
+    if not directory.is_dir():
+        return []
+    profiles = []
+    for path in directory.glob(f'*{PROFILE_SUFFIX}'):
+        stat = path.stat()
+        profiles.append(StoredProfile(
+            name=path.name,
+            size=stat.st_size,
+            created=datetime.datetime.fromtimestamp(stat.st_mtime, tz=datetime.timezone.utc),
+        ))
+    return sorted(profiles, key=lambda profile: profile.created, reverse=True)
+
+
+def get_profile_path(name: str) -> Path | None:
+    """Путь к профилю по имени; None — нет такого или имя недопустимое (защита от ../)"""
+    if not PROFILE_NAME_RE.match(name):
+        return None
+    path = profile_dir() / name
+    return path if path.is_file() else None
+
+
+def top_functions(path: Path, limit: int = 30, only_project: bool = False) -> list[FunctionStats]:
+    """Функции с наибольшим cumulative-временем; only_project — только код проекта"""
+    stats = pstats.Stats(str(path))
+    stats.sort_stats(pstats.SortKey.CUMULATIVE)
+    base_dir = str(settings.BASE_DIR)
+    result = []
+    for key in stats.fcn_list:
+        filename, line, function = key
+        if only_project and (not filename.startswith(base_dir) or '/.venv/' in filename):
+            continue
+        primitive_calls, calls, total, cumulative, _ = stats.stats[key]
+        location = f'{Path(filename).relative_to(base_dir) if filename.startswith(base_dir) else filename}:{line}'
+        result.append(FunctionStats(
+            function=f'{function} ({location})',
+            calls=calls,
+            primitive_calls=primitive_calls,
+            total_ms=round(total * 1000, 3),
+            cumulative_ms=round(cumulative * 1000, 3),
+        ))
+        if len(result) >= limit:
+            break
+    return result
@@ -44,10 +44,12 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'GenshinProject.middleware.SqlInstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'GenshinProject.middleware.RequestProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -83,6 +85,35 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# Версии справочника и данных пользователей (characters.services.catalog_cache, user_versions)
+# должны быть общими для всех воркеров gunicorn, поэтому кэш — в базе: таблицы создают миграции
+# characters 0015 и 0016. Redis или Memcached тоже подойдут.
+# Версии лежат в отдельном кэше 'versions': в общем кэше их мог бы вытеснить отсев по MAX_ENTRIES,
+# а пропавшая версия — это лишний пересбор снимка справочника и сброс всех ETag.
+# Чтение версии — один SELECT на запрос (get_catalog, ETag калькулятора); это осознанная цена
+# общей версии без отдельного сервера кэша.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'django_cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    'versions': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'django_cache_versions',
+        'OPTIONS': {
+            # по ключу на справочник и на каждую часть данных пользователя — до отсева не доходит
+            'MAX_ENTRIES': 1_000_000,
+        },
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -124,4 +155,40 @@ STATICFILES_DIRS = [
 ]
 
 LOGIN_REDIRECT_URL = '/profile'
-LOGOUT_REDIRECT_URL = '/'
\ No newline at end of file
+LOGOUT_REDIRECT_URL = '/'
+
+
+# Учёт SQL по запросам (GenshinProject.middleware): число запросов, время и повторы в заголовках X-SQL-*
+# и в ротируемом логе. Выключено — middleware не попадает в цепочку.
+SQL_INSTRUMENTATION = False
+SQL_INSTRUMENTATION_DUPLICATES = 2  # со скольких повторов одно выражение считается N+1
+SQL_INSTRUMENTATION_LOG = BASE_DIR / 'sql.log'
+
+# Профили cProfile по запросу персонала (?_profile=1 или X-Profile-Request: 1), см. /staff/profiles/.
+# По умолчанию — только при DEBUG: в рабочей среде включать явно
+REQUEST_PROFILING = DEBUG
+REQUEST_PROFILE_PARAM = '_profile'
+REQUEST_PROFILE_DIR = BASE_DIR / 'profiles'
+REQUEST_PROFILE_KEEP = 50  # старые профили удаляются
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'sql_instrumentation': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': SQL_INSTRUMENTATION_LOG,
+            'maxBytes': 5 * 1024 * 1024,
+            'backupCount': 3,
+            'encoding': 'utf-8',
+            'delay': True,  # файл создаётся при первой записи
+        },
+    },
+    'loggers': {
+        'sql_instrumentation': {
+            'handlers': ['sql_instrumentation'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
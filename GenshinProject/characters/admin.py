@@ -5,6 +5,7 @@ admin.site.register(Character)
 admin.site.register(WeeklyMaterial)
 admin.site.register(UserCharacter)
 admin.site.register(PlannedCharacter)
+admin.site.register(TargetProfile)
 admin.site.register(BossMaterial)
 admin.site.register(TalentMaterial)
 admin.site.register(Specialty)
@@ -13,3 +14,4 @@ admin.site.register(Mob)
 admin.site.register(MobMaterial)
 admin.site.register(UserInventory)
 
+admin.site.register(UserMaterialTotals)
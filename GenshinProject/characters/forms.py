@@ -1,6 +1,32 @@
-from .models import Character, UserCharacter, PlannedCharacter
+from .models import Character, UserCharacter, PlannedCharacter, TargetProfile
+from .services.roster_availability import RosterAvailability
 from django.forms import ModelForm, TextInput, Select, NumberInput
 from django import forms
+from django.db.models.utils import get_blank_choice_label
+
+
+class CatalogCharacterField(forms.ChoiceField):
+    """
+    Выбор персонажа из закэшированного справочника вместо ModelChoiceField:
+    список строится без запроса, а clean возвращает Character из того же снимка.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.set_characters([])
+
+    def set_characters(self, characters):
+        self._characters = {str(ch.id): ch for ch in characters}
+        self.choices = [('', get_blank_choice_label()), *((str(ch.id), ch.name) for ch in characters)]
+
+    def prepare_value(self, value):
+        # начальное значение может прийти объектом (instance.name)
+        return str(value.id) if isinstance(value, Character) else value
+
+    def clean(self, value):
+        value = super().clean(value)
+        return self._characters.get(value)
+
 
 class CharacterForm(ModelForm):
     class Meta:
@@ -33,6 +59,10 @@ class CharacterForm(ModelForm):
 
 class UserCharacterForm(ModelForm):
 
+    name = CatalogCharacterField(label='Персонаж', widget=Select(attrs={
+        'class': 'form-control',
+    }))
+
     talent1 = forms.IntegerField(min_value=1, max_value=10, label="Уровень таланта 1")
     talent2 = forms.IntegerField(min_value=1, max_value=10, label="Уровень таланта 2")
     talent3 = forms.IntegerField(min_value=1, max_value=10, label="Уровень таланта 3")
@@ -40,32 +70,21 @@ class UserCharacterForm(ModelForm):
     target2 = forms.IntegerField(min_value=1, max_value=10, label="Цель таланта 2")
     target3 = forms.IntegerField(min_value=1, max_value=10, label="Цель таланта 3")
 
-    def __init__(self, *args, user=None, **kwargs):
+    def __init__(self, *args, user=None, availability=None, **kwargs):
         super().__init__(*args, **kwargs)
         self.user = user
 
         #фильтруем персонажей
-        if user:  # проверяем, что user существует
-            existing_chars = UserCharacter.objects.filter(
-                user=user
-            ).values_list('name_id', flat=True)
-
-            planned_chars = PlannedCharacter.objects.filter(
-                user=user
-            ).values_list('name_id', flat=True)
-
-            excluded_chars = existing_chars.union(planned_chars)
-
-            self.fields['name'].queryset = Character.objects.exclude(
-                id__in=excluded_chars
-            )
-        else:
-            print('user not exist')
-            self.fields['name'].queryset = Character.objects.none()
+        if availability is None and user:  # проверяем, что user существует
+            availability = RosterAvailability.load(user)
+        self.availability = availability
+        if availability is not None:
+            self.fields['name'].set_characters(availability.available())
 
     def clean_name(self):
         selected_character = self.cleaned_data.get('name')
-        if UserCharacter.objects.filter(user=self.user, name=selected_character).exists():
+        if (selected_character is not None and self.availability is not None
+                and selected_character.id in self.availability.owned):
             raise forms.ValidationError("У тебя уже есть этот персонаж!")
         return selected_character
 
@@ -74,9 +93,6 @@ class UserCharacterForm(ModelForm):
         fields = ['name', 'level', 'is_ascended', 'talent1', 'talent2', 'talent3', 'target1', 'target2', 'target3']
 
         widgets = {
-            'name': Select(attrs={
-                'class': 'form-control',
-            }),
             'level': NumberInput(attrs={
                 'class': 'form-control',
             }),
@@ -86,43 +102,35 @@ class UserCharacterForm(ModelForm):
         }
 
         labels = {
-            'name': 'Персонаж',
             'level': 'Уровень',
         }
 
 
 class PlannedCharacterForm(ModelForm):
 
+    name = CatalogCharacterField(label='Персонаж', widget=Select(attrs={
+        'class': 'form-control',
+    }))
+
     target1 = forms.IntegerField(min_value=1, max_value=10, label="Цель таланта 1")
     target2 = forms.IntegerField(min_value=1, max_value=10, label="Цель таланта 2")
     target3 = forms.IntegerField(min_value=1, max_value=10, label="Цель таланта 3")
 
-    def __init__(self, *args, user=None, **kwargs):
+    def __init__(self, *args, user=None, availability=None, **kwargs):
         super().__init__(*args, **kwargs)
         self.user = user
 
         #фильтруем персонажей
-        if user:  # проверяем, что user существует
-            existing_chars = UserCharacter.objects.filter(
-                user=user
-            ).values_list('name_id', flat=True)
-
-            planned_chars = PlannedCharacter.objects.filter(
-                user=user
-            ).values_list('name_id', flat=True)
-
-            excluded_chars = existing_chars.union(planned_chars)
-
-            self.fields['name'].queryset = Character.objects.exclude(
-                id__in=excluded_chars
-            )
-        else:
-            print('user not exist')
-            self.fields['name'].queryset = Character.objects.none()
+        if availability is None and user:  # проверяем, что user существует
+            availability = RosterAvailability.load(user)
+        self.availability = availability
+        if availability is not None:
+            self.fields['name'].set_characters(availability.available())
 
     def clean_name(self):
         selected_character = self.cleaned_data.get('name')
-        if UserCharacter.objects.filter(user=self.user, name=selected_character).exists():
+        if (selected_character is not None and self.availability is not None
+                and selected_character.id in self.availability.owned):
             raise forms.ValidationError("У тебя уже есть этот персонаж!")
         return selected_character
 
@@ -130,19 +138,14 @@ class PlannedCharacterForm(ModelForm):
         model = PlannedCharacter
         fields = ['name', 'target1', 'target2', 'target3']
 
-        widgets = {
-            'name': Select(attrs={
-                'class': 'form-control',
-            }),
-        }
-
-        labels = {
-            'name': 'Персонаж',
-        }
-
 
 class ExPlannedCharacterForm(ModelForm):
 
+    name = CatalogCharacterField(label='Персонаж', widget=Select(attrs={
+        'class': 'form-control',
+        'id': 'id_name',  # для JS
+    }))
+
     talent1 = forms.IntegerField(min_value=1, max_value=10, label="Уровень таланта 1")
     talent2 = forms.IntegerField(min_value=1, max_value=10, label="Уровень таланта 2")
     talent3 = forms.IntegerField(min_value=1, max_value=10, label="Уровень таланта 3")
@@ -150,25 +153,21 @@ class ExPlannedCharacterForm(ModelForm):
     target2 = forms.IntegerField(min_value=1, max_value=10, label="Цель таланта 2")
     target3 = forms.IntegerField(min_value=1, max_value=10, label="Цель таланта 3")
 
-    def __init__(self, *args, user=None, **kwargs):
+    def __init__(self, *args, user=None, availability=None, **kwargs):
         super().__init__(*args, **kwargs)
         self.user = user
 
         #фильтруем персонажей
-        if user:  # проверяем, что user существует
-
-            planned_chars = PlannedCharacter.objects.filter(
-                user=user
-            ).values_list('name_id', flat=True)
-
-            self.fields['name'].queryset = Character.objects.filter(id__in=planned_chars)
-        else:
-            print('user not exist')
-            self.fields['name'].queryset = Character.objects.none()
+        if availability is None and user:  # проверяем, что user существует
+            availability = RosterAvailability.load(user)
+        self.availability = availability
+        if availability is not None:
+            self.fields['name'].set_characters(availability.planned_characters())
 
     def clean_name(self):
         selected_character = self.cleaned_data.get('name')
-        if UserCharacter.objects.filter(user=self.user, name=selected_character).exists():
+        if (selected_character is not None and self.availability is not None
+                and selected_character.id in self.availability.owned):
             raise forms.ValidationError("У тебя уже есть этот персонаж!")
         return selected_character
 
@@ -177,10 +176,6 @@ class ExPlannedCharacterForm(ModelForm):
         fields = ['name', 'level', 'is_ascended', 'talent1', 'talent2', 'talent3', 'target1', 'target2', 'target3']
 
         widgets = {
-            'name': Select(attrs={
-                'class': 'form-control',
-                'id': 'id_name',  # для JS
-            }),
             'level': NumberInput(attrs={
                 'class': 'form-control',
             }),
@@ -190,6 +185,42 @@ class ExPlannedCharacterForm(ModelForm):
         }
 
         labels = {
-            'name': 'Персонаж',
             'level': 'Уровень',
-        }
\ No newline at end of file
+        }
+
+
+class TargetProfileForm(ModelForm):
+
+    target1 = forms.IntegerField(min_value=1, max_value=10, label="Цель таланта 1")
+    target2 = forms.IntegerField(min_value=1, max_value=10, label="Цель таланта 2")
+    target3 = forms.IntegerField(min_value=1, max_value=10, label="Цель таланта 3")
+
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.user = user
+        for i, level in enumerate(self.instance.get_target_talent_levels()[:3], start=1):
+            self.fields[f'target{i}'].initial = level
+
+    def clean_name(self):
+        name = self.cleaned_data.get('name')
+        profiles = TargetProfile.objects.filter(user=self.user, name=name).exclude(pk=self.instance.pk)
+        if profiles.exists():
+            raise forms.ValidationError("Профиль с таким названием уже есть!")
+        return name
+
+    class Meta:
+        model = TargetProfile
+        fields = ['name', 'target_level', 'target1', 'target2', 'target3', 'is_default']
+
+        widgets = {
+            'name': TextInput(attrs={
+                'class': 'form-control',
+                'placeholder': 'Например, поддержка',
+            }),
+            'target_level': NumberInput(attrs={
+                'class': 'form-control',
+            }),
+            'is_default': forms.CheckboxInput(attrs={
+                'class': 'form-check-input',
+            })
+        }
@@ -0,0 +1,177 @@
+import contextlib
+import datetime
+import functools
+import json
+import platform
+import random
+import statistics
+import subprocess
+import time
+from pathlib import Path
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from ...models import UserCharacter, UserInventory, UserMaterialTotals
+from ...services.catalog_cache import bump_catalog_version, get_catalog
+from ...services.materials_aggregator import MaterialsAggregator
+from ...services.materials_calculator import FULL_BUILD_CACHE_KEY, MaterialsCalculator
+from ...services.material_totals import CALCULATION_SCOPES, calculate_user_materials
+from ...services.synthetic_data import CatalogSize, seed_catalog, seed_user, seed_inventory
+
+
+def measure(func, repeat: int, setup=None) -> dict:
+    """Время каждого прогона (мс) и число SQL-запросов первого прогона; setup перед прогоном не замеряется"""
+    times = []
+    for run in range(repeat):
+        if setup is not None:
+            setup()
+        # запросы считаются только в первом прогоне, остальные — без накладных расходов на их запись
+        with CaptureQueriesContext(connection) if run == 0 else contextlib.nullcontext() as captured:
+            start = time.perf_counter()
+            func()
+            times.append((time.perf_counter() - start) * 1000)
+        if run == 0:
+            queries = captured
+    return {
+        'first_ms': round(times[0], 3),
+        'best_ms': round(min(times), 3),
+        'median_ms': round(statistics.median(times), 3),
+        'queries': len(queries),
+    }
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=Path(__file__).resolve().parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ('Замеряет calculate_character, calculate_all, calculate_user_materials (как страницы калькулятора) '
+            'и aggregate_materials на синтетическом справочнике '
+            '(во временной тестовой базе) и пишет результат в JSON')
+
+    def add_arguments(self, parser):
+        size = CatalogSize()
+        parser.add_argument('--characters', type=int, default=size.characters)
+        parser.add_argument('--mobs', type=int, default=size.mobs)
+        parser.add_argument('--bosses', type=int, default=size.bosses)
+        parser.add_argument('--weekly-bosses', type=int, default=size.weekly_bosses)
+        parser.add_argument('--specialties', type=int, default=size.specialties)
+        parser.add_argument('--rosters', default='10,50,all', help='Размеры ростеров через запятую; all — весь справочник')
+        parser.add_argument('--repeat', type=int, default=5, help='Сколько раз повторять каждый замер')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', default='calculator-benchmark.json', help='Куда записать результат')
+        parser.add_argument('--compare', help='Прежний файл результатов — вывести изменение best_ms')
+
+    def handle(self, *args, **options):
+        size = CatalogSize(
+            characters=options['characters'],
+            mobs=options['mobs'],
+            bosses=options['bosses'],
+            weekly_bosses=options['weekly_bosses'],
+            specialties=options['specialties'],
+        )
+        try:
+            rosters = [size.characters if value == 'all' else int(value) for value in options['rosters'].split(',')]
+        except ValueError:
+            raise CommandError('--rosters: числа через запятую или all')
+        if options['repeat'] < 1:
+            raise CommandError('--repeat должен быть не меньше 1')
+
+        # синтетика не должна попасть в рабочую базу — всё делается во временной тестовой
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            results = self._run(size, rosters, options['repeat'], random.Random(options['seed']))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            bump_catalog_version()
+
+        report = {
+            'created': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'catalog': size.as_dict(),
+            'repeat': options['repeat'],
+            'results': results,
+        }
+        Path(options['output']).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+        self.stdout.write(self.style.SUCCESS(f'Результат записан в {options["output"]}'))
+
+        if options['compare']:
+            self._compare(json.loads(Path(options['compare']).read_text(encoding='utf-8')), report)
+
+    def _run(self, size: CatalogSize, rosters: list[int], repeat: int, rng: random.Random) -> list[dict]:
+        characters = seed_catalog(size, rng)
+        catalog = get_catalog()
+        results = []
+        for roster_size in rosters:
+            user = seed_user(f'bench-{roster_size}', characters, roster_size, rng)
+            seed_inventory(user, catalog.materials.values(), rng)
+            calculator = MaterialsCalculator(catalog)
+            roster = list(UserCharacter.objects.filter(user=user))
+            inventory = UserInventory.get_inventory_map(user)
+            required = calculator.calculate_all(UserCharacter.objects.filter(user=user), only_obtained=False)
+
+            # полная прокачка неполученных кэшируется — первый прогон calculate_all считает её с нуля
+            self._drop_full_builds(catalog)
+            benchmarks = {
+                'calculate_character': lambda: [calculator.calculate_character(ch) for ch in roster],
+                'calculate_all': lambda: calculator.calculate_all(
+                    UserCharacter.objects.filter(user=user), only_obtained=False),
+                'calculate_all_obtained': lambda: calculator.calculate_all(
+                    UserCharacter.objects.filter(user=user), only_obtained=True),
+                'aggregate_materials': lambda: MaterialsAggregator(inventory).aggregate_materials(required),
+            }
+            setups = {}
+            # то, что на самом деле вызывают страницы: итоги из UserMaterialTotals + режим расчёта.
+            # cold — итогов и кэша полных сборок нет (первое открытие после изменения справочника)
+            for scope in CALCULATION_SCOPES:
+                benchmarks[f'user_materials_{scope}_cold'] = functools.partial(
+                    calculate_user_materials, user, calculator, scope)
+                setups[f'user_materials_{scope}_cold'] = functools.partial(self._reset_user_caches, user, catalog)
+                benchmarks[f'user_materials_{scope}'] = functools.partial(
+                    calculate_user_materials, user, calculator, scope)
+
+            for name, func in benchmarks.items():
+                row = {'benchmark': name, 'roster': len(roster), **measure(func, repeat, setups.get(name))}
+                results.append(row)
+                self.stdout.write(
+                    f'{name:<28} ростер {row["roster"]:>5}: {row["best_ms"]:10.3f} мс '
+                    f'(первый {row["first_ms"]:.3f}), запросов {row["queries"]}'
+                )
+        return results
+
+    @staticmethod
+    def _reset_user_caches(user, catalog) -> None:
+        UserMaterialTotals.objects.filter(user=user).delete()
+        Command._drop_full_builds(catalog)
+
+    @staticmethod
+    def _drop_full_builds(catalog) -> None:
+        # справочник в замерах не меняется, поэтому вместо смены версии удаляем записи текущей
+        cache.delete_many([FULL_BUILD_CACHE_KEY.format(version=catalog.version, id=character_id)
+                           for character_id in catalog.characters])
+
+    def _compare(self, previous: dict, current: dict) -> None:
+        """Изменение лучшего времени относительно прежнего запуска, по (бенчмарк, ростер)"""
+        before = {(row['benchmark'], row['roster']): row for row in previous.get('results', [])}
+        self.stdout.write(f'Сравнение с {previous.get("revision") or previous.get("created")}:')
+        if previous.get('catalog') != current['catalog']:
+            self.stdout.write(self.style.WARNING('Размеры справочника различаются — сравнение приблизительное'))
+        for row in current['results']:
+            old = before.get((row['benchmark'], row['roster']))
+            if old is None or not old['best_ms']:
+                continue
+            ratio = row['best_ms'] / old['best_ms']
+            line = (f'{row["benchmark"]:<28} ростер {row["roster"]:>5}: x{ratio:.2f}, '
+                    f'запросов {old["queries"]} -> {row["queries"]}')
+            slower = ratio > 1.2 or row['queries'] > old['queries']
+            self.stdout.write(self.style.WARNING(line) if slower else line)
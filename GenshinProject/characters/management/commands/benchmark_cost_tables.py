@@ -0,0 +1,95 @@
+from collections import defaultdict
+import timeit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...services import cost_tables
+from ...services.cost_tables import ascension_cost, talent_cost
+
+
+# --- прежние циклы из MaterialsCalculator, оставлены как эталон для сравнения ---
+
+def loop_ascension_cost(ascensions):
+    boss = sum(cost_tables.BOSS_FOR_ASCENSION[i] for i in range(ascensions, 6))
+    specialties = sum(cost_tables.SPECIALTIES_FOR_ASCENSION[i] for i in range(ascensions, 6))
+    stones = defaultdict(int)
+    for asc in range(ascensions, 6):
+        step = cost_tables.STONES_FOR_ASCENSION[asc]
+        stones[step['rarity']] += step['count']
+    mobs = defaultdict(int)
+    for asc in range(ascensions, 6):
+        step = cost_tables.MOBS_FOR_ASCENSION[asc]
+        mobs[step['rarity']] += step['count']
+    return boss, specialties, stones, mobs
+
+
+def loop_talent_cost(from_level, to_level):
+    books = defaultdict(int)
+    mobs = defaultdict(int)
+    weekly = 0
+    for level in range(from_level, to_level):
+        step = cost_tables.BOOKS_FOR_TALENT_LEVEL[level - 1]
+        books[step['rarity']] += step['count']
+        step = cost_tables.MOBS_FOR_TALENT_LEVEL[level - 1]
+        mobs[step['rarity']] += step['count']
+        weekly += cost_tables.WEEKLY_FOR_TALENT_LEVEL[level - 1]
+    return books, mobs, weekly
+
+
+def _same(mapping, expected):
+    return all(mapping.get(rarity, 0) == count for rarity, count in expected.items()) and \
+        all(expected.get(rarity, 0) == count for rarity, count in mapping.items())
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает таблицы стоимости (cost_tables) с прежними циклами по скорости'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--number', type=int, default=20000, help='Сколько раз повторять каждый замер')
+
+    def handle(self, *args, **options):
+        number = options['number']
+        self._check()
+
+        ascension_pairs = list(range(cost_tables.MAX_ASCENSIONS + 1))
+        talent_pairs = [
+            (start, end)
+            for start in range(cost_tables.MIN_TALENT_LEVEL, cost_tables.MAX_TALENT_LEVEL + 1)
+            for end in range(start, cost_tables.MAX_TALENT_LEVEL + 1)
+        ]
+
+        rows = [
+            ('ascension: циклы', lambda: [loop_ascension_cost(a) for a in ascension_pairs]),
+            ('ascension: таблица', lambda: [ascension_cost(a) for a in ascension_pairs]),
+            ('talent: циклы', lambda: [loop_talent_cost(s, e) for s, e in talent_pairs]),
+            ('talent: таблица', lambda: [talent_cost(s, e) for s, e in talent_pairs]),
+        ]
+        sizes = {'ascension': len(ascension_pairs), 'talent': len(talent_pairs)}
+
+        results = {}
+        for name, func in rows:
+            seconds = min(timeit.repeat(func, number=number, repeat=3))
+            per_call = seconds / (number * sizes[name.split(':')[0]]) * 1e9
+            results[name] = per_call
+            self.stdout.write(f'{name:<22} {per_call:8.1f} нс/вызов')
+
+        for kind in sizes:
+            speedup = results[f'{kind}: циклы'] / results[f'{kind}: таблица']
+            self.stdout.write(self.style.SUCCESS(f'{kind}: ускорение x{speedup:.1f}'))
+
+    def _check(self):
+        """Таблицы должны давать те же числа, что и циклы"""
+        for asc in range(cost_tables.MAX_ASCENSIONS + 1):
+            boss, specialties, stones, mobs = loop_ascension_cost(asc)
+            cost = ascension_cost(asc)
+            if (cost.boss_materials, cost.specialties) != (boss, specialties) or \
+                    not _same(cost.stones, stones) or not _same(cost.mob_materials, mobs):
+                raise CommandError(f'Расхождение для возвышений с {asc}')
+
+        for start in range(cost_tables.MIN_TALENT_LEVEL, cost_tables.MAX_TALENT_LEVEL + 1):
+            for end in range(start, cost_tables.MAX_TALENT_LEVEL + 1):
+                books, mobs, weekly = loop_talent_cost(start, end)
+                cost = talent_cost(start, end)
+                if cost.weekly_materials != weekly or \
+                        not _same(cost.talent_materials, books) or not _same(cost.mob_materials, mobs):
+                    raise CommandError(f'Расхождение для таланта {start} -> {end}')
@@ -0,0 +1,73 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...services.gacha import BANNERS, MAX_COPIES, cumulative, featured_distribution
+
+
+# --- наивная симуляция: крутим по одной, оставлена как эталон для сравнения ---
+
+def simulate_pulls(rules, pity, guaranteed, copies, rng) -> int:
+    pulls = 0
+    for _ in range(copies):
+        while True:
+            pity += 1
+            pulls += 1
+            if rng.random() >= rules.five_star_rate(pity):
+                continue
+            pity = 0
+            if guaranteed or rng.random() < rules.featured_chance:
+                guaranteed = False
+                break
+            guaranteed = True
+    return pulls
+
+
+def simulate_cdf(rules, pity, guaranteed, copies, trials, rng) -> list[float]:
+    counts = [0] * (rules.hard_pity * 2 * copies + 1)
+    for _ in range(trials):
+        counts[simulate_pulls(rules, pity, guaranteed, copies, rng)] += 1
+    return cumulative([count / trials for count in counts])
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает точные распределения круток (gacha) с наивной симуляцией по скорости и точности'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--trials', type=int, default=20000, help='Сколько раз крутить в симуляции')
+        parser.add_argument('--banner', choices=list(BANNERS), default='character')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rules = BANNERS[options['banner']]
+        trials = options['trials']
+        rng = random.Random(options['seed'])
+        # расхождение с симуляцией: ~1/sqrt(trials), с запасом
+        tolerance = 5 / trials ** 0.5
+
+        featured_distribution.cache_clear()
+        start = time.perf_counter()
+        exact = {copies: cumulative(featured_distribution(rules, 0, False, copies))
+                 for copies in range(1, MAX_COPIES + 1)}
+        dp_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for copies in range(1, MAX_COPIES + 1):
+            featured_distribution(rules, 0, False, copies)
+        cached_seconds = time.perf_counter() - start
+
+        sim_seconds = 0.0
+        for copies, cdf in exact.items():
+            start = time.perf_counter()
+            simulated = simulate_cdf(rules, 0, False, copies, trials, rng)
+            sim_seconds += time.perf_counter() - start
+            deviation = max(abs(a - b) for a, b in zip(cdf, simulated))
+            self.stdout.write(f'C{copies - 1}: расхождение cdf {deviation:.4f}')
+            if deviation > tolerance:
+                raise CommandError(f'C{copies - 1}: расхождение {deviation:.4f} больше {tolerance:.4f}')
+
+        self.stdout.write(f'{"DP, C0..C6":<28} {dp_seconds * 1000:10.2f} мс')
+        self.stdout.write(f'{"DP из кэша, C0..C6":<28} {cached_seconds * 1000:10.3f} мс')
+        self.stdout.write(f'{f"симуляция, {trials} x 7":<28} {sim_seconds * 1000:10.2f} мс')
+        self.stdout.write(self.style.SUCCESS(f'ускорение x{sim_seconds / dp_seconds:.1f}'))
@@ -0,0 +1,42 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from ...services.account_export import CHUNK_SIZE, EXPORT_FORMATS, SECTIONS_BY_NAME, export_accounts
+
+
+class Command(BaseCommand):
+    help = ('Выгружает персонажей, планы и инвентарь аккаунтов (все или --user) в JSON Lines, JSON или CSV; '
+            'строки читаются из базы порциями, память не растёт с объёмом')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='users', metavar='USERNAME',
+                            help='Имя пользователя; можно несколько раз. Без него — все аккаунты')
+        parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='jsonl')
+        parser.add_argument('--section', action='append', dest='sections', choices=list(SECTIONS_BY_NAME),
+                            help='Раздел; можно несколько раз. Без него — все')
+        parser.add_argument('--output', help='Файл; без него — в stdout')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Строк за одно чтение из базы')
+
+    def handle(self, *args, **options):
+        users = None
+        if options['users']:
+            users = list(User.objects.filter(username__in=options['users']))
+            missing = set(options['users']) - {user.username for user in users}
+            if missing:
+                raise CommandError(f'Нет пользователей: {", ".join(sorted(missing))}')
+        sections = [SECTIONS_BY_NAME[name] for name in options['sections'] or SECTIONS_BY_NAME]
+
+        chunks = export_accounts(options['format'], users, sections, options['chunk_size'])
+        if not options['output']:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+
+        start = time.perf_counter()
+        with open(options['output'], 'w', encoding='utf-8', newline='') as f:
+            for chunk in chunks:
+                f.write(chunk)
+        self.stderr.write(self.style.SUCCESS(
+            f'Записано в {options["output"]} за {time.perf_counter() - start:.2f} с'))
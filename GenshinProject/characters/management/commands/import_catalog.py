@@ -0,0 +1,61 @@
+import itertools
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...services.catalog_import import SECTIONS_BY_NAME, apply_import, plan_import, read_rows
+
+
+class Command(BaseCommand):
+    help = ('Импортирует справочник (персонажи и материалы) из JSON, JSON Lines или CSV; '
+            'ссылки на мобов и материалы — по имени, существующие строки обновляются')
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+',
+                            help='Файлы справочника: .jsonl и .csv читаются построчно (CSV — по разделу на файл: '
+                                 'mobs.csv, ...), .json — целиком в память; большие справочники лучше в .jsonl')
+        parser.add_argument('--section', choices=list(SECTIONS_BY_NAME),
+                            help='Раздел для CSV, если имя файла с ним не совпадает')
+        parser.add_argument('--dry-run', action='store_true', help='Только показать, что изменится')
+        parser.add_argument('--diff', action='store_true', help='Показать каждую добавленную и изменённую строку')
+
+    def handle(self, *args, **options):
+        paths = [Path(path) for path in options['paths']]
+        for path in paths:
+            if not path.is_file():
+                raise CommandError(f'Нет файла {path}')
+
+        start = time.perf_counter()
+        try:
+            rows = itertools.chain.from_iterable(read_rows(path, options['section']) for path in paths)
+            plan = plan_import(rows)
+        except (ValueError, UnicodeDecodeError) as e:
+            raise CommandError(f'Не удалось прочитать файл: {e}')
+
+        if plan.errors:
+            for message in plan.errors:
+                self.stderr.write(message)
+            raise CommandError(f'Ошибок: {len(plan.errors)}, ничего не записано')
+
+        for diff in plan.diffs:
+            if not (diff.created or diff.updated or diff.unchanged):
+                continue
+            self.stdout.write(f'{diff.section.name:<18} +{len(diff.created)} новых, '
+                              f'~{len(diff.updated)} изменено, ={diff.unchanged} без изменений')
+            if options['diff']:
+                for name in diff.created:
+                    self.stdout.write(self.style.SUCCESS(f'  + {name}'))
+                for name, changes in diff.updated.items():
+                    fields = ', '.join(f'{field}: {old!r} -> {new!r}' for field, (old, new) in changes.items())
+                    self.stdout.write(self.style.WARNING(f'  ~ {name}: {fields}'))
+
+        if options['dry_run']:
+            self.stdout.write('Пробный запуск — ничего не записано')
+            return
+        if not plan.has_changes:
+            self.stdout.write('Изменений нет')
+            return
+
+        apply_import(plan)
+        self.stdout.write(self.style.SUCCESS(f'Справочник обновлён за {time.perf_counter() - start:.2f} с'))
@@ -0,0 +1,49 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from ...models import UserMaterialTotals
+from ...services.materials_calculator import MaterialsCalculator
+from ...services.material_totals import calculate_totals
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает сохранённые итоги материалов пользователей (UserMaterialTotals)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='usernames', help='Только этот пользователь (можно несколько раз)')
+        parser.add_argument('--check', action='store_true', help='Только проверить расхождения, ничего не записывать')
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+
+        calculator = MaterialsCalculator()
+        stored = {
+            row.user_id: (row.totals, row.catalog_version)
+            for row in UserMaterialTotals.objects.filter(user__in=users)
+        }
+
+        drifted = 0
+        for user in users.iterator():
+            if options['check'] and user.id not in stored:
+                continue  # итоги ещё не собирались — их соберут при первом открытии калькулятора
+
+            fresh = calculate_totals(user, calculator)
+            totals, catalog_version = stored.get(user.id, (None, None))
+            if totals == fresh and (options['check'] or catalog_version == calculator.catalog.version):
+                continue
+
+            drifted += 1
+            if options['check']:
+                self.stdout.write(self.style.WARNING(f'{user.username}: итоги расходятся с пересчётом'))
+            else:
+                UserMaterialTotals.objects.update_or_create(
+                    user=user, defaults={'totals': fresh, 'catalog_version': calculator.catalog.version},
+                )
+                self.stdout.write(f'{user.username}: итоги пересчитаны')
+
+        if options['check']:
+            self.stdout.write(self.style.SUCCESS(f'Проверено, расхождений: {drifted}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Пересчитано пользователей: {drifted}'))
@@ -0,0 +1,32 @@
+# Generated by Django 6.1.2 on 2026-10-18 11:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('characters', '0008_alter_userinventory_options_plannedcharacter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='plannedcharacter',
+            options={'verbose_name': 'Планируемый персонаж', 'verbose_name_plural': 'Планируемые персонажи'},
+        ),
+        migrations.CreateModel(
+            name='UserMaterialTotals',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('totals', models.JSONField(default=dict, verbose_name='Потребность')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='material_totals', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Потребность в материалах',
+                'verbose_name_plural': 'Потребности в материалах',
+            },
+        ),
+    ]
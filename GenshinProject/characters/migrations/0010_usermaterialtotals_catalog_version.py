@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-18 11:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('characters', '0009_alter_plannedcharacter_options_usermaterialtotals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usermaterialtotals',
+            name='catalog_version',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='Версия справочника'),
+        ),
+    ]
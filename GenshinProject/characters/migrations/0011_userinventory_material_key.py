@@ -0,0 +1,107 @@
+from django.conf import settings
+from django.db import migrations, models
+
+# старые внешние ключи UserInventory; их имена совпадают со значениями MaterialTypeChoices
+MATERIAL_FIELDS = ['mob_material', 'boss_material', 'weekly_material', 'talent_material', 'stone', 'specialty']
+
+
+def fill_material_key(apps, schema_editor):
+    """
+    Переносим материал из шести внешних ключей в (material_type, material_id).
+    Дубликаты (unique_together по nullable-полям их не ловил) сливаем в одну строку:
+    остаётся последняя запись, потому что количество всегда перезаписывалось целиком.
+    """
+    UserInventory = apps.get_model('characters', 'UserInventory')
+
+    seen = set()
+    to_delete = []
+    for inv in UserInventory.objects.order_by('-id'):
+        for field in MATERIAL_FIELDS:
+            material_id = getattr(inv, field + '_id')
+            if material_id is not None:
+                inv.material_type = field
+                inv.material_id = material_id
+                break
+        else:
+            to_delete.append(inv.id)  # материал был удалён (SET_NULL) — строка ни на что не ссылается
+            continue
+
+        key = (inv.user_id, inv.material_type, inv.material_id)
+        if key in seen:
+            to_delete.append(inv.id)
+            continue
+        seen.add(key)
+        inv.save(update_fields=['material_type', 'material_id'])
+
+    UserInventory.objects.filter(id__in=to_delete).delete()
+
+
+def fill_material_fields(apps, schema_editor):
+    UserInventory = apps.get_model('characters', 'UserInventory')
+    for inv in UserInventory.objects.all():
+        setattr(inv, inv.material_type + '_id', inv.material_id)
+        inv.save(update_fields=[inv.material_type])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('characters', '0010_usermaterialtotals_catalog_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='userinventory',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='userinventory',
+            name='material_id',
+            field=models.PositiveIntegerField(null=True, verbose_name='ID материала'),
+        ),
+        migrations.AddField(
+            model_name='userinventory',
+            name='material_type',
+            field=models.CharField(choices=[('mob_material', 'Материал моба'), ('boss_material', 'Материал босса'), ('weekly_material', 'Еженедельный материал'), ('talent_material', 'Книга талантов'), ('stone', 'Камень'), ('specialty', 'Диковинка')], max_length=20, null=True, verbose_name='Тип материала'),
+        ),
+        migrations.RunPython(fill_material_key, fill_material_fields),
+        migrations.AlterField(
+            model_name='userinventory',
+            name='material_id',
+            field=models.PositiveIntegerField(verbose_name='ID материала'),
+        ),
+        migrations.AlterField(
+            model_name='userinventory',
+            name='material_type',
+            field=models.CharField(choices=[('mob_material', 'Материал моба'), ('boss_material', 'Материал босса'), ('weekly_material', 'Еженедельный материал'), ('talent_material', 'Книга талантов'), ('stone', 'Камень'), ('specialty', 'Диковинка')], max_length=20, verbose_name='Тип материала'),
+        ),
+        migrations.AddConstraint(
+            model_name='userinventory',
+            constraint=models.UniqueConstraint(fields=('user', 'material_type', 'material_id'), name='unique_user_material'),
+        ),
+        migrations.RemoveField(
+            model_name='userinventory',
+            name='boss_material',
+        ),
+        migrations.RemoveField(
+            model_name='userinventory',
+            name='mob_material',
+        ),
+        migrations.RemoveField(
+            model_name='userinventory',
+            name='specialty',
+        ),
+        migrations.RemoveField(
+            model_name='userinventory',
+            name='stone',
+        ),
+        migrations.RemoveField(
+            model_name='userinventory',
+            name='talent_material',
+        ),
+        migrations.RemoveField(
+            model_name='userinventory',
+            name='weekly_material',
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.1.2 on 2026-10-18 12:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('characters', '0011_userinventory_material_key'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='character',
+            index=models.Index(fields=['region', 'element', 'talent_weekday'], name='character_region_element_day'),
+        ),
+        migrations.AddIndex(
+            model_name='character',
+            index=models.Index(fields=['element', 'talent_weekday'], name='character_element_day'),
+        ),
+        migrations.AddIndex(
+            model_name='character',
+            index=models.Index(fields=['name', 'id'], name='character_name_id'),
+        ),
+    ]
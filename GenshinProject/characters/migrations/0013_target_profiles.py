@@ -0,0 +1,60 @@
+# Generated by Django 6.1.2 on 2026-10-18 12:11
+
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('characters', '0012_character_filter_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plannedcharacter',
+            name='target_level',
+            field=models.IntegerField(default=90, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(90)], verbose_name='Целевой уровень'),
+        ),
+        migrations.AddField(
+            model_name='usercharacter',
+            name='target_level',
+            field=models.IntegerField(default=90, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(90)], verbose_name='Целевой уровень'),
+        ),
+        migrations.CreateModel(
+            name='TargetProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Название')),
+                ('target_level', models.IntegerField(default=90, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(90)], verbose_name='Целевой уровень')),
+                ('target_talent_levels', models.JSONField(default=list, verbose_name='Целевые уровни талантов')),
+                ('is_default', models.BooleanField(default=False, verbose_name='По умолчанию')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='target_profiles', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Профиль целей',
+                'verbose_name_plural': 'Профили целей',
+            },
+        ),
+        migrations.AddField(
+            model_name='plannedcharacter',
+            name='target_profile',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='characters.targetprofile', verbose_name='Профиль целей'),
+        ),
+        migrations.AddField(
+            model_name='usercharacter',
+            name='target_profile',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='characters.targetprofile', verbose_name='Профиль целей'),
+        ),
+        migrations.AddConstraint(
+            model_name='targetprofile',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='unique_user_target_profile'),
+        ),
+        migrations.AddConstraint(
+            model_name='targetprofile',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_default', True)), fields=('user',), name='unique_user_default_target_profile'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 6.1.2 on 2026-10-18 12:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('characters', '0013_target_profiles'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='bossmaterial',
+            name='name',
+            field=models.CharField(max_length=200, unique=True, verbose_name='Название'),
+        ),
+        migrations.AlterField(
+            model_name='character',
+            name='name',
+            field=models.CharField(max_length=100, unique=True, verbose_name='Имя'),
+        ),
+        migrations.AlterField(
+            model_name='mobmaterial',
+            name='name',
+            field=models.CharField(max_length=200, unique=True, verbose_name='Название'),
+        ),
+        migrations.AlterField(
+            model_name='specialty',
+            name='name',
+            field=models.CharField(max_length=200, unique=True, verbose_name='Название'),
+        ),
+        migrations.AlterField(
+            model_name='stone',
+            name='name',
+            field=models.CharField(max_length=200, unique=True, verbose_name='Название'),
+        ),
+        migrations.AlterField(
+            model_name='talentmaterial',
+            name='name',
+            field=models.CharField(max_length=200, unique=True, verbose_name='Название'),
+        ),
+        migrations.AlterField(
+            model_name='weeklymaterial',
+            name='name',
+            field=models.CharField(max_length=200, unique=True, verbose_name='Название'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_table(apps, schema_editor):
+    # таблица для DatabaseCache из settings.CACHES; если она уже есть, команда ничего не делает
+    call_command('createcachetable', database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('characters', '0014_catalog_natural_keys'),
+    ]
+
+    operations = [
+        # при откате таблица остаётся: она нужна кэшу, а не моделям
+        migrations.RunPython(create_cache_table, migrations.RunPython.noop),
+    ]
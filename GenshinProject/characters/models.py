@@ -28,7 +28,7 @@ class WeekChoices(models.IntegerChoices):
     WEDNESDAY = 3, 'Среда'
 
 class Character(models.Model):
-    name = models.CharField("Имя", max_length=100)
+    name = models.CharField("Имя", max_length=100, unique=True)
     region = models.CharField("Регион", max_length=2, choices=RegionChoices.choices)
     element = models.CharField("Элемент", max_length=1, choices=ElementChoices.choices)
     weekly_material = models.ForeignKey('WeeklyMaterial', verbose_name="Еженедельный материал", on_delete=models.PROTECT, null=True)
@@ -81,11 +81,18 @@ class Character(models.Model):
     class Meta:
         verbose_name = 'Персонаж'
         verbose_name_plural = 'Персонажи'
+        indexes = [
+            # фильтры списка персонажей: регион, затем элемент, затем день книг
+            models.Index(fields=['region', 'element', 'talent_weekday'], name='character_region_element_day'),
+            models.Index(fields=['element', 'talent_weekday'], name='character_element_day'),
+            # keyset-пагинация: (поле сортировки, id)
+            models.Index(fields=['name', 'id'], name='character_name_id'),
+        ]
 
 
 
 class WeeklyMaterial(models.Model):
-    name = models.CharField("Название", max_length=200, db_index=True)
+    name = models.CharField("Название", max_length=200, unique=True)
     boss_name = models.CharField("Название босса", max_length=200)
 
     def __str__(self):
@@ -97,7 +104,7 @@ class WeeklyMaterial(models.Model):
 
 
 class BossMaterial(models.Model):
-    name = models.CharField("Название", max_length=200, db_index=True)
+    name = models.CharField("Название", max_length=200, unique=True)
     boss_name = models.CharField("Название босса", max_length=200)
 
     def __str__(self):
@@ -109,7 +116,7 @@ class BossMaterial(models.Model):
 
 
 class TalentMaterial(models.Model):
-    name = models.CharField("Название", max_length=200, db_index=True)
+    name = models.CharField("Название", max_length=200, unique=True)
     region = models.CharField("Регион", max_length=2, choices=RegionChoices.choices)
     rarity = models.IntegerField(
         validators=[
@@ -133,7 +140,7 @@ class TalentMaterial(models.Model):
 
 
 class Specialty(models.Model):
-    name = models.CharField("Название", max_length=200, db_index=True)
+    name = models.CharField("Название", max_length=200, unique=True)
     region = models.CharField("Регион", max_length=2, choices=RegionChoices.choices)
 
     def __str__(self):
@@ -145,7 +152,7 @@ class Specialty(models.Model):
 
 
 class Stone(models.Model):
-    name = models.CharField("Название", max_length=200, db_index=True)
+    name = models.CharField("Название", max_length=200, unique=True)
     element = models.CharField("Элемент", max_length=1, choices=ElementChoices.choices)
     rarity = models.IntegerField(
         validators=[
@@ -176,7 +183,7 @@ class Mob(models.Model):
 
 
 class MobMaterial(models.Model):
-    name = models.CharField("Название", max_length=200, db_index=True)
+    name = models.CharField("Название", max_length=200, unique=True)
     mob_name = models.ForeignKey(Mob, on_delete=models.CASCADE, verbose_name="Название моба", max_length=200, db_index=True)
     rarity = models.IntegerField(
         validators=[
@@ -195,6 +202,46 @@ class MobMaterial(models.Model):
         verbose_name_plural = 'Материалы мобов'
 
 
+class TargetProfile(models.Model):
+    """Профиль целей прокачки, например «поддержка 80/8/8/8» или «мейн 90/10/10/10»"""
+    user = models.ForeignKey(User, verbose_name="Пользователь", on_delete=models.CASCADE,
+                             related_name='target_profiles')
+    name = models.CharField("Название", max_length=100)
+    target_level = models.IntegerField(
+        validators=[
+            MinValueValidator(1),
+            MaxValueValidator(90)
+        ],
+        default=90,
+        verbose_name='Целевой уровень'
+    )
+    target_talent_levels = models.JSONField(default=list, verbose_name='Целевые уровни талантов')
+    # профиль по умолчанию задаёт цель для ещё не полученных персонажей в калькуляторе
+    is_default = models.BooleanField(default=False, verbose_name='По умолчанию')
+
+    def get_target_talent_levels(self):
+        """Получить целевые уровни как список"""
+        return self.target_talent_levels or []
+
+    def set_target_talent_levels(self, levels):
+        """Установить целевые уровни [normal, skill, burst]"""
+        if len(levels) != 3:
+            raise ValueError("Нужно ровно 3 числа (1-10)")
+        self.target_talent_levels = [max(1, min(10, int(x))) for x in levels]
+
+    def __str__(self):
+        return f"{self.name} ({self.target_level}/{'/'.join(map(str, self.get_target_talent_levels()))})"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'], name='unique_user_target_profile'),
+            models.UniqueConstraint(fields=['user'], condition=models.Q(is_default=True),
+                                    name='unique_user_default_target_profile'),
+        ]
+        verbose_name = 'Профиль целей'
+        verbose_name_plural = 'Профили целей'
+
+
 class UserCharacter(models.Model):
     name = models.ForeignKey("Character", verbose_name="Имя",
                                         on_delete=models.PROTECT, null=True)
@@ -209,6 +256,17 @@ class UserCharacter(models.Model):
     is_ascended = models.BooleanField(default=False, verbose_name='Возвышен')
     talent_levels = models.JSONField(default=list, verbose_name='Уровни талантов')
     target_talent_levels = models.JSONField(default=list, verbose_name='Целевые уровни талантов')
+    target_level = models.IntegerField(
+        validators=[
+            MinValueValidator(1),
+            MaxValueValidator(90)
+        ],
+        default=90,
+        verbose_name='Целевой уровень'
+    )
+    # цели копируются из профиля при назначении и при его изменении
+    target_profile = models.ForeignKey(TargetProfile, verbose_name="Профиль целей",
+                                       on_delete=models.SET_NULL, null=True, blank=True)
     user = models.ForeignKey(User, verbose_name="Пользователь",
                                         on_delete=models.CASCADE, null=True)
 
@@ -249,6 +307,16 @@ class PlannedCharacter(models.Model):
     is_ascended = False
     talent_levels = [1, 1, 1]
     target_talent_levels = models.JSONField(default=list, verbose_name='Целевые уровни талантов')
+    target_level = models.IntegerField(
+        validators=[
+            MinValueValidator(1),
+            MaxValueValidator(90)
+        ],
+        default=90,
+        verbose_name='Целевой уровень'
+    )
+    target_profile = models.ForeignKey(TargetProfile, verbose_name="Профиль целей",
+                                       on_delete=models.SET_NULL, null=True, blank=True)
     user = models.ForeignKey(User, verbose_name="Пользователь",
                                         on_delete=models.CASCADE, null=True)
 
@@ -270,71 +338,109 @@ class PlannedCharacter(models.Model):
         verbose_name_plural = 'Планируемые персонажи'
 
 
+class MaterialTypeChoices(models.TextChoices):
+    MOB_MATERIAL = 'mob_material', 'Материал моба'
+    BOSS_MATERIAL = 'boss_material', 'Материал босса'
+    WEEKLY_MATERIAL = 'weekly_material', 'Еженедельный материал'
+    TALENT_MATERIAL = 'talent_material', 'Книга талантов'
+    STONE = 'stone', 'Камень'
+    SPECIALTY = 'specialty', 'Диковинка'
+
+
+# тип материала -> модель справочника
+MATERIAL_MODELS = {
+    MaterialTypeChoices.MOB_MATERIAL: MobMaterial,
+    MaterialTypeChoices.BOSS_MATERIAL: BossMaterial,
+    MaterialTypeChoices.WEEKLY_MATERIAL: WeeklyMaterial,
+    MaterialTypeChoices.TALENT_MATERIAL: TalentMaterial,
+    MaterialTypeChoices.STONE: Stone,
+    MaterialTypeChoices.SPECIALTY: Specialty,
+}
+
+
+def get_material_key(material) -> tuple[str, int] | None:
+    """Ключ материала (тип, id) — например ('stone', 12)"""
+    for material_type, model in MATERIAL_MODELS.items():
+        if isinstance(material, model):
+            return material_type.value, material.id
+    return None
+
+
 class UserInventory(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='inventory')
 
-    # Связь с конкретными моделями материалов
-    mob_material = models.ForeignKey('MobMaterial', on_delete=models.SET_NULL, null=True, blank=True)
-    boss_material = models.ForeignKey('BossMaterial', on_delete=models.SET_NULL, null=True, blank=True)
-    weekly_material = models.ForeignKey('WeeklyMaterial', on_delete=models.SET_NULL, null=True, blank=True)
-    talent_material = models.ForeignKey('TalentMaterial', on_delete=models.SET_NULL, null=True, blank=True)
-    stone = models.ForeignKey('Stone', on_delete=models.SET_NULL, null=True, blank=True)
-    specialty = models.ForeignKey('Specialty', on_delete=models.SET_NULL, null=True, blank=True)
+    # материал задаётся ключом (тип, id) — например ('stone', 12)
+    material_type = models.CharField("Тип материала", max_length=20, choices=MaterialTypeChoices.choices)
+    material_id = models.PositiveIntegerField("ID материала")
 
     count = models.IntegerField(default=0, validators=[MinValueValidator(0)])
 
     class Meta:
-        unique_together = ('user', 'mob_material', 'boss_material', 'weekly_material', 'talent_material', 'stone',
-                           'specialty')
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'material_type', 'material_id'], name='unique_user_material'),
+        ]
         verbose_name='Пользовательский материал'
         verbose_name_plural='Пользовательский инвентарь'
 
+    def get_material(self):
+        """Материал из справочника"""
+        model = MATERIAL_MODELS.get(self.material_type)
+        if model is None:
+            return None
+        return model.objects.filter(pk=self.material_id).first()
+
     def get_material_name(self):
         """Для шаблона — название материала"""
-        if self.mob_material:
-            return self.mob_material.name
-        elif self.boss_material:
-            return self.boss_material.name
-        elif self.weekly_material:
-            return self.weekly_material.name
-        elif self.talent_material:
-            return self.talent_material.name
-        elif self.stone:
-            return self.stone.name
-        elif self.specialty:
-            return self.specialty.name
-
-        return "Неизвестно"
+        material = self.get_material()
+        return material.name if material else "Неизвестно"
 
     def get_material_type(self):
         """Тип материала для группировки"""
-        if self.mob_material: return "MobMaterial"
-        if self.boss_material: return "BossMaterial"
-        if self.weekly_material: return "WeeklyMaterial"
-        if self.talent_material: return "TalentMaterial"
-        if self.stone: return "Stone"
-        if self.specialty: return "Specialty"
-        return "Unknown"
+        model = MATERIAL_MODELS.get(self.material_type)
+        return model.__name__ if model else "Unknown"
+
+    @classmethod
+    def get_inventory_map(cls, user: User) -> dict[tuple[str, int], int]:
+        """
+        Весь инвентарь пользователя одним запросом: {(тип, id): количество}
+        """
+        return {
+            (material_type, material_id): count
+            for material_type, material_id, count in
+            cls.objects.filter(user=user).values_list('material_type', 'material_id', 'count')
+        }
 
     @classmethod
-    def get_material_count(cls, user: User, material) -> int:
-        """Получить количество материала в инвентаре пользователя"""
-        if isinstance(material, MobMaterial):
-            inv = cls.objects.filter(user=user, mob_material=material).first()
-        elif isinstance(material, BossMaterial):
-            inv = cls.objects.filter(user=user, boss_material=material).first()
-        elif isinstance(material, WeeklyMaterial):
-            inv = cls.objects.filter(user=user, weekly_material=material).first()
-        elif isinstance(material, TalentMaterial):
-            inv = cls.objects.filter(user=user, talent_material=material).first()
-        elif isinstance(material, Stone):
-            inv = cls.objects.filter(user=user, stone=material).first()
-        elif isinstance(material, Specialty):
-            inv = cls.objects.filter(user=user, specialty=material).first()
-        else:
-            return 0
-
-        return inv.count if inv else 0
+    def set_material_counts(cls, user: User, counts: dict[tuple[str, int], int]) -> None:
+        """Записать сразу много материалов: {(тип, id): количество} — один INSERT ... ON CONFLICT"""
+        cls.objects.bulk_create(
+            [
+                cls(user=user, material_type=material_type, material_id=material_id, count=count)
+                for (material_type, material_id), count in counts.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['user', 'material_type', 'material_id'],
+            update_fields=['count'],
+        )
 
     def __str__(self):
         return f"{self.get_material_name()} ({self.get_material_type()}) - {self.count} шт."
+
+
+class UserMaterialTotals(models.Model):
+    """
+    Суммарная потребность в материалах по всем персонажам пользователя.
+    Обновляется на разницу (было/стало) при каждом изменении одного персонажа.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='material_totals')
+    # {тип материала: {id: [количество, сколько персонажей его используют]}}
+    totals = models.JSONField(default=dict, verbose_name='Потребность')
+    # версия справочника, по которой посчитаны итоги; при смене версии итоги пересчитываются
+    catalog_version = models.BigIntegerField(null=True, blank=True, verbose_name='Версия справочника')
+
+    class Meta:
+        verbose_name = 'Потребность в материалах'
+        verbose_name_plural = 'Потребности в материалах'
+
+    def __str__(self):
+        return f"{self.user} - {sum(len(group) for group in self.totals.values())} материалов"
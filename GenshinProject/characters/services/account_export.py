@@ -0,0 +1,176 @@
+"""
+Потоковая выгрузка данных аккаунтов: персонажи, планы и инвентарь.
+
+Строки читаются из базы через .iterator(chunk_size=...) и сразу превращаются в текст,
+поэтому память не зависит от объёма выгрузки — хоть один аккаунт, хоть все для бэкапа.
+Генераторы отдаются в StreamingHttpResponse или пишутся в файл из команды export_accounts.
+
+Форматы: JSON Lines (строка — объект с полем "section", как у import_catalog),
+JSON ({"раздел": [строки]}, собирается по кусочку) и CSV (одна таблица, колонка section
+и объединение колонок всех разделов).
+"""
+import csv
+import dataclasses
+import json
+from collections.abc import Callable, Iterable, Iterator
+
+from django.contrib.auth.models import User
+from django.db.models import QuerySet
+
+from ..models import UserCharacter, PlannedCharacter, UserInventory
+from .catalog import CatalogSnapshot
+from .catalog_cache import get_catalog
+
+CHUNK_SIZE = 2000
+EXPORT_FORMATS = {
+    'jsonl': 'application/x-ndjson',
+    'json': 'application/json',
+    'csv': 'text/csv',
+}
+
+
+@dataclasses.dataclass(frozen=True)
+class ExportSection:
+    name: str
+    columns: tuple[str, ...]
+    queryset: Callable[[], QuerySet]
+    to_row: Callable[[object, CatalogSnapshot], dict]
+
+
+def _character_row(character: UserCharacter, catalog: CatalogSnapshot) -> dict:
+    return {
+        'user': character.user.username if character.user else None,
+        'character': character.name.name if character.name else None,
+        'level': character.level,
+        'is_ascended': character.is_ascended,
+        'talent_levels': character.get_talent_levels(),
+        'target_level': character.target_level,
+        'target_talent_levels': character.get_target_talent_levels(),
+        'target_profile': character.target_profile.name if character.target_profile else None,
+    }
+
+
+def _planned_row(planned: PlannedCharacter, catalog: CatalogSnapshot) -> dict:
+    return {
+        'user': planned.user.username if planned.user else None,
+        'character': planned.name.name if planned.name else None,
+        'target_level': planned.target_level,
+        'target_talent_levels': planned.get_target_talent_levels(),
+        'target_profile': planned.target_profile.name if planned.target_profile else None,
+    }
+
+
+def _inventory_row(item: UserInventory, catalog: CatalogSnapshot) -> dict:
+    # названия — из снимка справочника, а не запросом на каждую строку (как get_material_name)
+    material = catalog.get_material(item.material_type, item.material_id)
+    return {
+        'user': item.user.username,
+        'material_type': item.material_type,
+        'material_id': item.material_id,
+        'material': material.name if material else None,
+        'count': item.count,
+    }
+
+
+SECTIONS = (
+    ExportSection(
+        'characters',
+        ('user', 'character', 'level', 'is_ascended', 'talent_levels',
+         'target_level', 'target_talent_levels', 'target_profile'),
+        lambda: UserCharacter.objects.select_related('user', 'name', 'target_profile').only(
+            'level', 'is_ascended', 'talent_levels', 'target_level', 'target_talent_levels',
+            'user__username', 'name__name', 'target_profile__name',
+        ),
+        _character_row,
+    ),
+    ExportSection(
+        'planned',
+        ('user', 'character', 'target_level', 'target_talent_levels', 'target_profile'),
+        lambda: PlannedCharacter.objects.select_related('user', 'name', 'target_profile').only(
+            'target_level', 'target_talent_levels', 'user__username', 'name__name', 'target_profile__name',
+        ),
+        _planned_row,
+    ),
+    ExportSection(
+        'inventory',
+        ('user', 'material_type', 'material_id', 'material', 'count'),
+        lambda: UserInventory.objects.select_related('user').only(
+            'material_type', 'material_id', 'count', 'user__username',
+        ),
+        _inventory_row,
+    ),
+)
+SECTIONS_BY_NAME = {section.name: section for section in SECTIONS}
+CSV_COLUMNS = ('section', *dict.fromkeys(column for section in SECTIONS for column in section.columns))
+
+
+def iter_section_rows(section: ExportSection, catalog: CatalogSnapshot, users: Iterable[User] | None = None,
+                      chunk_size: int = CHUNK_SIZE) -> Iterator[dict]:
+    """Строки раздела по пользователям; users=None — все аккаунты"""
+    queryset = section.queryset()
+    if users is not None:
+        queryset = queryset.filter(user__in=users)
+    # порядок по (user, id) — у всех пользователей данные идут подряд
+    for obj in queryset.order_by('user_id', 'id').iterator(chunk_size=chunk_size):
+        yield section.to_row(obj, catalog)
+
+
+def iter_rows(catalog: CatalogSnapshot, users: Iterable[User] | None = None,
+              sections: Iterable[ExportSection] = SECTIONS,
+              chunk_size: int = CHUNK_SIZE) -> Iterator[tuple[ExportSection, dict]]:
+    for section in sections:
+        for row in iter_section_rows(section, catalog, users, chunk_size):
+            yield section, row
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, ensure_ascii=False)
+
+
+def export_jsonl(catalog, users=None, sections=SECTIONS, chunk_size=CHUNK_SIZE) -> Iterator[str]:
+    for section, row in iter_rows(catalog, users, sections, chunk_size):
+        yield _dumps({'section': section.name, **row}) + '\n'
+
+
+def export_json(catalog, users=None, sections=SECTIONS, chunk_size=CHUNK_SIZE) -> Iterator[str]:
+    """{"раздел": [...], ...} по одной строке за раз — документ целиком в памяти не собирается"""
+    yield '{'
+    for number, section in enumerate(sections):
+        yield f'{", " if number else ""}{_dumps(section.name)}: ['
+        for index, row in enumerate(iter_section_rows(section, catalog, users, chunk_size)):
+            yield (',\n ' if index else '\n ') + _dumps(row)
+        yield '\n]'
+    yield '}\n'
+
+
+class _Echo:
+    """Псевдофайл для csv.writer: writerow возвращает строку вместо записи"""
+
+    def write(self, value):
+        return value
+
+
+def export_csv(catalog, users=None, sections=SECTIONS, chunk_size=CHUNK_SIZE) -> Iterator[str]:
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    for section, row in iter_rows(catalog, users, sections, chunk_size):
+        # списки уровней — JSON в одной ячейке
+        values = {'section': section.name, **{
+            column: _dumps(value) if isinstance(value, list) else value for column, value in row.items()
+        }}
+        yield writer.writerow([values.get(column) for column in CSV_COLUMNS])
+
+
+EXPORTERS = {
+    'jsonl': export_jsonl,
+    'json': export_json,
+    'csv': export_csv,
+}
+
+
+def export_accounts(export_format: str, users: Iterable[User] | None = None,
+                    sections: Iterable[ExportSection] = SECTIONS, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """Выгрузка в формате export_format кусками текста; users=None — все аккаунты"""
+    # один снимок справочника на всю выгрузку: без обращения к кэшу на каждую строку
+    # и без смеси двух версий справочника в одном файле
+    return EXPORTERS[export_format](get_catalog(), users, tuple(sections), chunk_size)
@@ -0,0 +1,77 @@
+from collections import defaultdict
+
+from ..models import Character, Stone, TalentMaterial, MobMaterial, get_material_key
+
+
+class CatalogSnapshot:
+    """
+    Снимок справочника материалов в памяти.
+    Строится одним набором запросов, дальше все материалы персонажа берутся из словарей.
+    """
+
+    def __init__(self, characters, stones, talent_materials, mob_materials, version: int | None = None):
+        # версия справочника, из которой собран снимок (см. catalog_cache)
+        self.version = version
+        self.characters: dict[int, Character] = {ch.id: ch for ch in characters}
+
+        # (элемент, редкость) -> камень
+        self.stones: dict[tuple[str, int], Stone] = {
+            (stone.element, stone.rarity): stone for stone in stones
+        }
+        # (регион, день недели, редкость) -> книга
+        self.talent_materials: dict[tuple[str, int, int], TalentMaterial] = {
+            (book.region, book.weekday, book.rarity): book for book in talent_materials
+        }
+        # (id моба, редкость) -> материал моба
+        self.mob_materials: dict[tuple[int, int], MobMaterial] = {
+            (material.mob_name_id, material.rarity): material for material in mob_materials
+        }
+
+        # (тип, id) -> материал, для восстановления материалов по ключу
+        self.materials: dict[tuple[str, int], object] = {}
+        for material in [*self.stones.values(), *self.talent_materials.values(), *self.mob_materials.values()]:
+            self.materials[get_material_key(material)] = material
+        for character in self.characters.values():
+            for material in (character.boss_material, character.specialty, character.weekly_material):
+                if material is not None:
+                    self.materials[get_material_key(material)] = material
+
+        # те же материалы, сгруппированные по персонажу, в порядке редкости
+        self._stones_by_element = defaultdict(list)
+        for (element, rarity), stone in sorted(self.stones.items()):
+            self._stones_by_element[element].append(stone)
+        self._books_by_day = defaultdict(list)
+        for (region, weekday, rarity), book in sorted(self.talent_materials.items()):
+            self._books_by_day[(region, weekday)].append(book)
+        self._materials_by_mob = defaultdict(list)
+        for (mob_id, rarity), material in sorted(self.mob_materials.items()):
+            self._materials_by_mob[mob_id].append(material)
+
+    @classmethod
+    def build(cls, version: int | None = None) -> 'CatalogSnapshot':
+        """Загружает весь справочник: по одному запросу на таблицу"""
+        return cls(
+            characters=Character.objects.select_related('weekly_material', 'boss_material', 'specialty', 'mob'),
+            stones=Stone.objects.all(),
+            talent_materials=TalentMaterial.objects.all(),
+            mob_materials=MobMaterial.objects.select_related('mob_name'),
+            version=version,
+        )
+
+    def get_character(self, character_id: int) -> Character | None:
+        return self.characters.get(character_id)
+
+    def get_material(self, material_type: str, material_id: int):
+        return self.materials.get((material_type, material_id))
+
+    def get_stones(self, character: Character) -> list[Stone]:
+        """Камни возвышения персонажа (по возрастанию редкости)"""
+        return self._stones_by_element.get(character.element, [])
+
+    def get_talent_materials(self, character: Character) -> list[TalentMaterial]:
+        """Книги талантов персонажа (по возрастанию редкости)"""
+        return self._books_by_day.get((character.region, character.talent_weekday), [])
+
+    def get_mob_materials(self, character: Character) -> list[MobMaterial]:
+        """Материалы моба персонажа (по возрастанию редкости)"""
+        return self._materials_by_mob.get(character.mob_id, [])
@@ -0,0 +1,73 @@
+"""
+Кэш справочника на уровне процесса.
+
+Справочник меняется только из админки, поэтому каждый процесс держит свой CatalogSnapshot
+и перечитывает его, только когда меняется общая версия справочника.
+Версия хранится в отдельном кэше Django 'versions', общем для всех воркеров (см. settings.CACHES),
+и её меняют сигналы post_save/post_delete моделей справочника после коммита — так все воркеры
+видят изменение и не собирают снимок из ещё не записанных строк.
+"""
+import threading
+import time
+
+from django.core.cache import caches
+
+from .catalog import CatalogSnapshot
+
+VERSIONS_CACHE = 'versions'
+CATALOG_VERSION_KEY = 'characters:catalog_version'
+
+_lock = threading.Lock()
+_snapshot: CatalogSnapshot | None = None
+_snapshot_version: int | None = None
+_stats = {'hits': 0, 'misses': 0}
+
+
+def versions_cache():
+    """Кэш версий справочника и данных пользователей"""
+    return caches[VERSIONS_CACHE]
+
+
+def get_catalog_version() -> int:
+    cache = versions_cache()
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # начинаем со времени, а не с нуля: после сброса кэша версия не совпадёт с прежними
+        cache.add(CATALOG_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version() -> None:
+    """Справочник изменился — все процессы перечитают его при следующем обращении"""
+    # новое значение, а не incr: в DatabaseCache incr — это get + set,
+    # и два одновременных изменения получили бы одну версию
+    versions_cache().set(CATALOG_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def get_catalog() -> CatalogSnapshot:
+    """Актуальный снимок справочника; загружает его заново только после смены версии"""
+    global _snapshot, _snapshot_version
+
+    version = get_catalog_version()
+    with _lock:
+        if _snapshot is not None and _snapshot_version == version:
+            _stats['hits'] += 1
+            return _snapshot
+        _stats['misses'] += 1
+
+    snapshot = CatalogSnapshot.build(version=version)
+    with _lock:
+        _snapshot, _snapshot_version = snapshot, version
+    return snapshot
+
+
+def get_catalog_stats() -> dict:
+    """Счётчики попаданий/промахов этого процесса — для мониторинга"""
+    with _lock:
+        return {
+            'hits': _stats['hits'],
+            'misses': _stats['misses'],
+            'loaded_version': _snapshot_version,
+            'current_version': versions_cache().get(CATALOG_VERSION_KEY),
+        }
@@ -0,0 +1,227 @@
+"""
+Массовый импорт справочника из файла.
+
+Форматы: JSON ({"раздел": [строки]}), JSON Lines (строка — объект с полем "section")
+и CSV (раздел — по имени файла: mobs.csv, characters.csv, ...). JSON Lines и CSV читаются
+построчно, JSON — целиком, поэтому для больших справочников лучше JSON Lines. Поля строк — поля модели,
+ссылки на мобов и материалы задаются именем (естественный ключ, name уникален).
+
+Сначала строится план: что добавится и что изменится (для --dry-run и --diff), потом разделы
+пишутся в порядке зависимостей через bulk_create(update_conflicts=True) в одной транзакции.
+"""
+import csv
+import dataclasses
+import json
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from ..models import Character, Stone, TalentMaterial, Mob, MobMaterial, BossMaterial, WeeklyMaterial, Specialty
+from .catalog_cache import bump_catalog_version
+
+BATCH_SIZE = 500
+MAX_ERRORS = 50  # дальше ошибки не собираются — файл всё равно надо исправлять
+
+
+@dataclasses.dataclass(frozen=True)
+class CatalogSection:
+    name: str
+    model: type
+    fields: tuple[str, ...] = ()  # поля, кроме name
+    foreign_keys: tuple[tuple[str, type], ...] = ()  # поле -> модель, на которую оно ссылается по имени
+
+    @property
+    def update_fields(self) -> list[str]:
+        return [*self.fields, *(field for field, _ in self.foreign_keys)]
+
+
+# в порядке зависимостей: сначала то, на что ссылаются
+SECTIONS = (
+    CatalogSection('mobs', Mob),
+    CatalogSection('mob_materials', MobMaterial, ('rarity',), (('mob_name', Mob),)),
+    CatalogSection('boss_materials', BossMaterial, ('boss_name',)),
+    CatalogSection('weekly_materials', WeeklyMaterial, ('boss_name',)),
+    CatalogSection('specialties', Specialty, ('region',)),
+    CatalogSection('stones', Stone, ('element', 'rarity')),
+    CatalogSection('talent_materials', TalentMaterial, ('region', 'rarity', 'weekday')),
+    CatalogSection('characters', Character, ('region', 'element', 'talent_weekday'), (
+        ('weekly_material', WeeklyMaterial),
+        ('boss_material', BossMaterial),
+        ('specialty', Specialty),
+        ('mob', Mob),
+    )),
+)
+SECTIONS_BY_NAME = {section.name: section for section in SECTIONS}
+
+
+@dataclasses.dataclass
+class SectionDiff:
+    section: CatalogSection
+    # имя -> значения полей (ссылки — именами)
+    rows: dict[str, dict] = dataclasses.field(default_factory=dict)
+    created: list[str] = dataclasses.field(default_factory=list)
+    # имя -> {поле: (было, стало)}
+    updated: dict[str, dict[str, tuple]] = dataclasses.field(default_factory=dict)
+    unchanged: int = 0
+
+    @property
+    def changed_names(self) -> list[str]:
+        return [*self.created, *self.updated]
+
+
+@dataclasses.dataclass
+class ImportPlan:
+    diffs: list[SectionDiff]
+    errors: list[str]
+
+    @property
+    def has_changes(self) -> bool:
+        return any(diff.created or diff.updated for diff in self.diffs)
+
+
+def read_rows(path: Path, section: str | None = None) -> Iterator[tuple[str | None, dict]]:
+    """
+    Строки файла как (раздел, строка). CSV и JSON Lines читаются построчно,
+    JSON — целиком в память, поэтому большие справочники лучше грузить в JSON Lines.
+    ValueError — файл не того вида (с номером строки для JSON Lines).
+    """
+    suffix = path.suffix.lower()
+    if suffix == '.csv':
+        with path.open(newline='', encoding='utf-8-sig') as f:
+            for row in csv.DictReader(f):
+                yield section or path.stem, row
+    elif suffix == '.jsonl':
+        with path.open(encoding='utf-8') as f:
+            for number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    raise ValueError(f'{path.name}, строка {number}: {e}')
+                if not isinstance(row, dict):
+                    raise ValueError(f'{path.name}, строка {number}: нужен объект {{"section": ..., "name": ...}}')
+                yield row.pop('section', section), row
+    else:
+        with path.open(encoding='utf-8') as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError(f'{path.name}: нужен объект {{"раздел": [строки]}}')
+        for section_name, rows in data.items():
+            if not isinstance(rows, list):
+                raise ValueError(f'{path.name}: раздел {section_name!r} должен быть списком')
+            for number, row in enumerate(rows, start=1):
+                if not isinstance(row, dict):
+                    raise ValueError(f'{path.name}: {section_name}, строка {number} должна быть объектом')
+                yield section_name, row
+
+
+def _existing_rows(section: CatalogSection) -> dict[str, dict]:
+    """Строки раздела из базы одним запросом, ссылки — именами"""
+    lookups = {field: field for field in section.fields}
+    lookups.update({field: f'{field}__name' for field, _ in section.foreign_keys})
+    return {
+        row['name']: {field: row[lookup] for field, lookup in lookups.items()}
+        for row in section.model.objects.values('name', *lookups.values())
+    }
+
+
+def _clean_value(model_field, value):
+    if value == '' and model_field.null:
+        value = None  # пустая ячейка CSV
+    return model_field.clean(value, None)
+
+
+def plan_import(rows: Iterable[tuple[str | None, dict]]) -> ImportPlan:
+    errors = []
+
+    def error(message):
+        if len(errors) < MAX_ERRORS:
+            errors.append(message)
+
+    incoming = {section.name: {} for section in SECTIONS}
+    for number, (section_name, row) in enumerate(rows, start=1):
+        if section_name not in SECTIONS_BY_NAME:
+            error(f'строка {number}: неизвестный раздел {section_name!r}')
+            continue
+        name = str(row.get('name') or '').strip()
+        if not name:
+            error(f'{section_name}, строка {number}: нет name')
+            continue
+        if name in incoming[section_name]:
+            error(f'{section_name}: {name!r} встречается дважды')
+            continue
+        incoming[section_name][name] = row
+
+    existing = {section.name: _existing_rows(section) for section in SECTIONS}
+    # имена, на которые можно сослаться: уже в базе или добавляются этим же импортом
+    known_names = {section.model: set(existing[section.name]) | set(incoming[section.name]) for section in SECTIONS}
+
+    diffs = []
+    for section in SECTIONS:
+        diff = SectionDiff(section)
+        model_fields = {field: section.model._meta.get_field(field) for field in ('name', *section.update_fields)}
+        for name, row in incoming[section.name].items():
+            values = {}
+            try:
+                _clean_value(model_fields['name'], name)
+                for field in section.fields:
+                    values[field] = _clean_value(model_fields[field], row.get(field))
+            except ValidationError as e:
+                error(f'{section.name}, {name!r}: {"; ".join(e.messages)}')
+                continue
+            for field, target in section.foreign_keys:
+                value = row.get(field) or None
+                if value is None and not model_fields[field].null:
+                    error(f'{section.name}, {name!r}: не указано {field}')
+                elif value is not None and value not in known_names[target]:
+                    error(f'{section.name}, {name!r}: {field} {value!r} нет ни в базе, ни в файле')
+                values[field] = value
+
+            diff.rows[name] = values
+            old = existing[section.name].get(name)
+            if old is None:
+                diff.created.append(name)
+                continue
+            changes = {field: (old[field], value) for field, value in values.items() if old[field] != value}
+            if changes:
+                diff.updated[name] = changes
+            else:
+                diff.unchanged += 1
+        diffs.append(diff)
+    return ImportPlan(diffs=diffs, errors=errors)
+
+
+def apply_import(plan: ImportPlan) -> None:
+    """Записать новые и изменённые строки: по разделу за раз, всё в одной транзакции"""
+    with transaction.atomic():
+        for diff in plan.diffs:
+            names = diff.changed_names
+            if not names:
+                continue
+            section = diff.section
+            # id по имени — после записи предыдущих разделов, чтобы увидеть только что добавленные
+            ids = {
+                target: dict(target.objects.values_list('name', 'id'))
+                for target in {target for _, target in section.foreign_keys}
+            }
+            objects = []
+            for name in names:
+                values = dict(diff.rows[name])
+                for field, target in section.foreign_keys:
+                    reference = values.pop(field)
+                    values[f'{field}_id'] = ids[target][reference] if reference is not None else None
+                objects.append(section.model(name=name, **values))
+
+            if section.update_fields:
+                section.model.objects.bulk_create(
+                    objects, batch_size=BATCH_SIZE,
+                    update_conflicts=True, unique_fields=['name'], update_fields=section.update_fields,
+                )
+            else:
+                section.model.objects.bulk_create(objects, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+    # bulk_create сигналов не шлёт — сбрасываем кэши справочника сами (и полные сборки: в их ключе версия)
+    bump_catalog_version()
@@ -0,0 +1,109 @@
+"""
+Список персонажей справочника с фильтрами и keyset-пагинацией.
+
+Вместо OFFSET страница продолжается от последней показанной строки (значение сортировки + id):
+запрос по индексу не зависит от номера страницы, а новые персонажи не сдвигают уже открытые страницы.
+"""
+import base64
+import dataclasses
+import json
+
+from django.db.models import Q, QuerySet
+
+from ..models import Character, RegionChoices, ElementChoices, WeekChoices
+
+PAGE_SIZE = 20
+
+# параметр sort (имя поля; '-' в начале — по убыванию) -> подпись в форме
+SORT_CHOICES = {
+    'name': 'По имени',
+    '-name': 'По имени (Я–А)',
+    'region': 'По региону',
+    'element': 'По элементу',
+}
+
+
+@dataclasses.dataclass(frozen=True)
+class CatalogFilter:
+    region: str | None = None
+    element: str | None = None
+    weekday: int | None = None
+    sort: str = 'name'
+
+    @classmethod
+    def from_query(cls, params) -> 'CatalogFilter':
+        """Фильтр из GET-параметров; неизвестные значения просто игнорируются"""
+        region = params.get('region')
+        element = params.get('element')
+        weekday = params.get('weekday')
+        sort = params.get('sort')
+        return cls(
+            region=region if region in RegionChoices.values else None,
+            element=element if element in ElementChoices.values else None,
+            weekday=int(weekday) if weekday and weekday.isdigit() and int(weekday) in WeekChoices.values else None,
+            sort=sort if sort in SORT_CHOICES else 'name',
+        )
+
+    def apply(self, queryset: QuerySet) -> QuerySet:
+        # фильтры идут в порядке индекса (region, element, talent_weekday)
+        if self.region:
+            queryset = queryset.filter(region=self.region)
+        if self.element:
+            queryset = queryset.filter(element=self.element)
+        if self.weekday:
+            queryset = queryset.filter(talent_weekday=self.weekday)
+        return queryset
+
+    def as_query(self) -> dict:
+        """Параметры для ссылок на следующие страницы"""
+        params = {'region': self.region, 'element': self.element, 'weekday': self.weekday, 'sort': self.sort}
+        return {key: value for key, value in params.items() if value}
+
+
+def encode_cursor(value, last_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([value, last_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str | None) -> tuple | None:
+    if not cursor:
+        return None
+    try:
+        value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        last_id = int(last_id)
+    except (ValueError, TypeError):
+        return None  # битый курсор — показываем с начала
+    # все поля сортировки строковые: null или список в фильтре дали бы ошибку запроса
+    return (value, last_id) if isinstance(value, str) else None
+
+
+@dataclasses.dataclass
+class CatalogPage:
+    characters: list[Character]
+    next_cursor: str | None
+
+
+def get_catalog_page(catalog_filter: CatalogFilter, cursor: str | None = None,
+                     page_size: int = PAGE_SIZE) -> CatalogPage:
+    """Одна страница справочника: один запрос с select_related и LIMIT page_size + 1"""
+    descending = catalog_filter.sort.startswith('-')
+    field = catalog_filter.sort.lstrip('-')
+    order = ('-' if descending else '') + field
+
+    queryset = catalog_filter.apply(
+        Character.objects.select_related('mob', 'boss_material', 'weekly_material', 'specialty')
+    ).order_by(order, '-id' if descending else 'id')
+
+    after = decode_cursor(cursor)
+    if after is not None:
+        value, last_id = after
+        op = 'lt' if descending else 'gt'
+        queryset = queryset.filter(Q(**{f'{field}__{op}': value}) | Q(**{field: value, f'id__{op}': last_id}))
+
+    # лишняя строка показывает, есть ли следующая страница
+    characters = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(characters) > page_size:
+        characters = characters[:page_size]
+        last = characters[-1]
+        next_cursor = encode_cursor(getattr(last, field), last.id)
+    return CatalogPage(characters=characters, next_cursor=next_cursor)
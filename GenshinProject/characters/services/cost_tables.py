@@ -0,0 +1,179 @@
+"""
+Таблицы стоимости возвышений и талантов.
+
+Исходные данные — стоимость одного шага (одного возвышения или одного уровня таланта).
+При импорте они складываются в префиксные суммы, и из них заранее собираются
+стоимости для всех пар (откуда, куда), так что любой запрос — это просто обращение по индексу.
+"""
+import dataclasses
+from types import MappingProxyType
+
+MAX_ASCENSIONS = 6
+MAX_LEVEL = 90
+MIN_TALENT_LEVEL = 1
+MAX_TALENT_LEVEL = 10
+DEFAULT_TARGET_TALENT_LEVELS = (9, 9, 9)
+
+ASCENSION_BOUNDARIES = [20, 40, 50, 60, 70, 80]
+
+# --- стоимость одного возвышения (индекс = номер возвышения - 1) ---
+BOSS_FOR_ASCENSION = [0, 2, 4, 8, 12, 20]
+SPECIALTIES_FOR_ASCENSION = [3, 10, 20, 30, 45, 60]
+STONES_FOR_ASCENSION = [
+    {'rarity': 2, 'count': 1},
+    {'rarity': 3, 'count': 3},
+    {'rarity': 3, 'count': 6},
+    {'rarity': 4, 'count': 3},
+    {'rarity': 4, 'count': 6},
+    {'rarity': 5, 'count': 6},
+]
+MOBS_FOR_ASCENSION = [
+    {'rarity': 1, 'count': 3},
+    {'rarity': 1, 'count': 15},
+    {'rarity': 2, 'count': 12},
+    {'rarity': 2, 'count': 18},
+    {'rarity': 3, 'count': 12},
+    {'rarity': 3, 'count': 24},
+]
+
+# --- стоимость одного уровня таланта (индекс 0 = с 1 на 2 уровень) ---
+BOOKS_FOR_TALENT_LEVEL = [
+    {'rarity': 2, 'count': 3},
+    {'rarity': 3, 'count': 2},
+    {'rarity': 3, 'count': 4},
+    {'rarity': 3, 'count': 6},
+    {'rarity': 3, 'count': 9},
+    {'rarity': 4, 'count': 4},
+    {'rarity': 4, 'count': 6},
+    {'rarity': 4, 'count': 12},
+    {'rarity': 4, 'count': 16},
+]
+MOBS_FOR_TALENT_LEVEL = [
+    {'rarity': 1, 'count': 6},
+    {'rarity': 2, 'count': 3},
+    {'rarity': 2, 'count': 4},
+    {'rarity': 2, 'count': 6},
+    {'rarity': 2, 'count': 9},
+    {'rarity': 3, 'count': 4},
+    {'rarity': 3, 'count': 6},
+    {'rarity': 3, 'count': 9},
+    {'rarity': 3, 'count': 12},
+]
+WEEKLY_FOR_TALENT_LEVEL = [0, 0, 0, 0, 0, 1, 1, 2, 2]
+
+STONE_RARITIES = (2, 3, 4, 5)
+BOOK_RARITIES = (2, 3, 4)
+MOB_RARITIES = (1, 2, 3)
+
+
+@dataclasses.dataclass(frozen=True)
+class AscensionCost:
+    boss_materials: int
+    specialties: int
+    stones: MappingProxyType  # редкость -> количество
+    mob_materials: MappingProxyType
+
+
+@dataclasses.dataclass(frozen=True)
+class TalentCost:
+    talent_materials: MappingProxyType  # редкость -> количество
+    mob_materials: MappingProxyType
+    weekly_materials: int
+
+
+@dataclasses.dataclass(frozen=True)
+class BuildTarget:
+    """Цель прокачки: уровень и уровни трёх талантов (как в профиле целей)"""
+    level: int = MAX_LEVEL
+    talent_levels: tuple[int, ...] = DEFAULT_TARGET_TALENT_LEVELS
+
+
+DEFAULT_TARGET = BuildTarget()
+
+
+def _prefix_sums(steps: list[int]) -> list[int]:
+    sums = [0]
+    for count in steps:
+        sums.append(sums[-1] + count)
+    return sums
+
+
+def _prefix_sums_by_rarity(steps: list[dict], rarities) -> dict[int, list[int]]:
+    return {
+        rarity: _prefix_sums([step['count'] if step['rarity'] == rarity else 0 for step in steps])
+        for rarity in rarities
+    }
+
+
+def _range_by_rarity(prefix: dict[int, list[int]], start: int, end: int) -> MappingProxyType:
+    return MappingProxyType({rarity: sums[end] - sums[start] for rarity, sums in prefix.items()})
+
+
+def _build_ascension_costs() -> list[list[AscensionCost]]:
+    boss = _prefix_sums(BOSS_FOR_ASCENSION)
+    specialties = _prefix_sums(SPECIALTIES_FOR_ASCENSION)
+    stones = _prefix_sums_by_rarity(STONES_FOR_ASCENSION, STONE_RARITIES)
+    mobs = _prefix_sums_by_rarity(MOBS_FOR_ASCENSION, MOB_RARITIES)
+
+    table = []
+    for start in range(MAX_ASCENSIONS + 1):
+        row = []
+        for end in range(MAX_ASCENSIONS + 1):
+            end = max(start, end)
+            row.append(AscensionCost(
+                boss_materials=boss[end] - boss[start],
+                specialties=specialties[end] - specialties[start],
+                stones=_range_by_rarity(stones, start, end),
+                mob_materials=_range_by_rarity(mobs, start, end),
+            ))
+        table.append(row)
+    return table
+
+
+def _build_talent_costs() -> list[list[TalentCost]]:
+    books = _prefix_sums_by_rarity(BOOKS_FOR_TALENT_LEVEL, BOOK_RARITIES)
+    mobs = _prefix_sums_by_rarity(MOBS_FOR_TALENT_LEVEL, MOB_RARITIES)
+    weekly = _prefix_sums(WEEKLY_FOR_TALENT_LEVEL)
+
+    # индексы таблицы — уровни таланта 1..10, в префиксных суммах им соответствуют 0..9
+    table = []
+    for start in range(MAX_TALENT_LEVEL + 1):
+        row = []
+        for end in range(MAX_TALENT_LEVEL + 1):
+            i = max(start, MIN_TALENT_LEVEL) - 1
+            j = max(i, max(end, MIN_TALENT_LEVEL) - 1)
+            row.append(TalentCost(
+                talent_materials=_range_by_rarity(books, i, j),
+                mob_materials=_range_by_rarity(mobs, i, j),
+                weekly_materials=weekly[j] - weekly[i],
+            ))
+        table.append(row)
+    return table
+
+
+_ASCENSION_COSTS = _build_ascension_costs()
+_TALENT_COSTS = _build_talent_costs()
+
+
+def ascensions_for_level(level: int, is_ascended: bool = False) -> int:
+    """Сколько возвышений уже выполнено на этом уровне"""
+    # Корректировка на границе
+    if level in ASCENSION_BOUNDARIES and not is_ascended:
+        level -= 1
+
+    # Сколько границ пройдено?
+    return min(sum(1 for b in ASCENSION_BOUNDARIES if b <= level), MAX_ASCENSIONS)
+
+
+def ascension_cost(from_ascensions: int, to_ascensions: int = MAX_ASCENSIONS) -> AscensionCost:
+    """Стоимость возвышений from_ascensions -> to_ascensions (0..6)"""
+    from_ascensions = max(0, min(MAX_ASCENSIONS, from_ascensions))
+    to_ascensions = max(0, min(MAX_ASCENSIONS, to_ascensions))
+    return _ASCENSION_COSTS[from_ascensions][to_ascensions]
+
+
+def talent_cost(from_level: int, to_level: int) -> TalentCost:
+    """Стоимость прокачки одного таланта from_level -> to_level (1..10)"""
+    from_level = max(MIN_TALENT_LEVEL, min(MAX_TALENT_LEVEL, from_level))
+    to_level = max(MIN_TALENT_LEVEL, min(MAX_TALENT_LEVEL, to_level))
+    return _TALENT_COSTS[from_level][to_level]
@@ -0,0 +1,191 @@
+"""
+План фарма книг талантов и еженедельных боссов по дням.
+
+Остатки из калькулятора переводятся в число забегов, дальше дни проигрываются по порядку:
+сначала еженедельные боссы (награда каждого — раз в неделю, и всего три со скидкой на смолу),
+затем на оставшуюся смолу — подземелья талантов, открытые в этот день, начиная с самой большой
+потребности. Это жадный план: O(дни × группы), на несколько недель — доли миллисекунды.
+
+Каких боссов игрок уже прошёл на текущей неделе, неизвестно — настройка weekly_bosses_done
+уменьшает только общий недельный лимит, а нужные боссы считаются ещё не пройденными.
+"""
+import dataclasses
+import datetime
+import math
+
+from ..models import WeekChoices
+from .materials_aggregator import TieredAggregated, TalentRegionAggregated, WEEKDAY_SHORT_LABELS
+
+DAILY_RESIN = 160
+MAX_DAILY_RESIN = 200  # верхняя граница параметра resin
+TALENT_RUN_RESIN = 20
+# средний дроп подземелья талантов в книгах 2*: ~2.2 зелёных, ~2 синих, ~0.2 фиолетовых
+TALENT_RUN_EQUIVALENT = 10
+WEEKLY_RUN_RESIN = 30
+WEEKLY_BOSS_CAP = 3  # забегов в неделю за половину смолы, на всех боссов вместе
+WEEKLY_RUNS_PER_BOSS = 1  # награду каждого босса можно забрать раз в неделю
+WEEKLY_MATERIALS_PER_RUN = 1
+MAX_WEEKS = 12
+
+# подземелья открыты: ПН и ЧТ — книги понедельника, ВТ и ПТ — вторника, СР и СБ — среды, ВС — все
+DOMAIN_WEEKDAYS = {
+    1: {WeekChoices.MONDAY}, 2: {WeekChoices.TUESDAY}, 3: {WeekChoices.WEDNESDAY},
+    4: {WeekChoices.MONDAY}, 5: {WeekChoices.TUESDAY}, 6: {WeekChoices.WEDNESDAY},
+    7: set(WeekChoices),
+}
+
+
+@dataclasses.dataclass(frozen=True)
+class FarmingSettings:
+    daily_resin: int = DAILY_RESIN
+    weeks: int = 4
+    start: datetime.date | None = None  # None — сегодня
+    weekly_bosses_done: int = 0  # боссов уже пройдено на неделе, в которую попадает start
+
+    @classmethod
+    def from_query(cls, params) -> 'FarmingSettings':
+        """Настройки из GET-параметров; неверные значения заменяются значениями по умолчанию"""
+        def int_param(name, default, low, high):
+            try:
+                return max(low, min(high, int(params.get(name, default))))
+            except (TypeError, ValueError):
+                return default
+
+        return cls(
+            daily_resin=int_param('resin', DAILY_RESIN, TALENT_RUN_RESIN, MAX_DAILY_RESIN),
+            weeks=int_param('weeks', 4, 1, MAX_WEEKS),
+            weekly_bosses_done=int_param('bosses_done', 0, 0, WEEKLY_BOSS_CAP),
+        )
+
+
+@dataclasses.dataclass(slots=True)
+class FarmingTask:
+    kind: str  # 'talent' или 'weekly'
+    name: str  # регион + день книг или имя босса
+    runs: int
+    resin: int
+
+
+@dataclasses.dataclass(slots=True)
+class FarmingDay:
+    date: datetime.date
+    tasks: list[FarmingTask]
+    resin_spent: int
+
+
+@dataclasses.dataclass(slots=True)
+class FarmingSchedule:
+    days: list[FarmingDay]
+    # сколько забегов не поместилось в горизонт планирования
+    unfinished: dict[str, int]
+    total_runs: int
+    total_resin: int
+    finish_date: datetime.date | None  # None — за горизонт не успеть или фармить нечего
+
+
+@dataclasses.dataclass(slots=True)
+class _Demand:
+    kind: str
+    name: str
+    runs_left: int
+    weekday: int | None = None  # день книг (ПН/ВТ/СР), для боссов — None
+
+
+def talent_demands(talents: dict[str, TalentRegionAggregated]) -> list[_Demand]:
+    """Забеги в подземелья талантов: по одному подземелью на (регион, день книг)"""
+    labels_to_weekday = {label: weekday for weekday, label in WEEKDAY_SHORT_LABELS.items()}
+    demands = []
+    for region, agg in talents.items():
+        for day_label, day in agg.days:
+            runs = math.ceil(max(0, day.equivalent_remain) / TALENT_RUN_EQUIVALENT)
+            if runs:
+                demands.append(_Demand('talent', f'{region} ({day_label})', runs, labels_to_weekday[day_label]))
+    return demands
+
+
+def weekly_demands(weekly: dict[str, TieredAggregated]) -> list[_Demand]:
+    """Забеги на еженедельных боссов"""
+    demands = []
+    for boss_name, agg in weekly.items():
+        runs = math.ceil(max(0, agg.equivalent_remain) / WEEKLY_MATERIALS_PER_RUN)
+        if runs:
+            demands.append(_Demand('weekly', str(boss_name), runs))
+    return demands
+
+
+def plan_farming(talents: dict[str, TalentRegionAggregated], weekly: dict[str, TieredAggregated],
+                 settings: FarmingSettings | None = None) -> FarmingSchedule:
+    settings = settings or FarmingSettings()
+    start = settings.start or datetime.date.today()
+    books = talent_demands(talents)
+    bosses = weekly_demands(weekly)
+
+    days = []
+    total_runs = total_resin = 0
+    finish_date = None
+    boss_runs_this_week = settings.weekly_bosses_done
+    runs_by_boss = {}  # забеги на каждого босса на этой неделе
+    for offset in range(settings.weeks * 7):
+        if not any(d.runs_left for d in books) and not any(d.runs_left for d in bosses):
+            break
+
+        date = start + datetime.timedelta(days=offset)
+        if date.isoweekday() == 1 and offset:
+            boss_runs_this_week, runs_by_boss = 0, {}  # лимит боссов сбрасывается в понедельник
+        resin = settings.daily_resin
+        tasks = []
+
+        # боссы: в пределах недельных лимитов (свой у каждого босса и общий), сначала самый нужный
+        for demand in sorted(bosses, key=lambda d: d.runs_left, reverse=True):
+            runs = min(demand.runs_left, WEEKLY_RUNS_PER_BOSS - runs_by_boss.get(demand.name, 0),
+                       WEEKLY_BOSS_CAP - boss_runs_this_week, resin // WEEKLY_RUN_RESIN)
+            if runs > 0:
+                demand.runs_left -= runs
+                runs_by_boss[demand.name] = runs_by_boss.get(demand.name, 0) + runs
+                boss_runs_this_week += runs
+                resin -= runs * WEEKLY_RUN_RESIN
+                tasks.append(FarmingTask('weekly', demand.name, runs, runs * WEEKLY_RUN_RESIN))
+
+        # книги: только открытые сегодня подземелья, сначала с наибольшим остатком
+        open_days = DOMAIN_WEEKDAYS[date.isoweekday()]
+        for demand in sorted(books, key=lambda d: d.runs_left, reverse=True):
+            if demand.weekday not in open_days:
+                continue
+            runs = min(demand.runs_left, resin // TALENT_RUN_RESIN)
+            if runs > 0:
+                demand.runs_left -= runs
+                resin -= runs * TALENT_RUN_RESIN
+                tasks.append(FarmingTask('talent', demand.name, runs, runs * TALENT_RUN_RESIN))
+
+        spent = settings.daily_resin - resin
+        days.append(FarmingDay(date=date, tasks=tasks, resin_spent=spent))
+        total_runs += sum(task.runs for task in tasks)
+        total_resin += spent
+        if tasks:
+            finish_date = date
+
+    unfinished = {d.name: d.runs_left for d in [*bosses, *books] if d.runs_left}
+    return FarmingSchedule(
+        days=days,
+        unfinished=unfinished,
+        total_runs=total_runs,
+        total_resin=total_resin,
+        finish_date=finish_date if not unfinished else None,
+    )
+
+
+def schedule_to_json(schedule: FarmingSchedule) -> dict:
+    return {
+        'days': [
+            {
+                'date': day.date.isoformat(),
+                'resin_spent': day.resin_spent,
+                'tasks': [dataclasses.asdict(task) for task in day.tasks],
+            }
+            for day in schedule.days
+        ],
+        'unfinished': schedule.unfinished,
+        'total_runs': schedule.total_runs,
+        'total_resin': schedule.total_resin,
+        'finish_date': schedule.finish_date.isoformat() if schedule.finish_date else None,
+    }
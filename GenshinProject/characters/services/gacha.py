@@ -0,0 +1,157 @@
+"""
+Вероятности круток: точное распределение числа круток до нужного количества баннерных 5*
+с мягкой и жёсткой гарантией и гарантией 50/50.
+
+Распределения считаются динамическим программированием — свёртками распределений
+«круток до следующей 5*», а не симуляцией, и запоминаются по (баннер, счётчик гарантии,
+гарантия 50/50, копий). Копия N считается из копии N-1, так что график на C0..C6 —
+это семь свёрток, а повторный запрос берётся из кэша процесса.
+"""
+import dataclasses
+import functools
+
+MAX_COPIES = 7  # персонаж и шесть созвездий
+PERCENTILES = (50, 75, 90, 99)
+
+
+@dataclasses.dataclass(frozen=True)
+class BannerRules:
+    label: str
+    base_rate: float
+    soft_pity_start: int  # с этой крутки шанс 5* растёт
+    soft_pity_step: float
+    hard_pity: int
+    featured_chance: float  # шанс, что 5* — баннерная (50/50); после проигрыша следующая гарантирована
+
+    def five_star_rate(self, pull: int) -> float:
+        """Шанс 5* на pull-й крутке после предыдущей 5* (1..hard_pity)"""
+        if pull >= self.hard_pity:
+            return 1.0
+        if pull < self.soft_pity_start:
+            return self.base_rate
+        return min(1.0, self.base_rate + self.soft_pity_step * (pull - self.soft_pity_start + 1))
+
+
+CHARACTER_BANNER = BannerRules('Баннер персонажа', 0.006, 74, 0.06, 90, 0.5)
+# без Пути воплощения: баннерная 5* — любое из двух оружий баннера
+WEAPON_BANNER = BannerRules('Баннер оружия', 0.007, 63, 0.07, 80, 0.75)
+BANNERS = {'character': CHARACTER_BANNER, 'weapon': WEAPON_BANNER}
+
+
+def convolve(a, b) -> list[float]:
+    """Распределение суммы двух независимых величин (индекс — число круток)"""
+    result = [0.0] * (len(a) + len(b) - 1)
+    width = len(b)
+    for i, x in enumerate(a):
+        if x:
+            result[i:i + width] = [r + x * y for r, y in zip(result[i:i + width], b)]
+    return result
+
+
+@functools.lru_cache(maxsize=None)
+def five_star_distribution(rules: BannerRules, pity: int = 0) -> tuple[float, ...]:
+    """pmf[k] — шанс, что следующая 5* выпадет ровно на k-й крутке, если уже pity круток без 5*"""
+    pmf = [0.0]
+    survive = 1.0
+    for pull in range(pity + 1, rules.hard_pity + 1):
+        rate = rules.five_star_rate(pull)
+        pmf.append(survive * rate)
+        survive *= 1 - rate
+    return tuple(pmf)
+
+
+@functools.lru_cache(maxsize=1024)
+def featured_distribution(rules: BannerRules, pity: int = 0, guaranteed: bool = False,
+                          copies: int = 1) -> tuple[float, ...]:
+    """pmf[k] — шанс получить copies баннерных 5* ровно за k круток из состояния (pity, guaranteed)"""
+    if copies <= 0:
+        return (1.0,)
+    if copies > 1:
+        # после каждой копии счётчик и гарантия сбрасываются
+        previous = featured_distribution(rules, pity, guaranteed, copies - 1)
+        return tuple(convolve(previous, featured_distribution(rules)))
+
+    first = five_star_distribution(rules, pity)
+    if guaranteed:
+        return first
+    # проиграли 50/50 — нужна ещё одна 5*, она уже гарантированно баннерная
+    lost = convolve(first, five_star_distribution(rules))
+    won = rules.featured_chance
+    return tuple(
+        won * (first[k] if k < len(first) else 0.0) + (1 - won) * p
+        for k, p in enumerate(lost)
+    )
+
+
+@dataclasses.dataclass(frozen=True)
+class GachaQuery:
+    banner: str = 'character'
+    pity: int = 0
+    guaranteed: bool = False
+    copies: int = 1
+    budget: int | None = None  # сколько круток есть — для шанса успеть
+
+    @classmethod
+    def from_query(cls, params) -> 'GachaQuery':
+        """Параметры из GET; неверные значения заменяются значениями по умолчанию"""
+        banner = params.get('banner') if params.get('banner') in BANNERS else 'character'
+        rules = BANNERS[banner]
+
+        def int_param(name, default, low, high):
+            try:
+                return max(low, min(high, int(params.get(name, default))))
+            except (TypeError, ValueError):
+                return default
+
+        budget = int_param('budget', None, 0, rules.hard_pity * 2 * MAX_COPIES) if params.get('budget') else None
+        return cls(
+            banner=banner,
+            pity=int_param('pity', 0, 0, rules.hard_pity - 1),
+            guaranteed=params.get('guaranteed') in ('1', 'true', 'on'),
+            copies=int_param('copies', 1, 1, MAX_COPIES),
+            budget=budget,
+        )
+
+    @property
+    def rules(self) -> BannerRules:
+        return BANNERS[self.banner]
+
+    def distribution(self) -> tuple[float, ...]:
+        return featured_distribution(self.rules, self.pity, self.guaranteed, self.copies)
+
+
+def cumulative(pmf) -> list[float]:
+    total = 0.0
+    cdf = []
+    for p in pmf:
+        total += p
+        cdf.append(min(total, 1.0))
+    return cdf
+
+
+def percentile(cdf, q: float) -> int:
+    """Сколько круток хватит с вероятностью q (0..1)"""
+    for pulls, chance in enumerate(cdf):
+        if chance >= q - 1e-12:
+            return pulls
+    return len(cdf) - 1
+
+
+def distribution_to_json(query: GachaQuery) -> dict:
+    pmf = query.distribution()
+    cdf = cumulative(pmf)
+    data = {
+        'banner': query.banner,
+        'pity': query.pity,
+        'guaranteed': query.guaranteed,
+        'copies': query.copies,
+        'mean': round(sum(pulls * p for pulls, p in enumerate(pmf)), 2),
+        'percentiles': {str(q): percentile(cdf, q / 100) for q in PERCENTILES},
+        'max_pulls': len(pmf) - 1,
+        'pmf': [round(p, 8) for p in pmf],
+        'cdf': [round(c, 8) for c in cdf],
+    }
+    if query.budget is not None:
+        data['budget'] = query.budget
+        data['chance_within_budget'] = round(cdf[min(query.budget, len(cdf) - 1)], 6)
+    return data
@@ -0,0 +1,166 @@
+import contextlib
+import contextvars
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from ..models import UserCharacter, UserMaterialTotals, MaterialTypeChoices, get_material_key
+from .materials_calculator import MaterialsCalculator, RequiredMaterials
+from .roster_availability import RosterAvailability
+
+# кого считать в калькуляторе
+SCOPE_ALL = 'all'
+SCOPE_PLANNED = 'planned'
+SCOPE_OBTAINED = 'obtained'
+CALCULATION_SCOPES = {
+    SCOPE_ALL: 'Все персонажи',
+    SCOPE_PLANNED: 'Полученные и запланированные',
+    SCOPE_OBTAINED: 'Только полученные',
+}
+
+# поле RequiredMaterials -> тип материала
+REQUIRED_FIELDS = {
+    'boss_materials': MaterialTypeChoices.BOSS_MATERIAL,
+    'specialties': MaterialTypeChoices.SPECIALTY,
+    'stones': MaterialTypeChoices.STONE,
+    'mob_materials': MaterialTypeChoices.MOB_MATERIAL,
+    'weekly_materials': MaterialTypeChoices.WEEKLY_MATERIAL,
+    'talent_materials': MaterialTypeChoices.TALENT_MATERIAL,
+}
+
+
+# внутри suspend_totals_signals сигналы UserCharacter итоги не трогают
+_signals_suspended = contextvars.ContextVar('material_totals_signals_suspended', default=False)
+
+
+@contextlib.contextmanager
+def suspend_totals_signals():
+    """
+    Отключить обновление итогов сигналами UserCharacter (и лишний SELECT в pre_save).
+    Для массовых изменений: код сам вызывает apply_character_changes со всеми парами (old, new).
+    """
+    token = _signals_suspended.set(True)
+    try:
+        yield
+    finally:
+        _signals_suspended.reset(token)
+
+
+def totals_signals_suspended() -> bool:
+    return _signals_suspended.get()
+
+
+def _add_to_totals(totals: dict, required: RequiredMaterials, sign: int) -> None:
+    """
+    Прибавить (sign=1) или вычесть (sign=-1) материалы одного персонажа.
+    Материал убирается из итогов, только когда его больше не использует ни один персонаж,
+    поэтому нулевые строки остаются так же, как при полном пересчёте.
+    """
+    for field_name in REQUIRED_FIELDS:
+        for material, count in getattr(required, field_name).items():
+            if material is None:
+                continue  # у персонажа не заполнен материал — считать нечего
+            material_type, material_id = get_material_key(material)
+            group = totals.setdefault(material_type, {})
+            total, refs = group.get(str(material_id), (0, 0))
+            total, refs = total + sign * count, refs + sign
+            if refs > 0:
+                group[str(material_id)] = [total, refs]
+            else:
+                group.pop(str(material_id), None)
+            if not group:
+                del totals[material_type]
+
+
+def calculate_totals(user: User, calculator: MaterialsCalculator) -> dict:
+    """Посчитать итоги пользователя с нуля"""
+    totals = {}
+    for character in UserCharacter.objects.filter(user=user):
+        _add_to_totals(totals, calculator.calculate_character(character), 1)
+    return totals
+
+
+def rebuild_totals(user: User, calculator: MaterialsCalculator) -> UserMaterialTotals:
+    totals, _ = UserMaterialTotals.objects.update_or_create(
+        user=user,
+        defaults={'totals': calculate_totals(user, calculator), 'catalog_version': calculator.catalog.version},
+    )
+    return totals
+
+
+def apply_character_change(user: User | int, calculator: MaterialsCalculator, old=None, new=None) -> None:
+    """
+    Обновить итоги на разницу для одного персонажа (вызывают сигналы UserCharacter):
+    user — пользователь или его id,
+    old — состояние до изменения (None, если персонаж добавлен),
+    new — после (None, если персонаж удалён).
+    """
+    apply_character_changes(user, calculator, [(old, new)])
+
+
+def apply_character_changes(user: User | int, calculator: MaterialsCalculator, changes: list[tuple]) -> None:
+    """То же для пачки пар (old, new): итоги читаются и записываются один раз"""
+    with transaction.atomic():
+        row = UserMaterialTotals.objects.select_for_update().filter(user=user).first()
+        if row is None or row.catalog_version != calculator.catalog.version:
+            return  # итогов нет или они устарели — их пересоберёт get_required_materials при чтении
+
+        for old, new in changes:
+            if old is not None:
+                _add_to_totals(row.totals, calculator.calculate_character(old), -1)
+            if new is not None:
+                _add_to_totals(row.totals, calculator.calculate_character(new), 1)
+        UserMaterialTotals.objects.filter(pk=row.pk).update(totals=row.totals)
+
+
+def get_required_materials(user: User, calculator: MaterialsCalculator) -> RequiredMaterials:
+    """Потребность в материалах для полученных персонажей — из сохранённых итогов"""
+    row = UserMaterialTotals.objects.filter(user=user).first()
+    if row is None or row.catalog_version != calculator.catalog.version:
+        row = rebuild_totals(user, calculator)
+
+    required = RequiredMaterials()
+    for field_name, material_type in REQUIRED_FIELDS.items():
+        group = getattr(required, field_name)
+        for material_id, (count, refs) in row.totals.get(material_type, {}).items():
+            material = calculator.catalog.get_material(material_type, int(material_id))
+            if material is not None:
+                group[material] = count
+    return required
+
+
+def calculate_user_materials(user: User, calculator: MaterialsCalculator, scope: str = SCOPE_ALL) -> RequiredMaterials:
+    """
+    То же, что calculator.calculate_all, но полученные персонажи берутся из итогов.
+    scope: 'obtained' — только полученные, 'planned' — ещё и запланированные с их целями,
+    'all' — плюс прокачка всех остальных персонажей справочника до цели профиля по умолчанию.
+    """
+    total = get_required_materials(user, calculator)
+    if scope == SCOPE_OBTAINED:
+        return total
+
+    # полученные и запланированные — одним запросом
+    roster = RosterAvailability.load(user)
+    planned_targets = {
+        character_id: targets for character_id, targets in roster.planned_targets.items()
+        if character_id not in roster.owned and targets.talent_levels
+    }
+    for planned_mats in calculator.calculate_planned(planned_targets):
+        total.merge_with(planned_mats)
+
+    if scope == SCOPE_ALL:
+        missing_ids = [
+            char_id for char_id in calculator.catalog.characters
+            if char_id not in roster.owned and char_id not in planned_targets
+        ]
+        for virtual_mats in calculator.calculate_full_builds(missing_ids, roster.default_target):
+            total.merge_with(virtual_mats)
+    return total
+
+
+def scope_from_query(params) -> str:
+    """Режим расчёта из GET-параметров; старый only_obtained=1 тоже понимается"""
+    scope = params.get('scope')
+    if scope in CALCULATION_SCOPES:
+        return scope
+    return SCOPE_OBTAINED if params.get('only_obtained') == '1' else SCOPE_ALL
@@ -1,377 +1,309 @@
+from collections.abc import Callable
+import dataclasses
+from functools import cached_property
+
 from ..models import MobMaterial, TalentMaterial, WeeklyMaterial, Stone, ElementChoices, RegionChoices, Specialty, \
-    BossMaterial, UserInventory
+    BossMaterial, WeekChoices, get_material_key
 from .materials_calculator import RequiredMaterials
-import dataclasses
-from django.contrib.auth.models import User
-
-
-@dataclasses.dataclass
-class MobMaterialAggregated:
-    material_1: MobMaterial
-    material_2: MobMaterial
-    material_3: MobMaterial
-    count_1: int
-    count_2: int
-    count_3: int
-    count_my_1: int
-    count_my_2: int
-    count_my_3: int
-    equivalent: int
 
-    @property
-    def remain_1(self) -> int:
-        return self.count_1 - self.count_my_1
-
-    @property
-    def remain_2(self) -> int:
-        return self.count_2 - self.count_my_2
-
-    @property
-    def remain_3(self) -> int:
-        return self.count_3 - self.count_my_3
-
-    @property
-    def equivalent_remain(self) -> int:
-        return 9*self.remain_3+3*self.remain_2+self.remain_1
-
-
-@dataclasses.dataclass
-class WeeklyMaterialAggregated:
-    material_1: WeeklyMaterial
-    material_2: WeeklyMaterial
-    material_3: WeeklyMaterial
-    count_1: int
-    count_2: int
-    count_3: int
-    count_my_1: int
-    count_my_2: int
-    count_my_3: int
-    equivalent: int
 
-    @property
-    def remain_1(self) -> int:
-        return self.count_1 - self.count_my_1
-
-    @property
-    def remain_2(self) -> int:
-        return self.count_2 - self.count_my_2
-
-    @property
-    def remain_3(self) -> int:
-        return self.count_3 - self.count_my_3
-
-    @property
-    def equivalent_remain(self) -> int:
-        return self.remain_3+self.remain_2+self.remain_1
-
-
-@dataclasses.dataclass
-class TalentMaterialAggregated:
-    material_1: TalentMaterial
-    material_2: TalentMaterial
-    material_3: TalentMaterial
-    count_1: int
-    count_2: int
-    count_3: int
-    count_my_1: int
-    count_my_2: int
-    count_my_3: int
-    equivalent: int
-    @property
-    def remain_1(self) -> int:
-        return self.count_1 - self.count_my_1
+@dataclasses.dataclass(slots=True)
+class MaterialAggregated:
+    """
+    Один материал: сколько нужно, сколько есть и сколько осталось.
+    Для ступеней учитывается крафт: crafted — сколько сделать из предыдущей ступени,
+    used_for_crafting — сколько уйдёт на следующую (вместе с теми, что ещё нужно добыть).
+    Положительный remain — сколько добыть, отрицательный — лишнее.
+    """
+    material: object
+    count: int
+    count_my: int
+    crafted: int = 0
+    used_for_crafting: int = 0
+    remain: int = dataclasses.field(init=False)
 
-    @property
-    def remain_2(self) -> int:
-        return self.count_2 - self.count_my_2
+    def __post_init__(self):
+        self.remain = self.count - self.count_my - self.crafted + self.used_for_crafting
 
-    @property
-    def remain_3(self) -> int:
-        return self.count_3 - self.count_my_3
 
-    @property
-    def equivalent_remain(self) -> int:
-        return 9*self.remain_3+3*self.remain_2+self.remain_1
+@dataclasses.dataclass(slots=True)
+class TieredAggregated:
+    """Группа материалов одного семейства по ступеням (редкостям), эквиваленты считаются один раз"""
+    tiers: list[MaterialAggregated]
+    equivalent: int
+    equivalent_remain: int
 
-@dataclasses.dataclass
+
+@dataclasses.dataclass(slots=True)
 class TalentRegionAggregated:
-    material_monday: TalentMaterialAggregated
-    material_tuesday: TalentMaterialAggregated
-    material_wednesday: TalentMaterialAggregated
+    days: list[tuple[str, TieredAggregated]]  # (ПН/ВТ/СР, книги этого дня)
     equivalent: int
+    equivalent_remain: int
 
-    @property
-    def equivalent_remain(self) -> int:
-        return (self.material_monday.equivalent_remain +
-                self.material_tuesday.equivalent_remain +
-                self.material_wednesday.equivalent_remain)
-
-
-@dataclasses.dataclass
-class StoneAggregated:
-    material_1: Stone
-    material_2: Stone
-    material_3: Stone
-    material_4: Stone
-    count_1: int
-    count_2: int
-    count_3: int
-    count_4: int
-    count_my_1: int
-    count_my_2: int
-    count_my_3: int
-    count_my_4: int
-    equivalent: int
 
-    @property
-    def remain_1(self) -> int:
-        return self.count_1 - self.count_my_1
+@dataclasses.dataclass(slots=True)
+class AggregatedMaterials:
+    mob_materials: dict[str, TieredAggregated]
+    weekly_materials: dict[str, TieredAggregated]
+    talent_materials: dict[str, TalentRegionAggregated]
+    stones: dict[str, TieredAggregated]
+    specialties: list[MaterialAggregated]
+    boss_materials: list[MaterialAggregated]
+
+
+@dataclasses.dataclass(frozen=True)
+class TierFamily:
+    """
+    Описание семейства материалов для движка ступеней:
+    group_key — по чему группировать (моб, элемент, ...),
+    tiers — ступени по возрастанию, ratios — сколько предметов ступени нужно на один следующей,
+    tier_key — ступень материала; None — ступени занимаются по порядку появления,
+    craftable — можно ли крафтить следующую ступень из ratios предметов предыдущей.
+    """
+    group_key: Callable[[object], object]
+    tiers: tuple[int, ...]
+    ratios: tuple[int, ...]
+    tier_key: Callable[[object], int] | None = None
+    label: Callable[[object], object] = lambda key: key
+    craftable: bool = True
+
+    @cached_property
+    def weights(self) -> tuple[int, ...]:
+        """Сколько предметов низшей ступени в одном предмете каждой ступени"""
+        weights = [1]
+        for ratio in self.ratios:
+            weights.append(weights[-1] * ratio)
+        return tuple(weights)
+
+
+MOB_FAMILY = TierFamily(
+    group_key=lambda material: material.mob_name,
+    tiers=(1, 2, 3),
+    ratios=(3, 3),
+    tier_key=lambda material: material.rarity,
+)
+TALENT_FAMILY = TierFamily(
+    group_key=lambda book: (book.region, book.weekday),
+    tiers=(2, 3, 4),
+    ratios=(3, 3),
+    tier_key=lambda book: book.rarity,
+)
+STONE_FAMILY = TierFamily(
+    group_key=lambda stone: stone.element,
+    tiers=(2, 3, 4, 5),
+    ratios=(3, 3, 3),
+    tier_key=lambda stone: stone.rarity,
+    label=lambda element: ElementChoices(element).label,
+)
+# у еженедельного босса три разных материала, они не перерабатываются друг в друга
+WEEKLY_FAMILY = TierFamily(
+    group_key=lambda material: material.boss_name,
+    tiers=(1, 2, 3),
+    ratios=(1, 1),
+    craftable=False,
+)
+
+def crafting_shortfall(counts: list[int], owned: list[int], ratios: tuple[int, ...]) -> int:
+    """
+    Сколько предметов низшей ступени не хватает, если все излишки крафтить вверх (ratios[i] -> 1).
+    Считается сверху вниз: нехватка ступени переносится на предыдущую, умноженная на ratio.
+    """
+    need = 0
+    for i in reversed(range(len(counts))):
+        above = ratios[i] * need if i + 1 < len(counts) else 0
+        need = max(0, counts[i] + above - owned[i])
+    return need
+
+
+def resolve_crafting(counts: list[int], owned: list[int], ratios: tuple[int, ...]) -> tuple[list[int], list[int]]:
+    """
+    Точный крафт по ступеням. Минимальная нехватка в предметах низшей ступени — crafting_shortfall;
+    из всех планов с такой нехваткой выбирается тот, где добывать нужно как можно более высокие ступени,
+    а остальное закрывается крафтом снизу вверх.
+    Возвращает (crafted, used): сколько предметов ступени скрафтить и сколько своих уйдёт на крафт.
+    """
+    n = len(counts)
+    weights = [1]
+    for ratio in ratios:
+        weights.append(weights[-1] * ratio)
+
+    # сверху вниз: сколько предметов ступени можно добыть без переплаты.
+    # Нехватка выпукла по числу предметов ступени, поэтому граница ищется двоичным поиском
+    total = crafting_shortfall(counts, owned, ratios)
+    have = list(owned)
+    for i in reversed(range(n)):
+        low, high = 0, total // weights[i]
+        while low < high:
+            mid = (low + high + 1) // 2
+            have[i] = owned[i] + mid
+            if mid * weights[i] + crafting_shortfall(counts, have, ratios) == total:
+                low = mid
+            else:
+                high = mid - 1
+        have[i] = owned[i] + low
+        total -= low * weights[i]
+
+    # с добытыми предметами нехватки нет — снизу вверх крафтим ровно то, чего не хватает выше
+    crafted = [0] * n
+    used = [0] * n
+    for i in range(n - 1):
+        crafted[i + 1] = crafting_shortfall(counts[i + 1:], have[i + 1:], ratios[i + 1:])
+        used[i] = crafted[i + 1] * ratios[i]
+    return crafted, used
+
+
+WEEKDAY_SHORT_LABELS = {WeekChoices.MONDAY: 'ПН', WeekChoices.TUESDAY: 'ВТ', WeekChoices.WEDNESDAY: 'СР'}
 
-    @property
-    def remain_2(self) -> int:
-        return self.count_2 - self.count_my_2
 
-    @property
-    def remain_3(self) -> int:
-        return self.count_3 - self.count_my_3
+class MaterialsAggregator:
 
-    @property
-    def remain_4(self) -> int:
-        return self.count_4 - self.count_my_4
+    def __init__(self, inventory: dict[tuple[str, int], int]):
+        # инвентарь пользователя, загруженный одним запросом: UserInventory.get_inventory_map()
+        self.inventory = inventory
 
-    @property
-    def equivalent_remain(self) -> int:
-        return 27*self.remain_4 + 9 * self.remain_3 + 3 * self.remain_2 + self.remain_1
+    def get_count_my(self, material) -> int:
+        """Сколько этого материала есть у пользователя"""
+        return self.inventory.get(get_material_key(material), 0)
 
+    def aggregate_materials(self, required_materials: RequiredMaterials) -> AggregatedMaterials:
 
-@dataclasses.dataclass
-class BossAggregated:
-    boss_material: BossMaterial
-    count: int
-    count_my: int
+        return AggregatedMaterials(
+            mob_materials=self.aggregate_mobs(required_materials.mob_materials),
+            weekly_materials=self.aggregate_weekly(required_materials.weekly_materials),
+            talent_materials=self.aggregate_talents(required_materials.talent_materials),
+            stones=self.aggregate_stones(required_materials.stones),
+            specialties=self.aggregate_specialties(required_materials.specialties),
+            boss_materials=self.aggregate_bosses(required_materials.boss_materials),
+        )
 
-    @property
-    def remain(self) -> int:
-        return self.count - self.count_my
+    def aggregate_single(self, materials: dict) -> list[MaterialAggregated]:
+        """Материалы без ступеней — по убыванию оставшегося количества"""
+        result = [
+            MaterialAggregated(material=material, count=count, count_my=self.get_count_my(material))
+            for material, count in materials.items()
+            if material is not None
+        ]
+        result.sort(key=lambda agg: agg.remain, reverse=True)
+        return result
 
+    def aggregate_tiers(self, family: TierFamily, materials: dict) -> dict[object, TieredAggregated]:
+        """
+        Движок ступеней: группирует материалы по family.group_key, раскладывает по ступеням
+        и сортирует группы по убыванию оставшегося эквивалента.
+        """
+        result = {family.label(key): group for key, group in self._group_tiers(family, materials).items()}
+        return dict(sorted(result.items(), key=lambda item: item[1].equivalent_remain, reverse=True))
+
+    def _group_tiers(self, family: TierFamily, materials: dict) -> dict[object, TieredAggregated]:
+        groups = dict[object, list]()
+        for material in materials:
+            if material is None:
+                continue
+            slots = groups.setdefault(family.group_key(material), [None] * len(family.tiers))
+            if family.tier_key is not None:
+                tier = family.tier_key(material)
+                if tier in family.tiers:
+                    slots[family.tiers.index(tier)] = material
+            elif None in slots:
+                slots[slots.index(None)] = material
+
+        return {key: self._build_group(family, slots, materials) for key, slots in groups.items()}
+
+    def _build_group(self, family: TierFamily, slots: list, materials: dict) -> TieredAggregated:
+        counts = [materials.get(material, 0) if material is not None else 0 for material in slots]
+        owned = [self.get_count_my(material) if material is not None else 0 for material in slots]
+        if family.craftable:
+            crafted, used = resolve_crafting(counts, owned, family.ratios)
+        else:
+            crafted = used = [0] * len(slots)
+
+        tiers = [
+            MaterialAggregated(material=material, count=count, count_my=count_my,
+                               crafted=crafted_count, used_for_crafting=used_count)
+            for material, count, count_my, crafted_count, used_count in zip(slots, counts, owned, crafted, used)
+        ]
+        weights = family.weights
+        return TieredAggregated(
+            tiers=tiers,
+            equivalent=sum(weight * tier.count for weight, tier in zip(weights, tiers)),
+            # лишнее на одной ступени не закрывает нехватку на другой — всё, что можно, уже скрафчено
+            equivalent_remain=sum(weight * max(0, tier.remain) for weight, tier in zip(weights, tiers)),
+        )
 
-@dataclasses.dataclass
-class SpecialtyAggregated:
-    specialty: Specialty
-    count: int
-    count_my: int
+    def aggregate_bosses(self, boss_materials: dict[BossMaterial, int]) -> list[MaterialAggregated]:
+        return self.aggregate_single(boss_materials)
 
-    @property
-    def remain(self) -> int:
-        return self.count - self.count_my
+    def aggregate_specialties(self, specialties: dict[Specialty, int]) -> list[MaterialAggregated]:
+        return self.aggregate_single(specialties)
 
+    def aggregate_mobs(self, mob_materials: dict[MobMaterial, int]) -> dict[str, TieredAggregated]:
+        return self.aggregate_tiers(MOB_FAMILY, mob_materials)
 
-@dataclasses.dataclass
-class AggregatedMaterials:
-    mob_materials: dict[str, MobMaterialAggregated]
-    weekly_materials: dict[str, WeeklyMaterialAggregated]
-    talent_materials: dict[str, TalentRegionAggregated]
-    stones: dict[str, StoneAggregated]
-    specialties: list[SpecialtyAggregated]
-    boss_materials: list[BossAggregated]
+    def aggregate_weekly(self, weekly_materials: dict[WeeklyMaterial, int]) -> dict[str, TieredAggregated]:
+        return self.aggregate_tiers(WEEKLY_FAMILY, weekly_materials)
 
+    def aggregate_stones(self, stones: dict[Stone, int]) -> dict[str, TieredAggregated]:
+        return self.aggregate_tiers(STONE_FAMILY, stones)
 
-class MaterialsAggregator:
-    def aggregate_materials(self, required_materials: RequiredMaterials, request_user: User) -> AggregatedMaterials:
+    def aggregate_talents(self, talent_materials: dict[TalentMaterial, int]) -> dict[str, TalentRegionAggregated]:
+        # книги группируются по (регион, день недели), а дни — по региону
+        by_day = self._group_tiers(TALENT_FAMILY, talent_materials)
+        empty_day = self._build_group(TALENT_FAMILY, [None] * len(TALENT_FAMILY.tiers), {})
 
-        return AggregatedMaterials(
-            mob_materials=self.aggregate_mobs(required_materials.mob_materials, request_user),
-            weekly_materials=self.aggregate_weekly(required_materials.weekly_materials, request_user),
-            talent_materials=self.aggregate_talents(required_materials.talent_materials, request_user),
-            stones=self.aggregate_stones(required_materials.stones, request_user),
-            specialties=self.aggregate_specialties(required_materials.specialties, request_user),
-            boss_materials=self.aggregate_bosses(required_materials.boss_materials, request_user),
-        )
+        result = dict[str, TalentRegionAggregated]()
+        for region in dict.fromkeys(region for region, _ in by_day):
+            days = [
+                (short_label, by_day.get((region, weekday), empty_day))
+                for weekday, short_label in WEEKDAY_SHORT_LABELS.items()
+            ]
+            result[RegionChoices(region).label] = TalentRegionAggregated(
+                days=days,
+                equivalent=sum(day.equivalent for _, day in days),
+                equivalent_remain=sum(day.equivalent_remain for _, day in days),
+            )
 
-    def aggregate_bosses(self, boss_materials: dict[BossMaterial, int], request_user: User) -> list[BossAggregated]:
-        result=[]
-        for boss_material in boss_materials:
-            result.append(BossAggregated(
-                boss_material=boss_material,
-                count=boss_materials[boss_material],
-                count_my=UserInventory.get_material_count(request_user, boss_material),
-            ))
+        return dict(sorted(result.items(), key=lambda item: item[1].equivalent_remain, reverse=True))
 
-        result.sort(key=lambda b: b.remain, reverse=True)
-        return result
 
-    def aggregate_specialties(self, specialties: dict[Specialty, int], request_user: User) -> list[SpecialtyAggregated]:
-        result=[]
-        for specialty in specialties:
-            result.append(SpecialtyAggregated(
-                specialty=specialty,
-                count=specialties[specialty],
-                count_my=UserInventory.get_material_count(request_user, specialty),
-            ))
+class LazyAggregatedMaterials:
+    """
+    Те же секции, что у AggregatedMaterials, но каждая считается при первом обращении.
+    Для страницы с кэшированными фрагментами: секции, взятые из кэша, не считаются вовсе,
+    а потребность и инвентарь загружаются, только если хоть одну секцию пришлось рендерить.
+    """
 
-        result.sort(key=lambda b: b.remain, reverse=True)
-        return result
+    def __init__(self, get_required: Callable[[], RequiredMaterials], get_inventory: Callable[[], dict]):
+        self._get_required = get_required
+        self._get_inventory = get_inventory
 
-    def aggregate_mobs(self, mob_materials: dict[MobMaterial, int], request_user: User) -> dict[str, MobMaterialAggregated]:
-        materials_by_mob = dict[str, dict[int, MobMaterial]]()
-        for mob_material in mob_materials:
-            if mob_material.mob_name not in materials_by_mob:
-                materials_by_mob[mob_material.mob_name] = dict()
-            materials_by_mob[mob_material.mob_name][mob_material.rarity] = mob_material
-
-        result = dict[str, MobMaterialAggregated]()
-        for mob_name, materials_by_rarity in materials_by_mob.items():
-            result[mob_name] = MobMaterialAggregated(
-                material_1=materials_by_rarity.get(1),
-                material_2=materials_by_rarity.get(2),
-                material_3=materials_by_rarity.get(3),
-                count_1=mob_materials.get(materials_by_rarity.get(1)),
-                count_2=mob_materials.get(materials_by_rarity.get(2)),
-                count_3=mob_materials.get(materials_by_rarity.get(3)),
-                count_my_1=UserInventory.get_material_count(request_user, materials_by_rarity.get(1)),
-                count_my_2=UserInventory.get_material_count(request_user, materials_by_rarity.get(2)),
-                count_my_3=UserInventory.get_material_count(request_user, materials_by_rarity.get(3)),
-                equivalent=(
-                        9 * mob_materials.get(materials_by_rarity.get(3)) +
-                        3 * mob_materials.get(materials_by_rarity.get(2)) +
-                        mob_materials.get(materials_by_rarity.get(1))
-                ),
-            )
-        result = dict(sorted(result.items(), key=lambda item: item[1].equivalent_remain, reverse=True))
-        return result
+    @cached_property
+    def _required(self) -> RequiredMaterials:
+        return self._get_required()
 
-    def aggregate_weekly(self, weekly_materials: dict[WeeklyMaterial, int], request_user: User) -> dict[str, WeeklyMaterialAggregated]:
-        materials_by_boss = dict[str, list[WeeklyMaterial]]()
-        for weekly_material in weekly_materials:
-            if weekly_material.boss_name not in materials_by_boss:
-                materials_by_boss[weekly_material.boss_name] = []
-            materials_by_boss[weekly_material.boss_name].append(weekly_material)
-
-        result = dict[str, WeeklyMaterialAggregated]()
-        for boss_name, materials_by_boss_name in materials_by_boss.items():
-            padded = materials_by_boss_name + [None] * (3 - len(materials_by_boss_name)) # чтобы для каждого босса было 3 элемента
-            result[boss_name] = WeeklyMaterialAggregated(
-                material_1=padded[0],
-                material_2=padded[1],
-                material_3=padded[2],
-                count_1=weekly_materials.get(padded[0], 0),
-                count_2=weekly_materials.get(padded[1], 0),
-                count_3=weekly_materials.get(padded[2], 0),
-                count_my_1=UserInventory.get_material_count(request_user, padded[0]),
-                count_my_2=UserInventory.get_material_count(request_user, padded[1]),
-                count_my_3=UserInventory.get_material_count(request_user, padded[2]),
-                equivalent=(
-                        weekly_materials.get(padded[0], 0) +
-                        weekly_materials.get(padded[1], 0) +
-                        weekly_materials.get(padded[2], 0)
-                ),
-            )
-        result = dict(sorted(result.items(), key=lambda item: item[1].equivalent_remain, reverse=True))
-        return result
+    @cached_property
+    def _aggregator(self) -> MaterialsAggregator:
+        return MaterialsAggregator(self._get_inventory())
 
-    def aggregate_talents(self, talent_materials: dict[TalentMaterial, int], request_user: User) -> dict[str, TalentRegionAggregated]:
-        materials_by_regweek = dict[tuple[str, int], dict[int, TalentMaterial]]()
-        for talent_material in talent_materials:
-            if (talent_material.region, talent_material.weekday) not in materials_by_regweek:
-                materials_by_regweek[(talent_material.region, talent_material.weekday)] = dict()
-            materials_by_regweek[(talent_material.region, talent_material.weekday)][talent_material.rarity] = talent_material
-        unique_regions={reg for (reg, _) in materials_by_regweek}
-        result = dict[str, TalentRegionAggregated]()
-        for reg in unique_regions:
-            monday_equivalent = (
-                    9 * talent_materials.get(materials_by_regweek.get((reg, 1), {}).get(4), 0) +
-                    3 * talent_materials.get(materials_by_regweek.get((reg, 1), {}).get(3), 0) +
-                    talent_materials.get(materials_by_regweek.get((reg, 1), {}).get(2), 0)
-            )
-            tuesday_equivalent = (
-                    9 * talent_materials.get(materials_by_regweek.get((reg, 2), {}).get(4), 0) +
-                    3 * talent_materials.get(materials_by_regweek.get((reg, 2), {}).get(3), 0) +
-                    talent_materials.get(materials_by_regweek.get((reg, 2), {}).get(2), 0)
-            )
-            wednesday_equivalent = (
-                    9 * talent_materials.get(materials_by_regweek.get((reg, 3), {}).get(4), 0) +
-                    3 * talent_materials.get(materials_by_regweek.get((reg, 3), {}).get(3), 0) +
-                    talent_materials.get(materials_by_regweek.get((reg, 3), {}).get(2), 0)
-            )
+    @cached_property
+    def mob_materials(self) -> dict[str, TieredAggregated]:
+        return self._aggregator.aggregate_mobs(self._required.mob_materials)
 
-            result[RegionChoices(reg).label] = TalentRegionAggregated(
-                material_monday = TalentMaterialAggregated(
-                    material_1=materials_by_regweek.get((reg, 1), {}).get(2),
-                    material_2=materials_by_regweek.get((reg, 1), {}).get(3),
-                    material_3=materials_by_regweek.get((reg, 1), {}).get(4),
-                    count_1=talent_materials.get(materials_by_regweek.get((reg, 1), {}).get(2), 0),
-                    count_2=talent_materials.get(materials_by_regweek.get((reg, 1), {}).get(3), 0),
-                    count_3=talent_materials.get(materials_by_regweek.get((reg, 1), {}).get(4), 0),
-                    count_my_1=UserInventory.get_material_count(request_user, materials_by_regweek.get((reg, 1), {}).get(2)),
-                    count_my_2=UserInventory.get_material_count(request_user, materials_by_regweek.get((reg, 1), {}).get(3)),
-                    count_my_3=UserInventory.get_material_count(request_user, materials_by_regweek.get((reg, 1), {}).get(4)),
-                    equivalent=monday_equivalent,
-                ),
-                material_tuesday = TalentMaterialAggregated(
-                    material_1=materials_by_regweek.get((reg, 2), {}).get(2),
-                    material_2=materials_by_regweek.get((reg, 2), {}).get(3),
-                    material_3=materials_by_regweek.get((reg, 2), {}).get(4),
-                    count_1=talent_materials.get(materials_by_regweek.get((reg, 2), {}).get(2), 0),
-                    count_2=talent_materials.get(materials_by_regweek.get((reg, 2), {}).get(3), 0),
-                    count_3=talent_materials.get(materials_by_regweek.get((reg, 2), {}).get(4), 0),
-                    count_my_1=UserInventory.get_material_count(request_user,
-                                                                materials_by_regweek.get((reg, 2), {}).get(2)),
-                    count_my_2=UserInventory.get_material_count(request_user,
-                                                                materials_by_regweek.get((reg, 2), {}).get(3)),
-                    count_my_3=UserInventory.get_material_count(request_user,
-                                                                materials_by_regweek.get((reg, 2), {}).get(4)),
-                    equivalent=tuesday_equivalent,
-                ),
-                material_wednesday = TalentMaterialAggregated(
-                    material_1=materials_by_regweek.get((reg, 3), {}).get(2),
-                    material_2=materials_by_regweek.get((reg, 3), {}).get(3),
-                    material_3=materials_by_regweek.get((reg, 3), {}).get(4),
-                    count_1=talent_materials.get(materials_by_regweek.get((reg, 3), {}).get(2), 0),
-                    count_2=talent_materials.get(materials_by_regweek.get((reg, 3), {}).get(3), 0),
-                    count_3=talent_materials.get(materials_by_regweek.get((reg, 3), {}).get(4), 0),
-                    count_my_1=UserInventory.get_material_count(request_user,
-                                                                materials_by_regweek.get((reg, 3), {}).get(2)),
-                    count_my_2=UserInventory.get_material_count(request_user,
-                                                                materials_by_regweek.get((reg, 3), {}).get(3)),
-                    count_my_3=UserInventory.get_material_count(request_user,
-                                                                materials_by_regweek.get((reg, 3), {}).get(4)),
-                    equivalent=wednesday_equivalent,
-                ),
-                equivalent = monday_equivalent+tuesday_equivalent+wednesday_equivalent,
-            )
+    @cached_property
+    def weekly_materials(self) -> dict[str, TieredAggregated]:
+        return self._aggregator.aggregate_weekly(self._required.weekly_materials)
 
+    @cached_property
+    def talent_materials(self) -> dict[str, TalentRegionAggregated]:
+        return self._aggregator.aggregate_talents(self._required.talent_materials)
 
-        result = dict(sorted(result.items(), key=lambda item: item[1].equivalent_remain, reverse=True))
-        return result
+    @cached_property
+    def stones(self) -> dict[str, TieredAggregated]:
+        return self._aggregator.aggregate_stones(self._required.stones)
 
-    def aggregate_stones(self, stones: dict[Stone, int], request_user: User) -> dict[str, StoneAggregated]:
-        stones_by_element = dict[str, dict[int, Stone]]()
-        for stone in stones:
-            if stone.element not in stones_by_element:
-                stones_by_element[stone.element] = dict()
-            stones_by_element[stone.element][stone.rarity] = stone
-
-        result = dict[str, StoneAggregated]()
-        for element, materials_by_rarity in stones_by_element.items():
-            result[ElementChoices(element).label] = StoneAggregated(
-                material_1=materials_by_rarity.get(2),
-                material_2=materials_by_rarity.get(3),
-                material_3=materials_by_rarity.get(4),
-                material_4=materials_by_rarity.get(5),
-                count_1=stones.get(materials_by_rarity.get(2)),
-                count_2=stones.get(materials_by_rarity.get(3)),
-                count_3=stones.get(materials_by_rarity.get(4)),
-                count_4=stones.get(materials_by_rarity.get(5)),
-                count_my_1=UserInventory.get_material_count(request_user, materials_by_rarity.get(2)),
-                count_my_2=UserInventory.get_material_count(request_user, materials_by_rarity.get(3)),
-                count_my_3=UserInventory.get_material_count(request_user, materials_by_rarity.get(4)),
-                count_my_4=UserInventory.get_material_count(request_user, materials_by_rarity.get(5)),
-                equivalent=(
-                        27 * stones.get(materials_by_rarity.get(5)) +
-                        9 * stones.get(materials_by_rarity.get(4)) +
-                        3 * stones.get(materials_by_rarity.get(3)) +
-                        stones.get(materials_by_rarity.get(2))
-                ),
-            )
-        result = dict(sorted(result.items(), key=lambda item: item[1].equivalent_remain, reverse=True))
-        return result
+    @cached_property
+    def specialties(self) -> list[MaterialAggregated]:
+        return self._aggregator.aggregate_specialties(self._required.specialties)
+
+    @cached_property
+    def boss_materials(self) -> list[MaterialAggregated]:
+        return self._aggregator.aggregate_bosses(self._required.boss_materials)
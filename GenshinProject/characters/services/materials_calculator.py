@@ -1,8 +1,12 @@
 from collections import defaultdict
 import dataclasses
+from django.core.cache import cache
 from django.db.models import QuerySet
 
-from ..models import MobMaterial, UserCharacter, Character
+from ..models import MobMaterial, UserCharacter
+from .catalog import CatalogSnapshot
+from .catalog_cache import get_catalog
+from .cost_tables import BuildTarget, DEFAULT_TARGET, MAX_LEVEL, ascensions_for_level, ascension_cost, talent_cost
 
 
 @dataclasses.dataclass
@@ -27,173 +31,144 @@ class RequiredMaterials:
         return f"{self.mob_materials}, {self.specialties}, {self.stones}, {self.talent_materials}, {self.weekly_materials}, {self.talent_materials}"
 
 
+# ключ кэша с полной стоимостью прокачки персонажа до стандартной цели (1→90, таланты 1→9).
+# В ключе версия справочника: после его изменения старые записи просто не читаются и истекают сами
+FULL_BUILD_CACHE_KEY = 'characters:full_build:{version}:{id}'
+FULL_BUILD_CACHE_TIMEOUT = 7 * 24 * 60 * 60
+
+
+def virtual_character(character_id: int, target: BuildTarget = DEFAULT_TARGET) -> UserCharacter:
+    """Ещё не полученный персонаж: уровень 1, таланты 1,1,1 -> цели"""
+    return UserCharacter(
+        name_id=character_id,
+        level=1,  # Текущий уровень
+        is_ascended=False,
+        talent_levels=[1, 1, 1],  # Уровни талантов
+        target_level=target.level,
+        target_talent_levels=list(target.talent_levels),  # Целевые уровни талантов
+        user=None  # без пользователя
+    )
+
+
 class MaterialsCalculator:
 
-    def calculate_all(self, characters: QuerySet[UserCharacter, UserCharacter], only_obtained: bool) -> RequiredMaterials:
+    def __init__(self, catalog: CatalogSnapshot | None = None):
+        # справочник берётся из кэша процесса, а не запросами на каждого персонажа
+        self.catalog = catalog or get_catalog()
+
+    def calculate_all(self, characters: QuerySet[UserCharacter, UserCharacter], only_obtained: bool,
+                      planned_targets: dict[int, BuildTarget] | None = None,
+                      default_target: BuildTarget = DEFAULT_TARGET) -> RequiredMaterials:
+        """
+        planned_targets — запланированные персонажи {id: цель}, считаются по своим целям;
+        default_target — цель для всех остальных персонажей справочника.
+        """
         total = RequiredMaterials()
+        user_character_names = set()
 
         for char in characters:
+            user_character_names.add(char.name_id)
             char_mats = self.calculate_character(char)
             total.merge_with(char_mats)
 
+        planned_targets = {
+            char_id: targets for char_id, targets in (planned_targets or {}).items()
+            if char_id not in user_character_names
+        }
+        for planned_mats in self.calculate_planned(planned_targets):
+            total.merge_with(planned_mats)
+
         if not only_obtained:
-            # 2. ДОБАВЛЯЕМ ВСЕХ ОСТАЛЬНЫХ персонажей (уровни 1→9, таланты 1,1,1→9,9,9)
-            all_characters = Character.objects.all()
-            user_character_names = set(characters.values_list('name__id', flat=True))
-
-            for char in all_characters:
-                if char.id not in user_character_names:
-                    # Создаём виртуального UserCharacter
-                    virtual_char = UserCharacter(
-                        name=char,
-                        level=1,  # Текущий уровень
-                        is_ascended=False,
-                        talent_levels=[1, 1, 1],  # Уровни талантов
-                        target_talent_levels=[9, 9, 9],  # Целевые уровни талантов
-                        user=None  # без пользователя
-                    )
-                    virtual_mats = self.calculate_character(virtual_char)
-                    total.merge_with(virtual_mats)
+            # 2. ДОБАВЛЯЕМ ВСЕХ ОСТАЛЬНЫХ персонажей (уровень 1→цель, таланты 1,1,1→цели)
+            missing_ids = [
+                char_id for char_id in self.catalog.characters
+                if char_id not in user_character_names and char_id not in planned_targets
+            ]
+            for virtual_mats in self.calculate_full_builds(missing_ids, default_target):
+                total.merge_with(virtual_mats)
 
         return total
 
+    def calculate_full_builds(self, character_ids, target: BuildTarget = DEFAULT_TARGET) -> list[RequiredMaterials]:
+        """
+        Полная стоимость прокачки неполученных персонажей.
+        Со стандартной целью она не зависит от пользователя, поэтому кэшируется по персонажу
+        и версии справочника (снимок без версии не кэшируется).
+        Цель из профиля пользователя считается по таблицам без кэша.
+        """
+        if target != DEFAULT_TARGET or self.catalog.version is None:
+            return [self.calculate_character(virtual_character(character_id, target)) for character_id in character_ids]
+
+        keys = {
+            FULL_BUILD_CACHE_KEY.format(version=self.catalog.version, id=character_id): character_id
+            for character_id in character_ids
+        }
+        cached = cache.get_many(keys)
+
+        calculated = {}
+        for key, character_id in keys.items():
+            if key in cached:
+                continue
+            calculated[key] = self.calculate_character(virtual_character(character_id))
+
+        if calculated:
+            cache.set_many(calculated, timeout=FULL_BUILD_CACHE_TIMEOUT)
+        return list(cached.values()) + list(calculated.values())
+
+    def calculate_planned(self, planned_targets: dict[int, BuildTarget]) -> list[RequiredMaterials]:
+        """
+        Стоимость запланированных персонажей с их целями.
+        Цели у каждого пользователя свои, поэтому не кэшируется — по таблицам это и так дёшево.
+        """
+        return [
+            self.calculate_character(virtual_character(character_id, targets))
+            for character_id, targets in planned_targets.items()
+        ]
+
     def calculate_character(self, user_character) -> RequiredMaterials:
         result = RequiredMaterials()
-
-        # считаем сколько возвышений уже выполнено
-        ascensions=self._calculate_ascensions(user_character.level, user_character.is_ascended)
+        character = self.catalog.get_character(user_character.name_id)
+        if character is None:
+            return result
+
+        # считаем сколько возвышений уже выполнено и сколько нужно до целевого уровня
+        ascensions = ascensions_for_level(user_character.level, user_character.is_ascended)
+        target_ascensions = ascensions_for_level(user_character.target_level or MAX_LEVEL)
+        asc_cost = ascension_cost(ascensions, target_ascensions)
+
+        # таланты: стоимость каждого из трёх талантов берётся из таблицы
+        books = defaultdict(int)
+        talent_mobs = defaultdict(int)
+        num_weekly = 0
+        for i in range(3):
+            cost = talent_cost(user_character.talent_levels[i], user_character.target_talent_levels[i])
+            for rarity, count in cost.talent_materials.items():
+                books[rarity] += count
+            for rarity, count in cost.mob_materials.items():
+                talent_mobs[rarity] += count
+            num_weekly += cost.weekly_materials
 
         # материалы босса
-        num_boss = self._get_num_boss_materials(ascensions)
-        result.boss_materials[user_character.name.boss_material] = num_boss
+        result.boss_materials[character.boss_material] = asc_cost.boss_materials
 
         # диковинки
-        num_spec = self._get_num_specialties(ascensions)
-        result.specialties[user_character.name.specialty] = num_spec
+        result.specialties[character.specialty] = asc_cost.specialties
 
         # камни
-        num_stones = self._get_num_stones(ascensions)
-        stones=user_character.name.get_stones()
-        for stone in stones:
-            result.stones[stone] = num_stones[stone.rarity]
+        for stone in self.catalog.get_stones(character):
+            result.stones[stone] = asc_cost.stones.get(stone.rarity, 0)
 
         # еженедельные материалы
-        num_weekly = self._get_num_weekly_materials(user_character)
-        result.weekly_materials[user_character.name.weekly_material] = num_weekly
+        result.weekly_materials[character.weekly_material] = num_weekly
 
         # материалы талантов
-        num_talent_materials = self._get_num_talent_materials(user_character)
-        talent_materials=user_character.name.get_talent_materials()
-        for material in talent_materials:
-            result.talent_materials[material] += num_talent_materials[material.rarity]
+        for material in self.catalog.get_talent_materials(character):
+            result.talent_materials[material] += books[material.rarity]
 
-        # материалы с мобов
-        num_mob_materials = self._get_num_mob_materials(user_character, ascensions)
-        mob_materials=user_character.name.get_mob_materials()
-        for mob_material in mob_materials:
-            result.mob_materials[mob_material] += num_mob_materials[mob_material.rarity]
+        # материалы с мобов: на возвышения и на таланты
+        for mob_material in self.catalog.get_mob_materials(character):
+            result.mob_materials[mob_material] += (
+                asc_cost.mob_materials.get(mob_material.rarity, 0) + talent_mobs[mob_material.rarity]
+            )
 
         return result
-
-    def _calculate_ascensions(self, level: int, is_ascended: bool = False) -> int:
-        boundaries = [20, 40, 50, 60, 70, 80]
-
-        # Корректировка на границе
-        if level in boundaries and not is_ascended:
-            level -= 1
-
-        # Сколько границ пройдено?
-        return min(sum(1 for b in boundaries if b <= level), 6)
-
-
-    def _get_num_boss_materials(self, ascensions) -> int :
-        num_boss_materials = 0
-        boss_for_ascension = [0,2,4,8,12,20]
-        for i in range(ascensions, 6):
-            num_boss_materials += boss_for_ascension[i]
-        return num_boss_materials
-
-    def _get_num_specialties(self, ascensions) -> int:
-        num_specialties = 0
-        specialties_for_ascension = [3,10,20,30,45,60]
-        for i in range(ascensions, 6):
-            num_specialties += specialties_for_ascension[i]
-        return num_specialties
-
-    def _get_num_stones(self, ascensions) -> defaultdict[int, int]:
-        num_stones = defaultdict(int)
-        stones_for_ascensions = [
-            {'rarity': 2, 'count': 1},
-            {'rarity': 3, 'count': 3},
-            {'rarity': 3, 'count': 6},
-            {'rarity': 4, 'count': 3},
-            {'rarity': 4, 'count': 6},
-            {'rarity': 5, 'count': 6},
-        ]
-        for asc in range(ascensions, 6):
-            stone_for_ascension = stones_for_ascensions[asc]
-            num_stones[stone_for_ascension['rarity']] += stone_for_ascension['count']
-        return num_stones
-
-
-    def _get_num_weekly_materials(self, user_character) -> int:
-        num_weekly = 0
-        weekly_for_level = [0, 0, 0, 0, 0, 0, 1, 1, 2, 2]
-        for i in range(3):
-            for level in range(user_character.talent_levels[i], user_character.target_talent_levels[i] + 1):
-                num_weekly += weekly_for_level[level]
-        return num_weekly
-
-    def _get_num_talent_materials(self, user_character) -> defaultdict[int, int]:
-        num_books = defaultdict(int)
-        books_for_levels = [
-            {'rarity': 2, 'count': 3}, # на 2 уровень = 0 индекс
-            {'rarity': 3, 'count': 2}, # на 3 уровень
-            {'rarity': 3, 'count': 4},
-            {'rarity': 3, 'count': 6},
-            {'rarity': 3, 'count': 9},
-            {'rarity': 4, 'count': 4},
-            {'rarity': 4, 'count': 6},
-            {'rarity': 4, 'count': 12},
-            {'rarity': 4, 'count': 16},
-        ]
-        for i in range(3): # для каждого таланта
-            for level in range(user_character.talent_levels[i], user_character.target_talent_levels[i]):
-                books_for_level=books_for_levels[level - 1]
-                num_books[books_for_level['rarity']] += books_for_level['count']
-        return num_books
-
-    def _get_num_mob_materials(self, user_character, ascensions) -> defaultdict[int, int]:
-        num_mob_materials = defaultdict(int)
-
-        # --- для возвышений ---
-        mobs_for_ascensions = [
-            {'rarity': 1, 'count': 3},
-            {'rarity': 1, 'count': 15},
-            {'rarity': 2, 'count': 12},
-            {'rarity': 2, 'count': 18},
-            {'rarity': 3, 'count': 12},
-            {'rarity': 3, 'count': 24},
-        ]
-        for asc in range(ascensions, 6):
-            mob_for_ascension = mobs_for_ascensions[asc]
-            num_mob_materials[mob_for_ascension['rarity']] += mob_for_ascension['count']
-
-        # --- для талантов ---
-        mobs_for_levels = [
-            {'rarity': 1, 'count': 6},  # на 2 уровень = 0 индекс
-            {'rarity': 2, 'count': 3},  # на 3 уровень
-            {'rarity': 2, 'count': 4},
-            {'rarity': 2, 'count': 6},
-            {'rarity': 2, 'count': 9},
-            {'rarity': 3, 'count': 4},
-            {'rarity': 3, 'count': 6},
-            {'rarity': 3, 'count': 9},
-            {'rarity': 3, 'count': 12},
-        ]
-        for i in range(3):
-            for level in range(user_character.talent_levels[i], user_character.target_talent_levels[i]):
-               mobs_for_level=mobs_for_levels[level - 1]
-               num_mob_materials[mobs_for_level['rarity']] += mobs_for_level['count']
-
-        return num_mob_materials
@@ -0,0 +1,55 @@
+from ..models import get_material_key
+from .materials_aggregator import AggregatedMaterials, MaterialAggregated, TieredAggregated, TalentRegionAggregated
+
+
+def material_to_json(material) -> dict | None:
+    if material is None:
+        return None  # пустая ступень
+    material_type, material_id = get_material_key(material)
+    return {'type': material_type, 'id': material_id, 'name': material.name}
+
+
+def material_aggregated_to_json(agg: MaterialAggregated) -> dict:
+    return {
+        'material': material_to_json(agg.material),
+        'count': agg.count,
+        'count_my': agg.count_my,
+        'crafted': agg.crafted,
+        'used_for_crafting': agg.used_for_crafting,
+        'remain': agg.remain,
+    }
+
+
+def tiered_to_json(group: TieredAggregated) -> dict:
+    return {
+        'tiers': [material_aggregated_to_json(tier) for tier in group.tiers],
+        'equivalent': group.equivalent,
+        'equivalent_remain': group.equivalent_remain,
+    }
+
+
+def talent_region_to_json(region: TalentRegionAggregated) -> dict:
+    return {
+        'days': [{'day': day, **tiered_to_json(group)} for day, group in region.days],
+        'equivalent': region.equivalent,
+        'equivalent_remain': region.equivalent_remain,
+    }
+
+
+def aggregated_to_json(aggregated: AggregatedMaterials) -> dict:
+    """
+    AggregatedMaterials в виде JSON. Группы — списки с полем name,
+    чтобы сохранить порядок (по убыванию оставшегося).
+    """
+    return {
+        'mob_materials': [{'name': str(name), **tiered_to_json(group)}
+                          for name, group in aggregated.mob_materials.items()],
+        'weekly_materials': [{'name': str(name), **tiered_to_json(group)}
+                             for name, group in aggregated.weekly_materials.items()],
+        'talent_materials': [{'name': str(name), **talent_region_to_json(region)}
+                             for name, region in aggregated.talent_materials.items()],
+        'stones': [{'name': str(name), **tiered_to_json(group)}
+                   for name, group in aggregated.stones.items()],
+        'specialties': [material_aggregated_to_json(agg) for agg in aggregated.specialties],
+        'boss_materials': [material_aggregated_to_json(agg) for agg in aggregated.boss_materials],
+    }
@@ -0,0 +1,139 @@
+import copy
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from ..models import UserCharacter, PlannedCharacter, TargetProfile
+from .materials_calculator import MaterialsCalculator
+from .material_totals import apply_character_changes, suspend_totals_signals
+from .target_profiles import assign_target_profile
+
+TALENT_INDEXES = {'normal': 0, 'skill': 1, 'burst': 2}
+
+# коды ошибок в результатах patch_roster — по ним, а не по тексту, выбирается ответ API
+ERROR_INVALID = 'invalid'  # операция без нужных ключей
+ERROR_NOT_FOUND = 'not_found'  # нет такого персонажа у пользователя
+ERROR_NOT_EDITABLE = 'not_editable'  # поле нельзя менять
+ERROR_INVALID_VALUE = 'invalid_value'  # значение не подходит полю
+
+CHARACTER_MODELS = {
+    'usercharacter': UserCharacter,
+    'plannedcharacter': PlannedCharacter,
+}
+
+# какие поля можно менять у каждого типа персонажа
+EDITABLE_FIELDS = {
+    'usercharacter': {'level', 'is_ascended', 'talent_normal', 'talent_skill', 'talent_burst',
+                      'target_level', 'target_normal', 'target_skill', 'target_burst', 'target_profile'},
+    'plannedcharacter': {'target_level', 'target_normal', 'target_skill', 'target_burst', 'target_profile'},
+}
+
+
+def _int_in_range(value, low: int, high: int) -> int:
+    value = int(value)
+    if not low <= value <= high:
+        raise ValueError(f'Значение должно быть от {low} до {high}')
+    return value
+
+
+def apply_character_field(character, field: str, value, profiles: dict[int, TargetProfile] | None = None) -> tuple[str, ...]:
+    """
+    Меняет одно поле персонажа в памяти и возвращает имена полей модели для update_fields.
+    profiles — профили целей пользователя по id. ValueError — если значение не подходит.
+    Ручное изменение цели снимает с персонажа профиль.
+    """
+    if field == 'level':
+        character.level = _int_in_range(value, 1, 90)
+        return ('level',)
+    if field == 'is_ascended':
+        character.is_ascended = bool(int(value)) if not isinstance(value, bool) else value
+        return ('is_ascended',)
+    if field == 'target_profile':
+        if value in (None, ''):
+            return assign_target_profile(character, None)
+        profile = (profiles or {}).get(int(value))
+        if profile is None:
+            raise ValueError('Профиль целей не найден')
+        return assign_target_profile(character, profile)
+    if field == 'target_level':
+        character.target_level = _int_in_range(value, 1, 90)
+        character.target_profile = None
+        return ('target_level', 'target_profile')
+
+    kind, _, talent = field.partition('_')
+    if talent not in TALENT_INDEXES or kind not in ('talent', 'target'):
+        raise ValueError(f'Неизвестное поле: {field}')
+
+    model_field = 'talent_levels' if kind == 'talent' else 'target_talent_levels'
+    levels = list(getattr(character, model_field) or [1, 1, 1])
+    if len(levels) != 3:
+        raise ValueError('У персонажа не заполнены уровни талантов')
+    levels[TALENT_INDEXES[talent]] = _int_in_range(value, 1, 10)
+    setattr(character, model_field, levels)
+    if kind == 'target':
+        character.target_profile = None
+        return (model_field, 'target_profile')
+    return (model_field,)
+
+
+def patch_roster(user: User, operations: list) -> list[dict]:
+    """
+    Применяет пачку изменений {character_type, id, field, value} к персонажам пользователя.
+    Персонажи загружаются одним запросом на тип, каждый сохраняется один раз с update_fields,
+    всё — в одной транзакции. Возвращает результат по каждой операции:
+    {'index', 'status': 'ok' | 'error'} и для ошибок ещё 'code' (ERROR_*) и 'error' — текст.
+    """
+    results = [{'index': i, 'status': 'ok'} for i in range(len(operations))]
+
+    ids_by_type = {character_type: set() for character_type in CHARACTER_MODELS}
+    for i, operation in enumerate(operations):
+        try:
+            ids_by_type[operation['character_type']].add(int(operation['id']))
+        except (KeyError, TypeError, ValueError):
+            results[i].update(status='error', code=ERROR_INVALID, error='Нужны character_type, id, field и value')
+
+    characters = {
+        (character_type, character.id): character
+        for character_type, ids in ids_by_type.items() if ids
+        for character in CHARACTER_MODELS[character_type].objects.filter(user=user, id__in=ids)
+    }
+
+    profiles = {}
+    if any(operation.get('field') == 'target_profile' for operation in operations if isinstance(operation, dict)):
+        profiles = {profile.id: profile for profile in TargetProfile.objects.filter(user=user)}
+
+    dirty = {}
+    previous = {}  # состояние полученных персонажей до первой правки — для итогов материалов
+    for i, operation in enumerate(operations):
+        if results[i]['status'] == 'error':
+            continue
+        character_type, field = operation['character_type'], operation.get('field')
+        key = (character_type, int(operation['id']))
+        character = characters.get(key)
+        if character is None:
+            results[i].update(status='error', code=ERROR_NOT_FOUND, error='Персонаж не найден')
+            continue
+        # список или словарь вместо имени поля не должен ронять всю пачку TypeError (unhashable)
+        if not isinstance(field, str) or field not in EDITABLE_FIELDS[character_type]:
+            results[i].update(status='error', code=ERROR_NOT_EDITABLE, error=f'Поле {field} нельзя менять')
+            continue
+
+        if character_type == 'usercharacter' and key not in previous:
+            previous[key] = copy.copy(character)
+        try:
+            dirty.setdefault(key, set()).update(
+                apply_character_field(character, field, operation.get('value'), profiles)
+            )
+        except (TypeError, ValueError) as e:
+            results[i].update(status='error', code=ERROR_INVALID_VALUE, error=str(e))
+
+    with transaction.atomic():
+        # сигналы пересчитывали бы итоги на каждое сохранение — обновляем их один раз за пачку
+        with suspend_totals_signals():
+            for key, fields in dirty.items():
+                characters[key].save(update_fields=sorted(fields))
+        changes = [(previous[key], characters[key]) for key in dirty if key in previous]
+        if changes:
+            apply_character_changes(user, MaterialsCalculator(), changes)
+
+    return results
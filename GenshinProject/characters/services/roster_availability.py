@@ -0,0 +1,72 @@
+import dataclasses
+from collections.abc import Mapping
+
+from django.contrib.auth.models import User
+from django.db.models import IntegerField, JSONField, Value
+
+from ..models import Character, UserCharacter, PlannedCharacter, TargetProfile
+from .catalog import CatalogSnapshot
+from .catalog_cache import get_catalog
+from .cost_tables import BuildTarget, DEFAULT_TARGET
+
+OWNED = 'owned'
+PLANNED = 'planned'
+DEFAULT_PROFILE = 'default_profile'
+
+
+@dataclasses.dataclass(frozen=True)
+class RosterAvailability:
+    """
+    Какие персонажи уже есть у пользователя и какие запланированы.
+    Загружается одним запросом на запрос и передаётся во все формы добавления персонажа.
+    """
+    owned: frozenset[int]
+    planned: frozenset[int]
+    # id персонажа -> цель из плана
+    planned_targets: Mapping[int, BuildTarget] = dataclasses.field(default_factory=dict)
+    # цель из профиля по умолчанию — для персонажей, которых нет ни в полученных, ни в планах
+    default_target: BuildTarget = DEFAULT_TARGET
+
+    @classmethod
+    def load(cls, user: User) -> 'RosterAvailability':
+        """
+        Один UNION ALL по полученным и запланированным персонажам (вместе с целями планов)
+        и профилю целей по умолчанию.
+        """
+        rows = UserCharacter.objects.filter(user=user).values_list(
+            'name_id', Value(OWNED), Value(None, output_field=IntegerField()), Value(None, output_field=JSONField()),
+        ).union(
+            PlannedCharacter.objects.filter(user=user).values_list(
+                'name_id', Value(PLANNED), 'target_level', 'target_talent_levels',
+            ),
+            TargetProfile.objects.filter(user=user, is_default=True).values_list(
+                Value(None, output_field=IntegerField()), Value(DEFAULT_PROFILE), 'target_level', 'target_talent_levels',
+            ),
+            all=True,
+        )
+        owned, planned_targets, default_target = set(), {}, DEFAULT_TARGET
+        for character_id, kind, target_level, targets in rows:
+            if kind == OWNED:
+                owned.add(character_id)
+            elif kind == PLANNED:
+                planned_targets[character_id] = BuildTarget(target_level, tuple(targets or ()))
+            elif targets:
+                default_target = BuildTarget(target_level, tuple(targets))
+        return cls(owned=frozenset(owned), planned=frozenset(planned_targets),
+                   planned_targets=planned_targets, default_target=default_target)
+
+    @property
+    def excluded(self) -> frozenset[int]:
+        """Персонажи, которых нельзя выбрать для добавления: уже полученные и запланированные"""
+        return self.owned | self.planned
+
+    def available(self, catalog: CatalogSnapshot | None = None) -> list[Character]:
+        """Персонажи справочника, которых ещё нет ни в полученных, ни в планах"""
+        catalog = catalog or get_catalog()
+        excluded = self.excluded
+        return [ch for ch in catalog.characters.values() if ch.id not in excluded]
+
+    def planned_characters(self, catalog: CatalogSnapshot | None = None) -> list[Character]:
+        """Запланированные персонажи — их можно перенести в полученные"""
+        catalog = catalog or get_catalog()
+        return [ch for ch in catalog.characters.values() if ch.id in self.planned]
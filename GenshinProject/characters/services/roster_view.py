@@ -0,0 +1,125 @@
+"""
+Модель чтения для страницы «Мои персонажи».
+
+Строки собираются заранее: имя берётся через select_related, а признак «докачан» и остаток
+прокачки считаются по таблицам стоимости, так что шаблон ничего не запрашивает и не сравнивает.
+"""
+import dataclasses
+
+from django.contrib.auth.models import User
+from django.core.paginator import Paginator, Page
+
+from ..models import UserCharacter, PlannedCharacter, TargetProfile
+from .cost_tables import MIN_TALENT_LEVEL, ascensions_for_level, talent_cost
+
+ROSTER_PAGE_SIZE = 100
+
+
+@dataclasses.dataclass(slots=True)
+class RosterRow:
+    id: int
+    character_type: str  # 'usercharacter' или 'plannedcharacter' — как в API правок
+    name: str
+    level: int | None
+    is_ascended: bool | None
+    talent_levels: list[int] | None
+    target_level: int
+    target_talent_levels: list[int]
+    target_profile_id: int | None
+    is_owned: bool
+    is_built: bool
+    # остаток прокачки — для значков
+    remaining_ascensions: int
+    remaining_talent_levels: int
+    remaining_books: int
+    remaining_weekly: int
+
+
+@dataclasses.dataclass(slots=True)
+class RosterPage:
+    characters: list[RosterRow]
+    plans: list[RosterRow]
+    page: Page | None  # None — всё поместилось на одну страницу
+    profiles: list[TargetProfile] = dataclasses.field(default_factory=list)
+
+
+def _remaining_talents(talent_levels: list[int], target_talent_levels: list[int]) -> tuple[int, int, int]:
+    levels = books = weekly = 0
+    for current, target in zip(talent_levels, target_talent_levels):
+        levels += max(0, target - current)
+        cost = talent_cost(current, target)
+        books += sum(cost.talent_materials.values())
+        weekly += cost.weekly_materials
+    return levels, books, weekly
+
+
+def build_owned_row(character: UserCharacter) -> RosterRow:
+    talents, targets = character.talent_levels, character.target_talent_levels
+    levels, books, weekly = _remaining_talents(talents, targets)
+    ascensions = ascensions_for_level(character.level, character.is_ascended)
+    target_ascensions = ascensions_for_level(character.target_level)
+    return RosterRow(
+        id=character.id,
+        character_type='usercharacter',
+        name=character.name.name if character.name else '',  # FK допускает NULL
+        level=character.level,
+        is_ascended=character.is_ascended,
+        talent_levels=talents,
+        target_level=character.target_level,
+        target_talent_levels=targets,
+        target_profile_id=character.target_profile_id,
+        is_owned=True,
+        # докачан: целевой уровень достигнут и все таланты не ниже цели
+        is_built=character.level >= character.target_level and not levels,
+        remaining_ascensions=max(0, target_ascensions - ascensions),
+        remaining_talent_levels=levels,
+        remaining_books=books,
+        remaining_weekly=weekly,
+    )
+
+
+def build_planned_row(plan: PlannedCharacter) -> RosterRow:
+    targets = plan.target_talent_levels
+    # персонажа ещё нет — считаем с первого уровня, как для полной прокачки в калькуляторе
+    levels, books, weekly = _remaining_talents([MIN_TALENT_LEVEL] * len(targets), targets)
+    return RosterRow(
+        id=plan.id,
+        character_type='plannedcharacter',
+        name=plan.name.name if plan.name else '',
+        level=None,
+        is_ascended=None,
+        talent_levels=None,
+        target_level=plan.target_level,
+        target_talent_levels=targets,
+        target_profile_id=plan.target_profile_id,
+        is_owned=False,
+        is_built=False,
+        remaining_ascensions=ascensions_for_level(plan.target_level),
+        remaining_talent_levels=levels,
+        remaining_books=books,
+        remaining_weekly=weekly,
+    )
+
+
+def get_roster_page(user: User, page_number=None, page_size: int = ROSTER_PAGE_SIZE) -> RosterPage:
+    """
+    Полученные персонажи постранично (по id), планы — целиком на первой странице.
+    Запросы: COUNT и страница полученных, плюс по одному запросу планов и профилей целей.
+    """
+    owned = UserCharacter.objects.filter(user=user).select_related('name').order_by('id')
+    paginator = Paginator(owned, page_size)
+    page = paginator.get_page(page_number)
+
+    plans = []
+    if page.number == 1:
+        plans = [
+            build_planned_row(plan)
+            for plan in PlannedCharacter.objects.filter(user=user).select_related('name').order_by('id')
+        ]
+
+    return RosterPage(
+        characters=[build_owned_row(character) for character in page.object_list],
+        plans=plans,
+        page=page if paginator.num_pages > 1 else None,
+        profiles=list(TargetProfile.objects.filter(user=user).order_by('name')),
+    )
@@ -0,0 +1,103 @@
+"""
+Синтетический справочник и пользователи для бенчмарков.
+
+Строки вставляются через bulk_create, сигналы не срабатывают, поэтому версия справочника
+увеличивается явно. Запускать только на отдельной базе (benchmark_calculator создаёт тестовую).
+"""
+import dataclasses
+import random
+
+from django.contrib.auth.models import User
+
+from ..models import Character, Stone, TalentMaterial, Mob, MobMaterial, BossMaterial, WeeklyMaterial, Specialty, \
+    UserCharacter, UserInventory, RegionChoices, ElementChoices, WeekChoices, get_material_key
+from .catalog_cache import bump_catalog_version
+from .cost_tables import ASCENSION_BOUNDARIES, BOOK_RARITIES, MOB_RARITIES, STONE_RARITIES
+
+WEEKLY_MATERIALS_PER_BOSS = 3
+
+
+@dataclasses.dataclass(frozen=True)
+class CatalogSize:
+    characters: int = 100
+    mobs: int = 30
+    bosses: int = 30
+    weekly_bosses: int = 10
+    specialties: int = 40
+    # книги: регион x день x редкость, камни: элемент x редкость — не больше, чем вариантов в игре
+    regions: int = len(RegionChoices)
+    elements: int = len(ElementChoices)
+
+    def as_dict(self) -> dict:
+        return dataclasses.asdict(self)
+
+
+def seed_catalog(size: CatalogSize, rng: random.Random) -> list[Character]:
+    regions = RegionChoices.values[:size.regions]
+    elements = ElementChoices.values[:size.elements]
+
+    Stone.objects.bulk_create([
+        Stone(name=f'Камень {element}-{rarity}', element=element, rarity=rarity)
+        for element in elements for rarity in STONE_RARITIES
+    ])
+    TalentMaterial.objects.bulk_create([
+        TalentMaterial(name=f'Книга {region}-{weekday}-{rarity}', region=region, weekday=weekday, rarity=rarity)
+        for region in regions for weekday in WeekChoices.values for rarity in BOOK_RARITIES
+    ])
+    mobs = Mob.objects.bulk_create([Mob(name=f'Моб {i}') for i in range(size.mobs)])
+    MobMaterial.objects.bulk_create([
+        MobMaterial(name=f'Материал моба {mob.id}-{rarity}', mob_name=mob, rarity=rarity)
+        for mob in mobs for rarity in MOB_RARITIES
+    ])
+    weekly = WeeklyMaterial.objects.bulk_create([
+        WeeklyMaterial(name=f'Еженедельный {boss}-{i}', boss_name=f'Еженедельный босс {boss}')
+        for boss in range(size.weekly_bosses) for i in range(WEEKLY_MATERIALS_PER_BOSS)
+    ])
+    bosses = BossMaterial.objects.bulk_create([
+        BossMaterial(name=f'Материал босса {i}', boss_name=f'Босс {i}') for i in range(size.bosses)
+    ])
+    specialties = Specialty.objects.bulk_create([
+        Specialty(name=f'Диковинка {i}', region=regions[i % len(regions)]) for i in range(size.specialties)
+    ])
+    characters = Character.objects.bulk_create([
+        Character(
+            name=f'Персонаж {i:04d}',
+            region=rng.choice(regions),
+            element=rng.choice(elements),
+            weekly_material=rng.choice(weekly) if weekly else None,
+            boss_material=rng.choice(bosses) if bosses else None,
+            talent_weekday=rng.choice(WeekChoices.values),
+            specialty=rng.choice(specialties) if specialties else None,
+            mob=rng.choice(mobs) if mobs else None,
+        )
+        for i in range(size.characters)
+    ])
+    bump_catalog_version()
+    return characters
+
+
+def seed_user(username: str, characters: list[Character], count: int, rng: random.Random) -> User:
+    """Пользователь с count случайными персонажами и случайным инвентарём по их материалам"""
+    user = User.objects.create(username=username)
+    roster = []
+    for character in rng.sample(characters, min(count, len(characters))):
+        talents = [rng.randint(1, 8) for _ in range(3)]
+        roster.append(UserCharacter(
+            user=user,
+            name=character,
+            level=rng.choice([1, *ASCENSION_BOUNDARIES, 90]),
+            is_ascended=rng.random() < 0.5,
+            talent_levels=talents,
+            target_talent_levels=[rng.randint(level, 10) for level in talents],
+        ))
+    UserCharacter.objects.bulk_create(roster)
+    return user
+
+
+def seed_inventory(user: User, materials, rng: random.Random, share: float = 0.5) -> None:
+    """Часть материалов справочника в случайном количестве"""
+    UserInventory.objects.bulk_create([
+        UserInventory(user=user, material_type=material_type, material_id=material_id, count=rng.randint(0, 200))
+        for material_type, material_id in (get_material_key(material) for material in materials)
+        if rng.random() < share
+    ])
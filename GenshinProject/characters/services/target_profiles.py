@@ -0,0 +1,58 @@
+"""
+Профили целей прокачки («поддержка 80/8/8/8», «мейн 90/10/10/10»).
+
+Цели профиля копируются в назначенных ему персонажей: калькулятор, итоги и «Мои персонажи»
+читают цель прямо из персонажа, а стоимость берётся по индексу из таблиц (откуда, куда).
+Поэтому изменение профиля — это два UPDATE и пересборка итогов пользователя по таблицам.
+"""
+from django.db import transaction
+
+from ..models import TargetProfile, UserCharacter, PlannedCharacter
+from .cost_tables import BuildTarget
+from .materials_calculator import MaterialsCalculator
+from .material_totals import rebuild_totals
+
+# поля персонажа, которые задаёт профиль
+PROFILE_FIELDS = ('target_level', 'target_talent_levels', 'target_profile')
+
+
+def profile_target(profile: TargetProfile) -> BuildTarget:
+    return BuildTarget(profile.target_level, tuple(profile.get_target_talent_levels()))
+
+
+def assign_target_profile(character, profile: TargetProfile | None) -> tuple[str, ...]:
+    """
+    Назначает персонажу профиль (None — снять профиль, цели остаются прежними).
+    Меняет персонажа в памяти и возвращает поля для update_fields.
+    """
+    character.target_profile = profile
+    if profile is None:
+        return ('target_profile',)
+    character.target_level = profile.target_level
+    character.target_talent_levels = list(profile.get_target_talent_levels())
+    return PROFILE_FIELDS
+
+
+def save_target_profile(profile: TargetProfile) -> None:
+    """Сохранить профиль; профиль по умолчанию у пользователя может быть только один"""
+    with transaction.atomic():
+        if profile.is_default:
+            TargetProfile.objects.filter(user_id=profile.user_id, is_default=True) \
+                .exclude(pk=profile.pk).update(is_default=False)
+        profile.save()
+
+
+def apply_target_profile(profile: TargetProfile) -> None:
+    """
+    Профиль изменился — переписать цели всех его персонажей и пересобрать итоги пользователя.
+    UPDATE сигналов не шлёт; версию данных пользователя увеличивает сигнал сохранения профиля.
+    """
+    targets = {
+        'target_level': profile.target_level,
+        'target_talent_levels': list(profile.get_target_talent_levels()),
+    }
+    with transaction.atomic():
+        updated = UserCharacter.objects.filter(target_profile=profile).update(**targets)
+        PlannedCharacter.objects.filter(target_profile=profile).update(**targets)
+        if updated:
+            rebuild_totals(profile.user, MaterialsCalculator())
@@ -0,0 +1,53 @@
+"""
+Версии данных пользователя.
+
+Устроены так же, как версия справочника: числа в кэше версий, которые меняют сигналы
+и массовые записи, обходящие сигналы. Версий несколько:
+'roster' — персонажи и планы (от них зависят все секции калькулятора),
+и по одной на каждый тип материала в инвентаре (от неё зависит только своя секция).
+Вместе с версией справочника они однозначно определяют результат калькулятора.
+"""
+import hashlib
+import time
+
+from django.db import transaction
+
+from ..models import MaterialTypeChoices
+from .catalog_cache import versions_cache
+
+USER_DATA_VERSION_KEY = 'characters:user_data_version:{}:{}'
+
+ROSTER = 'roster'
+USER_DATA_PARTS = (ROSTER, *MaterialTypeChoices.values)
+
+
+def get_user_data_versions(user_id: int) -> dict[str, int]:
+    """Версии всех частей данных пользователя одним обращением к кэшу"""
+    keys = {part: USER_DATA_VERSION_KEY.format(user_id, part) for part in USER_DATA_PARTS}
+    cache = versions_cache()
+    found = cache.get_many(keys.values())
+    missing = [key for key in keys.values() if key not in found]
+    if missing:
+        # начинаем со времени, а не с нуля: после сброса кэша версия не совпадёт с прежними
+        now = time.time_ns()
+        for key in missing:
+            cache.add(key, now, timeout=None)
+        found.update(cache.get_many(missing))
+    return {part: found[key] for part, key in keys.items()}
+
+
+def get_user_data_version(user_id: int) -> str:
+    """Общая версия всех данных пользователя — для ETag"""
+    versions = '.'.join(str(version) for version in get_user_data_versions(user_id).values())
+    return hashlib.blake2b(versions.encode(), digest_size=8).hexdigest()
+
+
+def bump_user_data_version(user_id: int, parts=(ROSTER,)) -> None:
+    """
+    Данные пользователя изменились — закэшированные результаты для этих частей больше не годятся.
+    Версия меняется после коммита: иначе запрос успеет получить новый ETag с содержимым из старых строк,
+    и браузер будет держать его, получая 304. Вне транзакции — сразу.
+    """
+    keys = [USER_DATA_VERSION_KEY.format(user_id, part) for part in parts]
+    # новое значение, а не incr: в DatabaseCache incr — это get + set, два изменения дали бы одну версию
+    transaction.on_commit(lambda: versions_cache().set_many(dict.fromkeys(keys, time.time_ns()), timeout=None))
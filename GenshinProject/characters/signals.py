@@ -0,0 +1,84 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Character, Stone, TalentMaterial, Mob, MobMaterial, BossMaterial, WeeklyMaterial, Specialty, \
+    UserCharacter, PlannedCharacter, UserInventory, TargetProfile, MATERIAL_MODELS, get_material_key
+from .services.catalog_cache import bump_catalog_version
+from .services.materials_calculator import MaterialsCalculator
+from .services.material_totals import apply_character_change, totals_signals_suspended
+from .services.target_profiles import apply_target_profile
+from .services.user_versions import bump_user_data_version
+
+CATALOG_MODELS = [Character, Stone, TalentMaterial, MobMaterial, Mob, BossMaterial, WeeklyMaterial, Specialty]
+
+
+def catalog_changed(sender, **kwargs):
+    # после коммита: иначе другой воркер соберёт снимок из старых строк под новой версией.
+    # Кэш полных сборок тоже сбрасывается этим: в его ключе версия справочника
+    transaction.on_commit(bump_catalog_version)
+
+
+for model in CATALOG_MODELS:
+    post_save.connect(catalog_changed, sender=model, dispatch_uid=f'catalog_changed_save_{model.__name__}')
+    post_delete.connect(catalog_changed, sender=model, dispatch_uid=f'catalog_changed_delete_{model.__name__}')
+
+
+@receiver(pre_save, sender=UserCharacter)
+def user_character_saving(sender, instance, raw=False, **kwargs):
+    # состояние до сохранения — из базы, чтобы в post_save вычесть его из итогов
+    instance._totals_previous = None
+    if not raw and instance.pk is not None and not totals_signals_suspended():
+        instance._totals_previous = UserCharacter.objects.filter(pk=instance.pk).first()
+
+
+@receiver(post_save, sender=UserCharacter)
+def user_character_saved(sender, instance, raw=False, **kwargs):
+    # итоги обновляются при любом сохранении: из views, админки, скриптов
+    if raw:
+        return  # loaddata: справочник может быть ещё не загружен, итоги пересоберёт rebuild_material_totals
+    if totals_signals_suspended():
+        return  # массовое изменение (patch_roster) обновит итоги само одним вызовом
+    old = instance.__dict__.pop('_totals_previous', None)
+    calculator = MaterialsCalculator()
+    if old is not None and old.user_id is not None and old.user_id != instance.user_id:
+        apply_character_change(old.user_id, calculator, old=old)  # персонажа передали другому пользователю
+        old = None
+    if instance.user_id is not None:
+        apply_character_change(instance.user_id, calculator, old=old, new=instance)
+
+
+@receiver(post_delete, sender=UserCharacter)
+def user_character_deleted(sender, instance, **kwargs):
+    if instance.user_id is not None and not totals_signals_suspended():
+        apply_character_change(instance.user_id, MaterialsCalculator(), old=instance)
+
+
+@receiver(post_save, sender=TargetProfile)
+def target_profile_saved(sender, instance, **kwargs):
+    # цели профиля скопированы в персонажей — переписываем их
+    apply_target_profile(instance)
+
+
+@receiver([post_save, post_delete], sender=UserCharacter)
+@receiver([post_save, post_delete], sender=PlannedCharacter)
+@receiver([post_save, post_delete], sender=TargetProfile)
+def roster_changed(sender, instance, **kwargs):
+    if instance.user_id is not None:
+        bump_user_data_version(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=UserInventory)
+def inventory_changed(sender, instance, **kwargs):
+    # bulk_create сигналы не шлёт — там версию увеличивают явно
+    bump_user_data_version(instance.user_id, [instance.material_type])
+
+
+def material_deleted(sender, instance, **kwargs):
+    # у инвентаря больше нет внешнего ключа на материал — удаляем его строки сами
+    material_type, material_id = get_material_key(instance)
+    UserInventory.objects.filter(material_type=material_type, material_id=material_id).delete()
+
+
+for model in MATERIAL_MODELS.values():
+    post_delete.connect(material_deleted, sender=model, dispatch_uid=f'material_deleted_{model.__name__}')
@@ -1,3 +1,645 @@
-from django.test import TestCase
+import datetime
+import io
+import itertools
+import random
+import tempfile
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from GenshinProject.middleware import RequestProfilingMiddleware
+from GenshinProject.profiling import fragment_cache_options
+
+from .management.commands.benchmark_gacha import simulate_cdf
+from .models import Character, UserCharacter, PlannedCharacter, UserInventory, UserMaterialTotals, WeeklyMaterial, \
+    MobMaterial, Stone, TargetProfile, WeekChoices, get_material_key
+from .services import account_export
+from .services.catalog_cache import get_catalog, get_catalog_version
+from .services.cost_tables import BuildTarget
+from .services.catalog_listing import CatalogFilter, decode_cursor, encode_cursor, get_catalog_page
+from .services.farming_planner import DOMAIN_WEEKDAYS, WEEKLY_BOSS_CAP, FarmingSettings, plan_farming
+from .services.gacha import CHARACTER_BANNER, WEAPON_BANNER, cumulative, featured_distribution, \
+    five_star_distribution
+from .services.materials_aggregator import MaterialsAggregator, TalentRegionAggregated, TieredAggregated, \
+    crafting_shortfall, resolve_crafting
+from .services.materials_calculator import MaterialsCalculator
+from .services.material_totals import calculate_totals, calculate_user_materials, get_required_materials, \
+    rebuild_totals
+from .services.roster_availability import RosterAvailability
+from .services.roster_view import get_roster_page
+from .services.roster import patch_roster, ERROR_INVALID, ERROR_NOT_FOUND, ERROR_NOT_EDITABLE, \
+    ERROR_INVALID_VALUE
+from .services.synthetic_data import CatalogSize, seed_catalog
+from .services.user_versions import get_user_data_version
+
+SMALL_CATALOG = CatalogSize(characters=8, mobs=4, bosses=4, weekly_bosses=2, specialties=4)
+
+
+class CatalogTestCase(TestCase):
+    """Маленький синтетический справочник и пользователь без персонажей"""
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()  # версии и полные сборки не должны переживать откат базы
+        self.rng = random.Random(0)
+        self.characters = seed_catalog(SMALL_CATALOG, self.rng)
+        self.user = User.objects.create(username='tester')
+
+    def add_character(self, character, user=None, **fields):
+        fields = {'level': 20, 'talent_levels': [1, 1, 1], 'target_talent_levels': [6, 6, 6], **fields}
+        return UserCharacter.objects.create(user=user or self.user, name=character, **fields)
+
+
+class MaterialTotalsSignalsTests(CatalogTestCase):
+    """Сохранённые итоги совпадают с пересчётом при любом способе изменить персонажа"""
+
+    def setUp(self):
+        super().setUp()
+        self.first = self.add_character(self.characters[0])
+        rebuild_totals(self.user, MaterialsCalculator())
+
+    def assertTotalsFresh(self, user=None):
+        user = user or self.user
+        stored = UserMaterialTotals.objects.get(user=user).totals
+        self.assertEqual(stored, calculate_totals(user, MaterialsCalculator()))
+
+    def test_create(self):
+        self.add_character(self.characters[1], level=60, talent_levels=[2, 3, 4])
+        self.assertTotalsFresh()
+
+    def test_save(self):
+        self.first.level = 80
+        self.first.target_talent_levels = [10, 10, 10]
+        self.first.save()
+        self.assertTotalsFresh()
+
+    def test_save_update_fields(self):
+        self.first.talent_levels = [5, 5, 5]
+        self.first.save(update_fields=['talent_levels'])
+        self.assertTotalsFresh()
+
+    def test_delete(self):
+        self.add_character(self.characters[1])
+        self.first.delete()
+        self.assertTotalsFresh()
+
+    def test_move_to_other_user(self):
+        other = User.objects.create(username='other')
+        rebuild_totals(other, MaterialsCalculator())
+        self.first.user = other
+        self.first.save()
+        self.assertTotalsFresh()
+        self.assertTotalsFresh(other)
+
+    def test_patch_roster_counts_once(self):
+        second = self.add_character(self.characters[1])
+        results = patch_roster(self.user, [
+            {'character_type': 'usercharacter', 'id': self.first.id, 'field': 'level', 'value': 70},
+            {'character_type': 'usercharacter', 'id': self.first.id, 'field': 'target_burst', 'value': 9},
+            {'character_type': 'usercharacter', 'id': second.id, 'field': 'talent_normal', 'value': 4},
+        ])
+        self.assertEqual([result['status'] for result in results], ['ok'] * 3)
+        self.assertTotalsFresh()
+
+    def test_patch_roster_updates_totals_once(self):
+        others = [self.add_character(character) for character in self.characters[1:4]]
+        with CaptureQueriesContext(connection) as captured:
+            patch_roster(self.user, [
+                {'character_type': 'usercharacter', 'id': character.id, 'field': 'level', 'value': 50}
+                for character in [self.first, *others]
+            ])
+        totals_queries = [query['sql'] for query in captured if 'usermaterialtotals' in query['sql']]
+        # один SELECT ... FOR UPDATE и один UPDATE на всю пачку, без SELECT персонажа перед каждым save
+        self.assertEqual(len(totals_queries), 2)
+        self.assertEqual(sum('FROM "characters_usercharacter"' in query['sql'] for query in captured), 1)
+        self.assertTotalsFresh()
+
+
+class CatalogVersionTests(CatalogTestCase):
+
+    def test_bumped_after_commit(self):
+        before = get_catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.characters[0].save()
+            # до коммита другие воркеры не должны получить новую версию со старыми строками
+            self.assertEqual(get_catalog_version(), before)
+        self.assertNotEqual(get_catalog_version(), before)
+
+    def test_full_builds_follow_catalog_version(self):
+        character = self.characters[0]
+        before = MaterialsCalculator().calculate_full_builds([character.id])[0]
+        other = WeeklyMaterial.objects.exclude(id=character.weekly_material_id).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            character.weekly_material = other
+            character.save()
+        after = MaterialsCalculator().calculate_full_builds([character.id])[0]
+        self.assertNotEqual(after.weekly_materials, before.weekly_materials)
+        self.assertEqual({material.name for material in after.weekly_materials}, {other.name})
+
+    def test_user_data_version_bumped_after_commit(self):
+        before = get_user_data_version(self.user.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_character(self.characters[0])
+            # новый ETag не должен появиться раньше, чем строки, из которых строится ответ
+            self.assertEqual(get_user_data_version(self.user.id), before)
+        self.assertNotEqual(get_user_data_version(self.user.id), before)
+
+
+class InventoryMaterialKeyMigrationTests(TransactionTestCase):
+    """0011: шесть внешних ключей инвентаря -> (material_type, material_id)"""
+    before = [('characters', '0010_usermaterialtotals_catalog_version')]
+    after = [('characters', '0011_userinventory_material_key')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        self.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_forward_and_back(self):
+        apps = self.migrate(self.before)
+        user = apps.get_model('auth', 'User').objects.create(username='tester')
+        stone = apps.get_model('characters', 'Stone').objects.create(name='Камень', element='A', rarity=2)
+        boss = apps.get_model('characters', 'BossMaterial').objects.create(name='Материал босса', boss_name='Босс')
+        inventory = apps.get_model('characters', 'UserInventory').objects
+        inventory.create(user=user, stone=stone, count=1)
+        inventory.create(user=user, stone=stone, count=7)  # дубликат: остаётся последняя запись
+        inventory.create(user=user, boss_material=boss, count=3)
+        inventory.create(user=user, count=5)  # материал удалён (SET_NULL) — строка пропадает
+
+        apps = self.migrate(self.after)
+        rows = apps.get_model('characters', 'UserInventory').objects.order_by('material_type')
+        self.assertEqual(
+            list(rows.values_list('user_id', 'material_type', 'material_id', 'count')),
+            [(user.id, 'boss_material', boss.id, 3), (user.id, 'stone', stone.id, 7)],
+        )
+
+        apps = self.migrate(self.before)
+        rows = apps.get_model('characters', 'UserInventory').objects.order_by('id')
+        self.assertEqual(
+            list(rows.values_list('stone_id', 'boss_material_id', 'count')),
+            [(stone.id, None, 7), (None, boss.id, 3)],
+        )
+
+
+class PatchRosterTests(CatalogTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.owned = self.add_character(self.characters[0])
+        self.plans = [
+            PlannedCharacter.objects.create(user=self.user, name=character, target_talent_levels=[6, 6, 6])
+            for character in self.characters[1:3]
+        ]
+
+    def operation(self, character, field, value):
+        return {'character_type': character._meta.model_name, 'id': character.id, 'field': field, 'value': value}
+
+    def test_one_select_per_type_and_one_save_per_character(self):
+        plan = self.plans[0]
+        with CaptureQueriesContext(connection) as queries:
+            results = patch_roster(self.user, [
+                self.operation(plan, 'target_normal', 8),
+                self.operation(plan, 'target_skill', 9),
+                self.operation(self.plans[1], 'target_level', 80),
+            ])
+        self.assertEqual([result['status'] for result in results], ['ok'] * 3)
+        table = PlannedCharacter._meta.db_table
+        selects = [q for q in queries if q['sql'].startswith('SELECT') and f'FROM "{table}"' in q['sql']]
+        updates = [q for q in queries if q['sql'].startswith(f'UPDATE "{table}"')]
+        self.assertEqual(len(selects), 1)
+        self.assertEqual(len(updates), 2)
+        plan.refresh_from_db()
+        self.assertEqual(plan.target_talent_levels, [8, 9, 6])
+
+    def test_errors_have_codes_and_skip_only_their_operation(self):
+        other = User.objects.create(username='other')
+        foreign = self.add_character(self.characters[3], user=other)
+        results = patch_roster(self.user, [
+            {'character_type': 'usercharacter', 'field': 'level'},
+            self.operation(foreign, 'level', 50),
+            self.operation(self.plans[0], 'level', 50),
+            self.operation(self.owned, ['level'], 50),
+            self.operation(self.owned, {'field': 'level'}, 50),
+            self.operation(self.owned, 'level', 91),
+            self.operation(self.owned, 'talent_skill', 'много'),
+            self.operation(self.owned, 'level', 40),
+        ])
+        self.assertEqual(
+            [result.get('code') for result in results],
+            [ERROR_INVALID, ERROR_NOT_FOUND, ERROR_NOT_EDITABLE, ERROR_NOT_EDITABLE, ERROR_NOT_EDITABLE,
+             ERROR_INVALID_VALUE, ERROR_INVALID_VALUE, None],
+        )
+        self.owned.refresh_from_db()
+        self.assertEqual(self.owned.level, 40)
+        foreign.refresh_from_db()
+        self.assertEqual(foreign.level, 20)
+
+    def test_failed_save_rolls_back_everything(self):
+        with mock.patch.object(UserCharacter, 'save', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                patch_roster(self.user, [
+                    self.operation(self.plans[0], 'target_level', 70),
+                    self.operation(self.owned, 'level', 80),
+                ])
+        self.plans[0].refresh_from_db()
+        self.assertEqual(self.plans[0].target_level, 90)
+
+    def test_update_character_api_not_found(self):
+        self.client.force_login(self.user)
+        response = self.client.post('/characters/update-character/', {
+            'character_type': 'usercharacter', 'character_id': 0, 'field': 'level', 'value': 50,
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+        response = self.client.post('/characters/update-character/', {
+            'character_type': 'usercharacter', 'character_id': self.owned.id, 'field': 'level', 'value': 0,
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class CalculateEtagTests(CatalogTestCase):
+    """ETag calculate_api меняется вместе с данными, совпавший If-None-Match — 304 без расчёта"""
+    url = '/characters/calculate/api/'
+
+    def setUp(self):
+        super().setUp()
+        self.owned = self.add_character(self.characters[0])
+        self.client.force_login(self.user)
+
+    def etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def assertEtagChanges(self, change):
+        before = self.etag()
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        self.assertNotEqual(self.etag(), before)
+
+    def test_changes_with_inventory(self):
+        material_type, material_id = get_material_key(Stone.objects.first())
+        self.assertEtagChanges(lambda: UserInventory.objects.create(
+            user=self.user, material_type=material_type, material_id=material_id, count=5))
+
+    def test_changes_with_roster(self):
+        self.assertEtagChanges(lambda: self.add_character(self.characters[1]))
+
+    def test_changes_with_catalog(self):
+        self.assertEtagChanges(lambda: self.characters[2].save())
+
+    def test_changes_with_scope(self):
+        self.assertNotEqual(self.etag(), self.client.get(self.url, {'scope': 'obtained'})['ETag'])
+
+    def test_matching_etag_skips_calculation(self):
+        etag = self.etag()
+        with mock.patch('characters.views.get_aggregated_materials') as calculate:
+            response = self.client.get(self.url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        calculate.assert_not_called()
+
+
+class CatalogPageTests(CatalogTestCase):
+    """Keyset-пагинация справочника: страницы от курсора (значение сортировки + id)"""
+
+    def all_pages(self, catalog_filter, page_size=3):
+        ids, cursor = [], None
+        while True:
+            page = get_catalog_page(catalog_filter, cursor, page_size)
+            ids.extend(character.id for character in page.characters)
+            if page.next_cursor is None:
+                return ids
+            cursor = page.next_cursor
+
+    def test_pages_cover_catalog_in_order(self):
+        characters = list(Character.objects.all())
+        for sort, key, reverse in [('name', lambda ch: (ch.name, ch.id), False),
+                                   ('-name', lambda ch: (ch.name, ch.id), True),
+                                   ('region', lambda ch: (ch.region, ch.id), False)]:
+            with self.subTest(sort=sort):
+                expected = [ch.id for ch in sorted(characters, key=key, reverse=reverse)]
+                self.assertEqual(self.all_pages(CatalogFilter(sort=sort)), expected)
+
+    def test_equal_values_split_by_id(self):
+        # все персонажи в одном регионе: страницы держатся только на id из курсора
+        Character.objects.update(region=Character.objects.first().region)
+        ids = sorted(Character.objects.values_list('id', flat=True))
+        self.assertEqual(self.all_pages(CatalogFilter(sort='region'), page_size=2), ids)
+
+    def test_new_character_does_not_shift_next_page(self):
+        first = get_catalog_page(CatalogFilter(), page_size=3)
+        expected = get_catalog_page(CatalogFilter(), first.next_cursor, page_size=3).characters
+        new = Character.objects.get(pk=first.characters[0].pk)
+        new.pk, new.name = None, '0 новый персонаж'  # встаёт перед уже показанной страницей
+        new.save()
+        self.assertEqual(get_catalog_page(CatalogFilter(), first.next_cursor, page_size=3).characters, expected)
+
+    def test_cursor_round_trip(self):
+        self.assertEqual(decode_cursor(encode_cursor('Альбедо', 7)), ('Альбедо', 7))
+
+    def test_invalid_cursor_starts_from_beginning(self):
+        first = get_catalog_page(CatalogFilter(), page_size=3).characters
+        for cursor in ['не base64!', encode_cursor('a', 'b'), encode_cursor(None, 1), encode_cursor(['a'], 1),
+                       'WzFd']:  # [1]
+            with self.subTest(cursor=cursor):
+                self.assertIsNone(decode_cursor(cursor))
+                self.assertEqual(get_catalog_page(CatalogFilter(), cursor, page_size=3).characters, first)
+
+
+class RosterPageTests(CatalogTestCase):
+
+    def test_character_without_name(self):
+        # name у UserCharacter и PlannedCharacter может быть NULL — страница не должна падать
+        UserCharacter.objects.create(user=self.user, name=None, level=1, talent_levels=[1, 1, 1],
+                                     target_talent_levels=[1, 1, 1])
+        PlannedCharacter.objects.create(user=self.user, name=None, target_talent_levels=[6, 6, 6])
+        roster = get_roster_page(self.user)
+        self.assertEqual([row.name for row in roster.characters + roster.plans], ['', ''])
+
+
+class FarmingPlannerTests(TestCase):
+    MONDAY = datetime.date(2026, 10, 19)
+
+    @staticmethod
+    def group(remain):
+        return TieredAggregated(tiers=[], equivalent=remain, equivalent_remain=remain)
+
+    def boss_runs_by_week(self, schedule):
+        weeks = {}
+        for day in schedule.days:
+            week = weeks.setdefault(day.date.isocalendar().week, {})
+            for task in day.tasks:
+                if task.kind == 'weekly':
+                    week[task.name] = week.get(task.name, 0) + task.runs
+        return list(weeks.values())
+
+    def test_weekly_bosses_once_per_week(self):
+        weekly = {f'Босс {i}': self.group(5) for i in range(4)}
+        schedule = plan_farming({}, weekly, FarmingSettings(daily_resin=200, weeks=3, start=self.MONDAY))
+        weeks = self.boss_runs_by_week(schedule)
+        self.assertEqual(len(weeks), 3)
+        for runs in weeks:
+            self.assertEqual(sum(runs.values()), WEEKLY_BOSS_CAP)
+            self.assertEqual(set(runs.values()), {1})
+
+    def test_bosses_done_count_against_first_week(self):
+        weekly = {f'Босс {i}': self.group(5) for i in range(3)}
+        settings = FarmingSettings(weeks=1, start=self.MONDAY + datetime.timedelta(days=2), weekly_bosses_done=2)
+        weeks = self.boss_runs_by_week(plan_farming({}, weekly, settings))
+        self.assertEqual([sum(runs.values()) for runs in weeks], [1, WEEKLY_BOSS_CAP])
+
+    def test_bosses_done_from_query(self):
+        self.assertEqual(FarmingSettings.from_query({'bosses_done': '2'}).weekly_bosses_done, 2)
+        self.assertEqual(FarmingSettings.from_query({'bosses_done': '9'}).weekly_bosses_done, WEEKLY_BOSS_CAP)
+
+    def test_talent_domains_only_on_open_days(self):
+        talents = {
+            region: TalentRegionAggregated(days=[(label, self.group(400))], equivalent=400, equivalent_remain=400)
+            for region, label in [('Мондштадт', 'ПН'), ('Ли Юэ', 'ВТ'), ('Инадзума', 'СР')]
+        }
+        weekday_by_label = {'ПН': WeekChoices.MONDAY, 'ВТ': WeekChoices.TUESDAY, 'СР': WeekChoices.WEDNESDAY}
+        schedule = plan_farming(talents, {}, FarmingSettings(daily_resin=60, weeks=2, start=self.MONDAY))
+        self.assertEqual(len(schedule.days), 14)
+        for day in schedule.days:
+            self.assertTrue(day.tasks)
+            for task in day.tasks:
+                label = task.name.rsplit('(', 1)[1].rstrip(')')
+                self.assertIn(weekday_by_label[label], DOMAIN_WEEKDAYS[day.date.isoweekday()])
+
+
+def brute_force_shortfall(counts, owned, ratios) -> int:
+    """Перебор: сколько добыть каждой ступени (в предметах низшей ступени), чтобы крафтом вверх хватило всего"""
+    weights = [1]
+    for ratio in ratios:
+        weights.append(weights[-1] * ratio)
+
+    def enough(have):
+        carry = 0
+        for i, count in enumerate(counts):
+            left = have[i] + carry - count
+            if left < 0:
+                return False
+            carry = left // ratios[i] if i < len(ratios) else 0
+        return True
+
+    bound = sum(weight * count for weight, count in zip(weights, counts))
+    best = bound
+    for upper in itertools.product(*(range(bound // weight + 1) for weight in weights[1:])):
+        upper_cost = sum(weight * extra for weight, extra in zip(weights[1:], upper))
+        # низшей ступени перебираем от нуля до первого подходящего — больше брать незачем
+        for lowest in range(best - upper_cost):
+            if enough([have + extra for have, extra in zip(owned, (lowest, *upper))]):
+                best = upper_cost + lowest
+                break
+    return best
+
+
+class CraftingTests(TestCase):
+
+    def remains(self, counts, owned, ratios=(3, 3)):
+        crafted, used = resolve_crafting(counts, owned, ratios)
+        return [count - have - made + spent for count, have, made, spent in zip(counts, owned, crafted, used)]
+
+    def test_matches_brute_force(self):
+        rng = random.Random(1)
+        for _ in range(500):
+            tiers = rng.choice([3, 4])
+            ratios = (3,) * (tiers - 1)
+            limit_count, limit_owned = (8, 20) if tiers == 3 else (3, 8)
+            counts = [rng.randint(0, limit_count) for _ in range(tiers)]
+            owned = [rng.randint(0, limit_owned) for _ in range(tiers)]
+            with self.subTest(counts=counts, owned=owned):
+                expected = brute_force_shortfall(counts, owned, ratios)
+                self.assertEqual(crafting_shortfall(counts, owned, ratios), expected)
+
+                crafted, used = resolve_crafting(counts, owned, ratios)
+                for i in range(tiers - 1):
+                    self.assertEqual(used[i], crafted[i + 1] * ratios[i])  # на крафт уходит ровно ratio за штуку
+                for i in range(1, tiers):
+                    self.assertLessEqual(crafted[i], counts[i] + used[i])  # лишнего не крафтим
+                weights = [3 ** i for i in range(tiers)]
+                remains = self.remains(counts, owned, ratios)
+                self.assertEqual(sum(weight * max(0, remain) for weight, remain in zip(weights, remains)), expected)
+
+    def test_higher_tier_surplus_does_not_cover_lower_tiers(self):
+        # вниз не крафтится: лишние предметы высшей ступени остаются лишними
+        self.assertEqual(resolve_crafting([9, 0, 0], [0, 0, 5], (3, 3)), ([0, 0, 0], [0, 0, 0]))
+        self.assertEqual(self.remains([9, 0, 0], [0, 0, 5]), [9, 0, -5])
+
+    def test_surplus_is_crafted_up(self):
+        self.assertEqual(resolve_crafting([0, 0, 1], [0, 4, 0], (3, 3)), ([0, 0, 1], [0, 3, 0]))
+        self.assertEqual(self.remains([0, 0, 1], [0, 4, 0]), [0, -1, 0])
+
+    def test_negative_remain_is_leftover(self):
+        self.assertEqual(self.remains([0, 2, 0], [7, 0, 0]), [-1, 0, 0])
+        self.assertEqual(crafting_shortfall([0, 2, 0], [7, 0, 0], (3, 3)), 0)
+
+    def test_weekly_materials_are_not_crafted(self):
+        boss = 'Еженедельный босс'
+        spare, needed, other = [WeeklyMaterial(id=i, name=f'Материал {i}', boss_name=boss) for i in (1, 2, 3)]
+        aggregator = MaterialsAggregator({('weekly_material', spare.id): 10})
+        [group] = aggregator.aggregate_weekly({spare: 1, needed: 3, other: 0}).values()
+        self.assertEqual([tier.crafted for tier in group.tiers], [0, 0, 0])
+        self.assertEqual([tier.remain for tier in group.tiers], [-9, 3, 0])
+        self.assertEqual(group.equivalent_remain, 3)
+
+
+class RosterAvailabilityTests(CatalogTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.owned = self.add_character(self.characters[0])
+        PlannedCharacter.objects.create(user=self.user, name=self.characters[1], target_level=80,
+                                        target_talent_levels=[8, 8, 8])
+        PlannedCharacter.objects.create(user=self.user, name=self.characters[2], target_talent_levels=[])
+        TargetProfile.objects.create(user=self.user, name='Основной', target_level=70,
+                                     target_talent_levels=[6, 8, 8], is_default=True)
+
+    def test_single_query(self):
+        with self.assertNumQueries(1):
+            roster = RosterAvailability.load(self.user)
+        self.assertEqual(roster.owned, {self.characters[0].id})
+        self.assertEqual(roster.planned, {self.characters[1].id, self.characters[2].id})
+        self.assertEqual(roster.planned_targets[self.characters[1].id], BuildTarget(80, (8, 8, 8)))
+        self.assertEqual(roster.planned_targets[self.characters[2].id], BuildTarget(90, ()))
+        self.assertEqual(roster.default_target, BuildTarget(70, (6, 8, 8)))
+
+    def test_plan_without_targets_uses_default_build(self):
+        calculator = MaterialsCalculator()
+        expected = get_required_materials(self.user, calculator)
+        expected.merge_with(calculator.calculate_planned({self.characters[1].id: BuildTarget(80, (8, 8, 8))})[0])
+        # план без целей талантов считается как неполученный персонаж с целью профиля по умолчанию
+        others = [character.id for character in self.characters[2:]]
+        for required in calculator.calculate_full_builds(others, BuildTarget(70, (6, 8, 8))):
+            expected.merge_with(required)
+        self.assertEqual(calculate_user_materials(self.user, calculator, 'all'), expected)
+
+        planned_only = get_required_materials(self.user, calculator)
+        planned_only.merge_with(calculator.calculate_planned({self.characters[1].id: BuildTarget(80, (8, 8, 8))})[0])
+        self.assertEqual(calculate_user_materials(self.user, calculator, 'planned'), planned_only)
+
+
+class GachaDistributionTests(TestCase):
+
+    def mean(self, pmf):
+        return sum(pulls * p for pulls, p in enumerate(pmf))
+
+    def test_pmf_sums_to_one(self):
+        for rules in (CHARACTER_BANNER, WEAPON_BANNER):
+            cases = [(0, False, 1), (60, False, 1), (rules.hard_pity - 1, True, 1), (10, False, 3), (0, True, 7)]
+            for pity, guaranteed, copies in cases:
+                with self.subTest(rules=rules.label, pity=pity, guaranteed=guaranteed, copies=copies):
+                    self.assertAlmostEqual(sum(featured_distribution(rules, pity, guaranteed, copies)), 1.0, places=9)
+
+    def test_hard_pity_caps_pulls(self):
+        rules = CHARACTER_BANNER
+        for pity in (0, 50, rules.hard_pity - 1):
+            with self.subTest(pity=pity):
+                five_star = five_star_distribution(rules, pity)
+                self.assertEqual(len(five_star) - 1, rules.hard_pity - pity)
+                self.assertGreater(five_star[-1], 0)
+                self.assertEqual(len(featured_distribution(rules, pity, True)) - 1, rules.hard_pity - pity)
+                # проигрыш 50/50 — самое большее ещё hard_pity круток
+                self.assertEqual(len(featured_distribution(rules, pity, False)) - 1, 2 * rules.hard_pity - pity)
+        self.assertEqual(five_star_distribution(rules, rules.hard_pity - 1), (0.0, 1.0))
+
+    def test_guarantee_shifts_distribution(self):
+        rules = CHARACTER_BANNER
+        guaranteed = featured_distribution(rules, 0, True)
+        coin_flip = featured_distribution(rules, 0, False)
+        self.assertEqual(guaranteed, five_star_distribution(rules))
+        self.assertLess(self.mean(guaranteed), self.mean(coin_flip))
+        # с гарантией вероятность уложиться в любое число круток не меньше
+        for with_guarantee, without in zip(cumulative(guaranteed), cumulative(coin_flip)):
+            self.assertGreaterEqual(with_guarantee + 1e-12, without)
+
+    def test_matches_seeded_simulation(self):
+        trials = 10000
+        for rules, pity, guaranteed, copies in [(CHARACTER_BANNER, 0, False, 1), (CHARACTER_BANNER, 40, True, 2),
+                                                (WEAPON_BANNER, 0, False, 1)]:
+            with self.subTest(rules=rules.label, pity=pity, guaranteed=guaranteed, copies=copies):
+                exact = cumulative(featured_distribution(rules, pity, guaranteed, copies))
+                simulated = simulate_cdf(rules, pity, guaranteed, copies, trials, random.Random(0))
+                exact += [1.0] * (len(simulated) - len(exact))
+                # Колмогоров — Смирнов: на 10 000 испытаний расхождение больше 0.02 — ошибка в формулах
+                self.assertLess(max(abs(a - b) for a, b in zip(exact, simulated)), 0.02)
+
+
+class RequestProfilingTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create(username='staff', is_staff=True))
+
+    def test_only_explicit_one_enables_profiling(self):
+        with self.settings(REQUEST_PROFILE_DIR=self.enterContext(tempfile.TemporaryDirectory())):
+            for query, profiled in [('?_profile=1', True), ('?_profile=0', False), ('?_profile=', False), ('', False)]:
+                with self.subTest(query=query):
+                    response = self.client.get(f'/characters/gacha/api/{query}')
+                    self.assertEqual('X-Profile' in response.headers, profiled)
+
+    def test_not_marked_profiled_when_profiler_busy(self):
+        request = RequestFactory().get('/characters/calculate/?_profile=1')
+        request.user = User.objects.get(username='staff')
+        seen = []
+        middleware = RequestProfilingMiddleware(lambda request: seen.append(request) or HttpResponse())
+        with mock.patch('cProfile.Profile.enable', side_effect=ValueError):
+            response = middleware(request)
+        self.assertNotIn('X-Profile', response.headers)
+        self.assertFalse(getattr(seen[0], 'is_profiled', False))
+        # без профиля фрагменты калькулятора кэшируются как обычно
+        self.assertEqual(fragment_cache_options(seen[0], 'v1', 60), ('v1', 60))
+        seen[0].is_profiled = True
+        version, timeout = fragment_cache_options(seen[0], 'v1', 60)
+        self.assertNotEqual(version, 'v1')
+        self.assertEqual(timeout, 0)
+
+
+class ImportCatalogTests(TestCase):
+
+    def import_file(self, name, content, *args):
+        directory = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        (directory / name).write_text(content, encoding='utf-8')
+        call_command('import_catalog', str(directory / name), *args, stdout=io.StringIO(), stderr=io.StringIO())
+
+    def test_malformed_files_raise_command_error(self):
+        cases = {
+            'list.json': '[1, 2]',
+            'section.json': '{"mobs": {"name": "Моб"}}',
+            'row.json': '{"mobs": ["Моб"]}',
+            'array.jsonl': '{"section": "mobs", "name": "Моб"}\n[1]\n',
+            'broken.jsonl': '{"section": "mobs", "name": "Моб"}\n{oops\n',
+        }
+        for name, content in cases.items():
+            with self.subTest(name=name):
+                with self.assertRaises(CommandError):
+                    self.import_file(name, content)
+
+    def test_jsonl_import(self):
+        self.import_file('catalog.jsonl', '{"section": "mobs", "name": "Моб"}\n'
+                                          '{"section": "mob_materials", "name": "Маска", "mob_name": "Моб", "rarity": 1}\n')
+        self.assertEqual(MobMaterial.objects.get(name='Маска').mob_name.name, 'Моб')
+
+
+class AccountExportTests(CatalogTestCase):
+
+    def test_catalog_loaded_once_per_export(self):
+        UserInventory.set_material_counts(self.user, {
+            key: count for count, key in enumerate(list(get_catalog().materials)[:20], start=1)
+        })
+        with mock.patch.object(account_export, 'get_catalog', wraps=get_catalog) as loaded:
+            lines = list(account_export.export_accounts('jsonl', [self.user]))
+        self.assertEqual(loaded.call_count, 1)
+        self.assertEqual(len(lines), 20)
+        self.assertTrue(all('"material": null' not in line for line in lines))
@@ -6,11 +6,22 @@ urlpatterns = [
     path('create/', views.create, name='create'),
     path('<int:pk>/update', views.CharacterUpdateView.as_view(), name='character_update' ),
     path('calculate/', views.calculate, name='calculate' ),
+    path('calculate/api/', views.calculate_api, name='calculate_api'),
+    path('farming/', views.farming_schedule, name='farming_schedule'),
+    path('farming/api/', views.farming_schedule_api, name='farming_schedule_api'),
+    path('gacha/', views.gacha_chances, name='gacha_chances'),
+    path('gacha/api/', views.gacha_api, name='gacha_api'),
     path('my/', views.my_characters, name='my_characters' ),
+    path('my/export/', views.export_account, name='export_account'),
+    path('profiles/', views.target_profiles, name='target_profiles'),
+    path('profiles/<int:pk>/', views.target_profiles, name='target_profile_update'),
     path('add_my/', views.add_my_character, name='add_my_character' ),
     path('add_plan/', views.add_plan_character, name='add_plan_character' ),
     path('add_planned/', views.add_planned_character, name='add_planned_character' ),
     path('get-planned-talents/<int:character_id>/', views.get_planned_talents, name='get_planned_talents'),
     path('inventory/update/', views.update_inventory_api, name='update_inventory'),
+    path('inventory/bulk-update/', views.bulk_update_inventory_api, name='bulk_update_inventory'),
     path('update-character/', views.update_character, name='update_character'),
+    path('patch-characters/', views.patch_characters_api, name='patch_characters'),
+    path('catalog-cache/stats/', views.catalog_cache_stats, name='catalog_cache_stats'),
 ]
\ No newline at end of file
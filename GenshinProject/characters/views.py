@@ -1,21 +1,54 @@
+from django.db import transaction
 from django.shortcuts import render, redirect, get_object_or_404
-from .models import Character, UserCharacter, UserInventory, PlannedCharacter
-from .forms import CharacterForm, UserCharacterForm, PlannedCharacterForm, ExPlannedCharacterForm
+from .models import Character, UserCharacter, UserInventory, PlannedCharacter, TargetProfile, MATERIAL_MODELS, \
+    MaterialTypeChoices, RegionChoices, ElementChoices, WeekChoices
+from .forms import CharacterForm, UserCharacterForm, PlannedCharacterForm, ExPlannedCharacterForm, TargetProfileForm
 from django.views.generic import UpdateView
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 
 import json
-from django.http import JsonResponse
+from urllib.parse import urlencode
+from django.contrib.auth.models import User
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
+from GenshinProject.profiling import fragment_cache_options
 
-from .services.materials_aggregator import MaterialsAggregator
+from .services.materials_aggregator import MaterialsAggregator, LazyAggregatedMaterials
+from .services.catalog_cache import get_catalog_stats, get_catalog_version
+from .services.catalog_listing import CatalogFilter, SORT_CHOICES, get_catalog_page
 from .services.materials_calculator import MaterialsCalculator
+from .services.material_totals import calculate_user_materials, scope_from_query, \
+    CALCULATION_SCOPES
+from .services.roster import patch_roster, ERROR_NOT_FOUND
+from .services.roster_availability import RosterAvailability
+from .services.roster_view import get_roster_page
+from .services.target_profiles import save_target_profile
+from .services.farming_planner import FarmingSettings, plan_farming, schedule_to_json
+from .services.gacha import BANNERS, MAX_COPIES, GachaQuery, distribution_to_json
+from .services.materials_json import aggregated_to_json
+from .services.account_export import EXPORT_FORMATS, SECTIONS_BY_NAME as EXPORT_SECTIONS, export_accounts
+from .services.user_versions import get_user_data_version, get_user_data_versions, bump_user_data_version, ROSTER
 
 
 def characters_home(request):
-    characters=Character.objects.all()
-    return render(request, 'characters/home.html', {'characters': characters})
+    catalog_filter = CatalogFilter.from_query(request.GET)
+    page = get_catalog_page(catalog_filter, cursor=request.GET.get('after'))
+    data = {
+        'characters': page.characters,
+        'filter': catalog_filter,
+        'next_query': urlencode({**catalog_filter.as_query(), 'after': page.next_cursor}) if page.next_cursor else None,
+        'is_first_page': not request.GET.get('after'),
+        'first_query': urlencode(catalog_filter.as_query()),
+        'regions': RegionChoices.choices,
+        'elements': ElementChoices.choices,
+        'weekdays': WeekChoices.choices,
+        'sort_choices': SORT_CHOICES.items(),
+    }
+    return render(request, 'characters/home.html', data)
 
 class CharacterUpdateView(UpdateView):
     model = Character
@@ -40,37 +73,202 @@ def create(request):
     }
     return render(request, 'characters/create.html', data)
 
+def get_aggregated_materials(user, scope: str):
+    calculator = MaterialsCalculator()
+    materials = calculate_user_materials(user, calculator, scope)
+    inventory = UserInventory.get_inventory_map(user)
+    return MaterialsAggregator(inventory).aggregate_materials(materials)
+
+
+def get_lazy_aggregated_materials(user, scope: str) -> LazyAggregatedMaterials:
+    """То же, но каждая секция считается только при обращении к ней"""
+    calculator = MaterialsCalculator()
+    return LazyAggregatedMaterials(
+        lambda: calculate_user_materials(user, calculator, scope),
+        lambda: UserInventory.get_inventory_map(user),
+    )
+
+
+# фрагменты секций калькулятора; при смене версий ключи меняются, старые просто истекают
+CALCULATE_FRAGMENT_TIMEOUT = 60 * 60 * 24
+
+
 @login_required
 def calculate(request):
-    only_obtained = request.GET.get('only_obtained') == '1'
+    scope = scope_from_query(request.GET)
+
+    # ключ фрагмента каждой секции: версия справочника, персонажей и инвентаря этого типа материала
+    versions = get_user_data_versions(request.user.id)
+    base_version, fragment_timeout = fragment_cache_options(
+        request, f'{get_catalog_version()}-{versions[ROSTER]}-{scope}', CALCULATE_FRAGMENT_TIMEOUT)
+    section_versions = {
+        material_type: f'{base_version}-{versions[material_type]}'
+        for material_type in MaterialTypeChoices.values
+    }
 
-    characters = UserCharacter.objects.filter(user=request.user)
-    calculator = MaterialsCalculator()
-    materials = calculator.calculate_all(characters, only_obtained=only_obtained)
-    aggregated = MaterialsAggregator().aggregate_materials(materials, request_user=request.user)
     data = {
-        'aggregated': aggregated,
-        'only_obtained': only_obtained,
+        'aggregated': get_lazy_aggregated_materials(request.user, scope),
+        'section_versions': section_versions,
+        'fragment_timeout': fragment_timeout,
+        'scope': scope,
+        'scopes': CALCULATION_SCOPES.items(),
     }
 
     return render(request, 'characters/calculate.html', data)
 
+
+def calculate_etag(request):
+    """Результат зависит только от данных пользователя, справочника и режима расчёта"""
+    if not request.user.is_authenticated:
+        return None
+    return '{}-{}-{}'.format(
+        get_user_data_version(request.user.id),
+        get_catalog_version(),
+        scope_from_query(request.GET),
+    )
+
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=calculate_etag)
+def calculate_api(request):
+    """
+    Результат калькулятора в JSON. Если ETag из If-None-Match совпал — 304 без пересчёта.
+    """
+    scope = scope_from_query(request.GET)
+    return JsonResponse({
+        'scope': scope,
+        'aggregated': aggregated_to_json(get_aggregated_materials(request.user, scope)),
+    })
+
+
+def get_farming_schedule(request):
+    settings = FarmingSettings.from_query(request.GET)
+    # нужны только секции книг и боссов — остальные не считаются
+    aggregated = get_lazy_aggregated_materials(request.user, scope_from_query(request.GET))
+    return plan_farming(aggregated.talent_materials, aggregated.weekly_materials, settings), settings
+
+
+@login_required
+def farming_schedule(request):
+    schedule, settings = get_farming_schedule(request)
+    data = {
+        'schedule': schedule,
+        'settings': settings,
+        'scope': scope_from_query(request.GET),
+        'scopes': CALCULATION_SCOPES.items(),
+    }
+    return render(request, 'characters/farming.html', data)
+
+
+@login_required
+def farming_schedule_api(request):
+    """План фарма в JSON; параметры те же, что у страницы: resin, weeks, bosses_done, scope"""
+    schedule, settings = get_farming_schedule(request)
+    return JsonResponse({
+        'daily_resin': settings.daily_resin,
+        'weeks': settings.weeks,
+        'weekly_bosses_done': settings.weekly_bosses_done,
+        'scope': scope_from_query(request.GET),
+        **schedule_to_json(schedule),
+    })
+
+
+def gacha_chances(request):
+    data = {
+        'query': GachaQuery.from_query(request.GET),
+        'banners': [(key, rules.label) for key, rules in BANNERS.items()],
+        'max_copies': MAX_COPIES,
+    }
+    return render(request, 'characters/gacha.html', data)
+
+
+@cache_control(public=True, max_age=60 * 60 * 24)
+def gacha_api(request):
+    """Распределение числа круток в JSON; зависит только от параметров, поэтому кэшируется браузером"""
+    return JsonResponse(distribution_to_json(GachaQuery.from_query(request.GET)))
+
+
 @login_required
 def my_characters(request):
-    characters = UserCharacter.objects.filter(user=request.user)
-    plans = PlannedCharacter.objects.filter(user=request.user)
+    roster = get_roster_page(request.user, request.GET.get('page'))
     data={
-        'characters': characters,
-        'plans': plans,
+        'characters': roster.characters,
+        'plans': roster.plans,
+        'page': roster.page,
+        'profiles': roster.profiles,
     }
     return render(request, 'characters/my_characters.html', data)
 
 
+@login_required
+def export_account(request):
+    """
+    Потоковая выгрузка персонажей, планов и инвентаря: ?format=jsonl|json|csv&section=...
+    Персонал может выгрузить чужой аккаунт (?user=имя) или все сразу (?all=1).
+    """
+    export_format = request.GET.get('format', 'jsonl')
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({'status': 'error', 'error': f'Формат: {", ".join(EXPORT_FORMATS)}'}, status=400)
+    section_names = request.GET.getlist('section') or list(EXPORT_SECTIONS)
+    if any(name not in EXPORT_SECTIONS for name in section_names):
+        return JsonResponse({'status': 'error', 'error': f'Разделы: {", ".join(EXPORT_SECTIONS)}'}, status=400)
+
+    username = request.GET.get('user')
+    export_all = request.GET.get('all') == '1'
+    if (username or export_all) and not request.user.is_staff:
+        return JsonResponse({'status': 'error', 'error': 'Чужие аккаунты выгружает только персонал'}, status=403)
+    if export_all:
+        users, filename = None, 'all-accounts'
+    else:
+        user = get_object_or_404(User, username=username) if username else request.user
+        users, filename = [user], f'account-{user.pk}'
+
+    response = StreamingHttpResponse(
+        export_accounts(export_format, users, [EXPORT_SECTIONS[name] for name in section_names]),
+        content_type=f'{EXPORT_FORMATS[export_format]}; charset=utf-8',
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
+
+
+@login_required
+def target_profiles(request, pk=None):
+    """Список профилей целей и форма создания (или изменения, если передан pk)"""
+    error = ''
+    profile = get_object_or_404(TargetProfile, pk=pk, user=request.user) if pk else TargetProfile(user=request.user)
+    if request.method == "POST":
+        form = TargetProfileForm(request.POST, instance=profile, user=request.user)
+        if form.is_valid():
+            profile = form.save(commit=False)
+            profile.set_target_talent_levels([
+                form.cleaned_data['target1'],
+                form.cleaned_data['target2'],
+                form.cleaned_data['target3']
+            ])
+            # сигнал сохранения перепишет цели всех персонажей с этим профилем
+            save_target_profile(profile)
+            return redirect('target_profiles')
+        else:
+            error = form.errors
+
+    form = TargetProfileForm(instance=profile, user=request.user)
+    data = {
+        'form': form,
+        'error': error,
+        'profile': profile,
+        'profiles': TargetProfile.objects.filter(user=request.user).order_by('name'),
+    }
+    return render(request, 'characters/profiles.html', data)
+
+
 @login_required
 def add_my_character(request):
     error=''
+    # полученные и запланированные персонажи — один запрос на обе формы страницы
+    availability = RosterAvailability.load(request.user)
     if request.method == "POST":
-        form = UserCharacterForm(request.POST, user=request.user)
+        form = UserCharacterForm(request.POST, user=request.user, availability=availability)
         if form.is_valid():
             character=form.save(commit=False)
             character.user=request.user
@@ -89,7 +287,7 @@ def add_my_character(request):
         else:
             error=form.errors
 
-    form=UserCharacterForm(user=request.user)
+    form=UserCharacterForm(user=request.user, availability=availability)
     data={
         'form':form,
         'error':error
@@ -100,8 +298,10 @@ def add_my_character(request):
 @login_required
 def add_plan_character(request):
     error=''
+    # полученные и запланированные персонажи — один запрос на обе формы страницы
+    availability = RosterAvailability.load(request.user)
     if request.method == "POST":
-        form = PlannedCharacterForm(request.POST, user=request.user)
+        form = PlannedCharacterForm(request.POST, user=request.user, availability=availability)
         if form.is_valid():
             character=form.save(commit=False)
             character.user=request.user
@@ -116,7 +316,7 @@ def add_plan_character(request):
         else:
             error=form.errors
 
-    form=PlannedCharacterForm(user=request.user)
+    form=PlannedCharacterForm(user=request.user, availability=availability)
     data={
         'form':form,
         'error':error
@@ -127,8 +327,10 @@ def add_plan_character(request):
 @login_required
 def add_planned_character(request):
     error = ''
+    # полученные и запланированные персонажи — один запрос на обе формы страницы
+    availability = RosterAvailability.load(request.user)
     if request.method == "POST":
-        form = ExPlannedCharacterForm(request.POST, user=request.user)
+        form = ExPlannedCharacterForm(request.POST, user=request.user, availability=availability)
         if form.is_valid():
             character = form.save(commit=False)
             character.user = request.user
@@ -153,7 +355,7 @@ def add_planned_character(request):
         else:
             error = form.errors
 
-    form = ExPlannedCharacterForm(user=request.user)
+    form = ExPlannedCharacterForm(user=request.user, availability=availability)
     data = {
         'form': form,
         'error': error
@@ -185,58 +387,131 @@ def get_planned_talents(request, character_id):
 def update_character(request):
     if request.method == 'POST':
         data = json.loads(request.body)
-        character_type = data['character_type']
-        character_id = data['character_id']
-        field = data['field']
-        value = data['value']
-
-        if character_type == 'usercharacter':
-            char = get_object_or_404(UserCharacter, id=character_id, user=request.user)
-            if field == 'level':
-                char.level = value
-            elif field == 'is_ascended':
-                char.is_ascended = bool(value)
-            elif field == 'talent_normal':
-                char.talent_levels[0] = value
-            elif field == 'talent_skill':
-                char.talent_levels[1] = value
-            elif field == 'talent_burst':
-                char.talent_levels[2] = value
-            elif field.startswith('target_'):
-                idx = {'normal': 0, 'skill': 1, 'burst': 2}[field.split('_')[1]]
-                char.target_talent_levels[idx] = value
-            char.save()
-
-        elif character_type == 'plannedcharacter':
-            char = get_object_or_404(PlannedCharacter, id=character_id, user=request.user)
-            idx = {'normal': 0, 'skill': 1, 'burst': 2}[field.split('_')[1]]
-            char.target_talent_levels[idx] = value
-            char.save()
+        [result] = patch_roster(request.user, [{
+            'character_type': data['character_type'],
+            'id': data['character_id'],
+            'field': data['field'],
+            'value': data['value'],
+        }])
+        if result['status'] == 'error':
+            status = 404 if result['code'] == ERROR_NOT_FOUND else 400
+            return JsonResponse({'status': 'error', 'error': result['error']}, status=status)
 
         return JsonResponse({'status': 'success'})
 
     return JsonResponse({'status': 'error'}, status=400)
 
 
+@login_required
+def patch_characters_api(request):
+    """
+    Много изменений персонажей за один запрос:
+    {"operations": [{"character_type": "usercharacter", "id": 5, "field": "level", "value": 80}, ...]}
+    Ошибочные операции пропускаются, остальные применяются; результат — по каждой операции.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error'}, status=405)
+
+    try:
+        operations = json.loads(request.body)['operations']
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'status': 'error', 'error': 'Нужен JSON вида {"operations": [...]}'}, status=400)
+    if not isinstance(operations, list) or not all(isinstance(op, dict) for op in operations):
+        return JsonResponse({'status': 'error', 'error': 'operations должен быть списком объектов'}, status=400)
+
+    results = patch_roster(request.user, operations)
+    failed = sum(1 for result in results if result['status'] == 'error')
+    return JsonResponse({
+        'status': 'ok' if not failed else ('error' if failed == len(results) else 'partial'),
+        'results': results,
+    })
+
+
+def parse_inventory_items(items) -> tuple[dict[tuple[str, int], int], list[dict]]:
+    """
+    Проверяет записи {material_type, material_id, count}.
+    Тип материала — только из MaterialTypeChoices, id должен существовать в справочнике.
+    Возвращает ({(тип, id): количество}, ошибки по номерам записей).
+    """
+    counts = {}
+    errors = []
+    for i, item in enumerate(items):
+        try:
+            material_type = item['material_type']
+            material_id = int(item['material_id'])
+            count = max(0, int(item['count']))
+        except (KeyError, TypeError, ValueError):
+            errors.append({'index': i, 'error': 'Нужны material_type, material_id и count'})
+            continue
+        if material_type not in MaterialTypeChoices.values:
+            errors.append({'index': i, 'error': f'Неизвестный тип материала: {material_type}'})
+            continue
+        counts[(material_type, material_id)] = count
+
+    # существование материалов — одним запросом на тип
+    ids_by_type = {}
+    for material_type, material_id in counts:
+        ids_by_type.setdefault(material_type, set()).add(material_id)
+    for material_type, ids in ids_by_type.items():
+        existing = set(MATERIAL_MODELS[material_type].objects.filter(pk__in=ids).values_list('pk', flat=True))
+        for material_id in ids - existing:
+            errors.append({'material_type': material_type, 'material_id': material_id, 'error': 'Материал не найден'})
+
+    return counts, errors
+
+
 @login_required
 @csrf_exempt
 def update_inventory_api(request):
-    print("REQUEST BODY:", request.body)
     if request.method == 'POST':
         data = json.loads(request.body)
-        count = max(0, int(data['count']))  # Валидация
-        material_type = data['material_type']
-        material_id = data['material_id']
+        counts, errors = parse_inventory_items([data])
+        if errors:
+            return JsonResponse({'status': 'error', 'error': errors[0]['error']}, status=400)
 
-        # UserInventory.get_or_create + update count
-        inv, created = UserInventory.objects.get_or_create(
-            user=request.user,
-            **{material_type + '_id': material_id},
-            defaults={'count': count}
-        )
-        if not created:
-            inv.count = count
-            inv.save()
+        # один запрос: INSERT ... ON CONFLICT (user, material_type, material_id) DO UPDATE
+        UserInventory.set_material_counts(request.user, counts)
+        # bulk_create не шлёт post_save; меняется только секция этого типа материала
+        bump_user_data_version(request.user.id, {material_type for material_type, _ in counts})
+
+        return JsonResponse({'status': 'ok', 'count': next(iter(counts.values()))})
 
-        return JsonResponse({'status': 'ok', 'count': count})
 
+@login_required
+def bulk_update_inventory_api(request):
+    """
+    Много материалов за один запрос:
+    {"items": [{"material_type": "stone", "material_id": 12, "count": 5}, ...]}
+    Всё или ничего: при любой ошибке ничего не записывается.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error'}, status=405)
+
+    try:
+        items = json.loads(request.body)['items']
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'status': 'error', 'errors': [{'error': 'Нужен JSON вида {"items": [...]}'}]}, status=400)
+    if not isinstance(items, list):
+        return JsonResponse({'status': 'error', 'errors': [{'error': 'items должен быть списком'}]}, status=400)
+
+    counts, errors = parse_inventory_items(items)
+    if errors:
+        return JsonResponse({'status': 'error', 'errors': errors}, status=400)
+
+    with transaction.atomic():
+        UserInventory.set_material_counts(request.user, counts)
+    # bulk_create не шлёт post_save; меняются только секции затронутых типов материалов
+    bump_user_data_version(request.user.id, {material_type for material_type, _ in counts})
+
+    return JsonResponse({
+        'status': 'ok',
+        'counts': [
+            {'material_type': material_type, 'material_id': material_id, 'count': count}
+            for (material_type, material_id), count in counts.items()
+        ],
+    })
+
+@staff_member_required
+def catalog_cache_stats(request):
+    """Попадания/промахи кэша справочника в этом процессе"""
+    return JsonResponse(get_catalog_stats())
@@ -5,5 +5,7 @@ urlpatterns = [
     path('', views.index, name='home' ),
     path('about/', views.about,  name='about'),
     path('profile/', views.profile,  name='profile'),
-    path('register/', views.RegisterView.as_view(),  name='register')
+    path('register/', views.RegisterView.as_view(),  name='register'),
+    path('staff/profiles/', views.request_profiles, name='request_profiles'),
+    path('staff/profiles/<str:name>/', views.request_profile_download, name='request_profile_download'),
 ]
\ No newline at end of file
@@ -1,8 +1,11 @@
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
+from django.http import FileResponse, Http404
 from django.shortcuts import render
 from django.views.generic import CreateView, FormView
 
+from GenshinProject.profiling import list_profiles, get_profile_path, top_functions
 from .forms import RegisterForm
 
 
@@ -35,3 +38,28 @@ class RegisterView(FormView):
         form.save()
         return super().form_valid(form)
 
+
+@staff_member_required
+def request_profiles(request):
+    """Сохранённые профили запросов; ?name=... — самые тяжёлые функции выбранного профиля"""
+    data = {'profiles': list_profiles(), 'selected': None}
+    name = request.GET.get('name')
+    if name:
+        path = get_profile_path(name)
+        if path is None:
+            raise Http404('Профиль не найден')
+        only_project = request.GET.get('project') == '1'
+        data.update(
+            selected=name,
+            only_project=only_project,
+            functions=top_functions(path, only_project=only_project),
+        )
+    return render(request, 'main/request_profiles.html', data)
+
+
+@staff_member_required
+def request_profile_download(request, name):
+    path = get_profile_path(name)
+    if path is None:
+        raise Http404('Профиль не найден')
+    return FileResponse(path.open('rb'), as_attachment=True, filename=name)